@@ -1,5 +1,7 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from venv import logger
 
 from pydantic import BaseModel
 from passlib.context import CryptContext
@@ -11,12 +13,29 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 # from pydantic import ValidationError
 
-from src.config import JWT_SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES
+from src.config import (
+    JWT_SECRET_KEY,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+)
 from src.versions import ApiVersion
+from src.metrics.service import registry
 
 
 ALGORITHM = 'HS256'
-password_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+password_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=PASSWORD_HASH_ROUNDS)
+
+# bcrypt releases the GIL, so a thread pool keeps hashing off the event loop.
+# Its size caps how many hashes run at once; further calls queue.
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix='password_hash',
+)
+
+password_hash_duration = registry.histogram('password_hash_duration_seconds', 'Time spent in bcrypt, by operation.', ('operation',))
+# Includes waiting for a free worker, the difference to the above is queueing
+password_hash_latency = registry.histogram('password_hash_latency_seconds', 'Time until a hash or verify completed, by operation.', ('operation',))
 
 
 class TokenGet(BaseModel):
@@ -38,15 +57,52 @@ def bearer_token_header(token: str) -> Dict:
         'Authorization': f"Bearer {token}"
     }
 
-def get_hashed_password(password: str) -> str:
-    # TODO: Why is this so slow?
-    return password_context.hash(password)
+def hash_password_sync(password: str) -> str:
+    # Slow by design, cost is set by PASSWORD_HASH_ROUNDS
+    s = time.perf_counter()
+    hashed = password_context.hash(password)
+    password_hash_duration.observe(time.perf_counter() - s, operation='hash')
+    return hashed
+
+
+def verify_password_sync(password: str, hashed_pass: str) -> bool:
+    s = time.perf_counter()
+    verified = password_context.verify(password, hashed_pass)
+    password_hash_duration.observe(time.perf_counter() - s, operation='verify')
+    return verified
+
+
+async def get_hashed_password(password: str) -> str:
+    """
+    Hashes a password on the password thread pool so that the event loop isn't blocked.
+
+    Args:
+        password (str): Raw password
+
+    Returns:
+        str: Hashed password
+    """
+    s = time.perf_counter()
+    hashed = await asyncio.get_running_loop().run_in_executor(password_executor, hash_password_sync, password)
+    password_hash_latency.observe(time.perf_counter() - s, operation='hash')
+    return hashed
+
 
+async def verify_password(password: str, hashed_pass: str) -> bool:
+    """
+    Verifies a password against its hash on the password thread pool so that the event loop isn't blocked.
+
+    Args:
+        password (str): Raw password
+        hashed_pass (str): Stored hash
 
-def verify_password(password: str, hashed_pass: str) -> bool:
-    logger.warning(password)
-    logger.warning(hashed_pass)
-    return password_context.verify(password, hashed_pass)
+    Returns:
+        bool: Whether the password matches
+    """
+    s = time.perf_counter()
+    verified = await asyncio.get_running_loop().run_in_executor(password_executor, verify_password_sync, password, hashed_pass)
+    password_hash_latency.observe(time.perf_counter() - s, operation='verify')
+    return verified
 
 
 def get_random_token() -> UUID:
@@ -0,0 +1,221 @@
+import json
+import time
+import uuid
+from enum import Enum
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Type
+
+from arq import ArqRedis
+
+from src.logging.service import logger
+from src.config import SHARED_SCHEMA_NAME, BULK_JOB_CHUNK_SIZE, BULK_JOB_TTL_SECONDS, BULK_JOB_TIMEOUT_SECONDS
+from src.database.bulk import chunked, UpsertMode
+from src.models import AppModel
+from src.validators import AppValidator, BulkJob, get_list_adapter
+
+
+BULK_JOB_KEY_PREFIX = 'bulk_jobs'
+COUNTERS = ('total', 'processed', 'inserted', 'updated', 'failed')
+
+
+class BulkOperation(str, Enum):
+    CREATE: str = 'create'
+    UPSERT: str = 'upsert'
+
+
+class BulkJobStatus(str, Enum):
+    QUEUED: str = 'queued'
+    RUNNING: str = 'running'
+    COMPLETE: str = 'complete'
+    FAILED: str = 'failed'
+
+
+# Model name -> (model, validator per operation), filled by generate_route_class.
+# The worker imports the routes so it knows the same models.
+bulk_job_models: Dict[str, Tuple[Type[AppModel], Dict[BulkOperation, Type[AppValidator]]]] = {}
+
+
+def register_bulk_model(
+    ModelClass: Type[AppModel],
+    CreateValidatorClass: Type[AppValidator],
+    UpdateValidatorClass: Type[AppValidator],
+) -> None:
+    bulk_job_models[ModelClass.__name__] = (
+        ModelClass,
+        {
+            BulkOperation.CREATE: CreateValidatorClass,
+            BulkOperation.UPSERT: UpdateValidatorClass,
+        },
+    )
+
+
+def get_key(job_id: str, suffix: str = None) -> str:
+    key = f"{BULK_JOB_KEY_PREFIX}:{job_id}"
+    return key if suffix is None else f"{key}:{suffix}"
+
+
+def decode(raw: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+async def stage_bulk_job(
+    redis: ArqRedis,
+    ModelClass: Type[AppModel],
+    operation: BulkOperation,
+    items: List[AppValidator],
+    schema_name: str = SHARED_SCHEMA_NAME,
+    options: Dict = None,
+) -> str:
+    """Stages a bulk write in Redis and enqueues the job that runs it, so the request can return right away.
+    The payload is staged under its own key rather than passed as a job argument,
+    so the job itself stays small and the payload can be dropped as soon as it's written.
+
+    Args:
+        redis (ArqRedis): Queue connection, i.e. Bus.queue
+        ModelClass (Type[AppModel]): Model to write, must be registered with register_bulk_model
+        operation (BulkOperation): create_many or upsert_many
+        items (List[AppValidator]): Validated items
+        schema_name (str): Schema to write into, i.e. the caller's tenant schema
+        options (Dict): Extra arguments for the model method, e.g. {'copy': True}
+
+    Returns:
+        str: Job id to poll with get_bulk_job
+    """
+    job_id = uuid.uuid4().hex
+    validator_class = bulk_job_models[ModelClass.__name__][1][operation]
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(get_key(job_id, 'payload'), get_list_adapter(validator_class).dump_json(items), ex=BULK_JOB_TTL_SECONDS)
+        pipe.hset(get_key(job_id), mapping={
+            'model': ModelClass.__name__,
+            'operation': operation.value,
+            'schema_name': schema_name,
+            'options': json.dumps(options or {}),
+            'status': BulkJobStatus.QUEUED.value,
+            'error': '',
+            'created_at': time.time(),
+            # Set by the worker when it starts, and after every chunk
+            'started_at': '',
+            'heartbeat_at': '',
+            'total': len(items),
+            'processed': 0,
+            'inserted': 0,
+            'updated': 0,
+            'failed': 0,
+        })
+        pipe.expire(get_key(job_id), BULK_JOB_TTL_SECONDS)
+        await pipe.execute()
+
+    await redis.enqueue_job('run_bulk_job', job_id, _job_id=job_id)
+    return job_id
+
+
+async def get_bulk_job(
+    redis: ArqRedis,
+    job_id: str,
+    ModelClass: Type[AppModel],
+    schema_name: str = SHARED_SCHEMA_NAME,
+) -> Optional[BulkJob]:
+    """Reads the status and progress of a bulk job. Jobs of other models or schemas are not found,
+    so tenants can't poll each other's jobs.
+
+    Args:
+        redis (ArqRedis): Queue connection, i.e. Bus.queue
+        job_id (str): Id returned by stage_bulk_job
+        ModelClass (Type[AppModel]): Model the job was staged for
+        schema_name (str): Schema the job was staged for
+
+    Returns:
+        Optional[BulkJob]: Job status, None if not found or expired.
+    """
+    meta = decode(await redis.hgetall(get_key(job_id)))
+    if len(meta) == 0 or meta['model'] != ModelClass.__name__ or meta['schema_name'] != schema_name:
+        return None
+
+    ids = None
+    if meta['status'] == BulkJobStatus.COMPLETE.value:
+        ids = [int(id) for id in await redis.lrange(get_key(job_id, 'ids'), 0, -1)]
+
+    timestamps = {
+        name: datetime.fromtimestamp(float(meta[name]), tz=timezone.utc) if meta.get(name) else None
+        for name in ('created_at', 'started_at', 'heartbeat_at')
+    }
+    # The worker is gone if no chunk finished within the job timeout, arq would have cancelled it by then.
+    # Jobs aren't retried, so the status would otherwise stay running until the hash expires.
+    stale = (
+        meta['status'] == BulkJobStatus.RUNNING.value
+        and time.time() - float(meta.get('heartbeat_at') or meta['created_at']) > BULK_JOB_TIMEOUT_SECONDS
+    )
+
+    return BulkJob(
+        job_id=job_id,
+        operation=meta['operation'],
+        status=meta['status'],
+        stale=stale,
+        error=meta['error'] or None,
+        ids=ids,
+        **timestamps,
+        **{c: int(meta[c]) for c in COUNTERS},
+    )
+
+
+async def run_bulk_job(ctx: Dict, job_id: str) -> str:
+    """arq job that writes a staged payload, BULK_JOB_CHUNK_SIZE items at a time.
+    Each chunk commits on its own and updates the job's counters and heartbeat, so progress can be polled
+    and a failure only loses the chunk it happened in.
+
+    Args:
+        ctx (Dict): arq context
+        job_id (str): Id returned by stage_bulk_job
+    """
+    redis: ArqRedis = ctx['redis']
+    key = get_key(job_id)
+    meta = decode(await redis.hgetall(key))
+    payload = await redis.get(get_key(job_id, 'payload'))
+    if len(meta) == 0 or payload is None:
+        logger.error(f"Bulk job {job_id} expired before it ran.")
+        return f"Bulk job {job_id} expired"
+
+    ModelClass, validator_classes = bulk_job_models[meta['model']]
+    operation = BulkOperation(meta['operation'])
+    options = json.loads(meta['options'])
+    items = get_list_adapter(validator_classes[operation]).validate_json(payload)
+
+    try:
+        now = time.time()
+        await redis.hset(key, mapping={'status': BulkJobStatus.RUNNING.value, 'started_at': now, 'heartbeat_at': now})
+        for chunk in chunked(items, BULK_JOB_CHUNK_SIZE):
+            counts = {'processed': len(chunk)}
+            if operation == BulkOperation.CREATE:
+                if options.get('copy'):
+                    ids = await ModelClass.copy_many(items=chunk, schema_name=meta['schema_name'])
+                else:
+                    ids = await ModelClass.create_many(items=chunk, schema_name=meta['schema_name'])
+                counts['inserted'] = len(ids)
+            else:
+                res = await ModelClass.upsert_many(
+                    items=chunk,
+                    schema_name=meta['schema_name'],
+                    apply_none_values=False,
+                    mode=UpsertMode(options.get('mode', UpsertMode.SAVEPOINT.value)),
+                )
+                ids = res.ids
+                counts.update(inserted=res.inserted, updated=res.updated, failed=res.failed)
+
+            async with redis.pipeline(transaction=True) as pipe:
+                for name, value in counts.items():
+                    pipe.hincrby(key, name, value)
+                pipe.hset(key, 'heartbeat_at', time.time())
+                if len(ids) > 0:
+                    pipe.rpush(get_key(job_id, 'ids'), *ids)
+                    pipe.expire(get_key(job_id, 'ids'), BULK_JOB_TTL_SECONDS)
+                await pipe.execute()
+    except Exception as e:
+        logger.error(f"Bulk job {job_id} ({meta['model']} {operation.value}) failed: {e}")
+        await redis.hset(key, mapping={'status': BulkJobStatus.FAILED.value, 'error': str(e)})
+        raise
+    finally:
+        await redis.delete(get_key(job_id, 'payload'))
+
+    await redis.hset(key, 'status', BulkJobStatus.COMPLETE.value)
+    return f"Bulk job {job_id} wrote {len(items)} {meta['model']} items"
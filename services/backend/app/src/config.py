@@ -2,12 +2,22 @@
 import os
 
 
+def get_env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
 # Project
 PROJECT_NAME: str             = os.environ.get('PROJECT_NAME')
 
 # Project folders
 APP_SRC_FOLDER_ABS: str       = os.path.dirname(os.path.realpath(__file__))
 
+# Logging
+LOG_LEVEL: str                = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT: str               = os.environ.get('LOG_FORMAT', 'text')   # 'text' or 'json'
+# Fraction of records below WARNING to keep per logger, e.g. 'sqlalchemy.engine=0.01,src.models=0.1'
+LOG_SAMPLING: str             = os.environ.get('LOG_SAMPLING', '')
+
 # Maintenance
 IN_MAINTENANCE: int           = False
 
@@ -19,21 +29,66 @@ DATABASE_PASSWORD: str        = os.environ.get('DATABASE_PASSWORD')
 DATABASE_NAME: str            = os.environ.get('DATABASE_NAME')
 DATABASE_URL_SYNC: str        = f"postgresql+psycopg2://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 DATABASE_URL_ASYNC: str       = f"postgresql+asyncpg://{DATABASE_USERNAME}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+DATABASE_ECHO: bool           = get_env_bool('DATABASE_ECHO', False)
+
+# Database connection pool
+DATABASE_POOL_SIZE: int             = int(os.environ.get('DATABASE_POOL_SIZE', 20))
+DATABASE_POOL_MAX_OVERFLOW: int     = int(os.environ.get('DATABASE_POOL_MAX_OVERFLOW', 10))
+DATABASE_POOL_TIMEOUT: float        = float(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+DATABASE_POOL_RECYCLE: int          = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))    # Seconds, -1 to disable
+DATABASE_POOL_PRE_PING: bool        = get_env_bool('DATABASE_POOL_PRE_PING', True)
+DATABASE_POOL_WARMUP: int           = int(os.environ.get('DATABASE_POOL_WARMUP', 0))        # Connections to open at startup
+DATABASE_STATEMENT_CACHE_SIZE: int  = int(os.environ.get('DATABASE_STATEMENT_CACHE_SIZE', 100))
+# PgBouncer in transaction pooling mode can't keep prepared statements across transactions
+DATABASE_PGBOUNCER: bool            = get_env_bool('DATABASE_PGBOUNCER', False)
+# How connections are pointed at a tenant's schema:
+# 'schema_translate_map' renders the schema into every statement, so each tenant gets its own prepared statements.
+# 'search_path' sets the search_path per checkout, 'search_path_local' per transaction (SET LOCAL, PgBouncer safe).
+# Both share statements across tenants.
+DATABASE_TENANT_ROUTING: str        = os.environ.get('DATABASE_TENANT_ROUTING', 'schema_translate_map')
+
+# Query instrumentation
+DATABASE_SLOW_QUERY_SECONDS: float  = float(os.environ.get('DATABASE_SLOW_QUERY_SECONDS', 0))     # 0 to disable
+# Log the plan of slow queries. Reads are re-run with EXPLAIN (ANALYZE, BUFFERS)!
+DATABASE_SLOW_QUERY_EXPLAIN: bool   = get_env_bool('DATABASE_SLOW_QUERY_EXPLAIN', False)
 
 # Routes
 READ_ALL_LIMIT_DEFAULT: int   = int(os.environ.get('GET_ITEM_COUNT_DEFAULT', 100))
 READ_ALL_LIMIT_MAX: int       = int(os.environ.get('GET_ITEM_COUNT_MAX', 200))
+EXPORT_CHUNK_SIZE: int        = int(os.environ.get('EXPORT_CHUNK_SIZE', 10000))
+BULK_COPY_CHUNK_SIZE: int     = int(os.environ.get('BULK_COPY_CHUNK_SIZE', 50000))
+BULK_UPSERT_CHUNK_SIZE: int   = int(os.environ.get('BULK_UPSERT_CHUNK_SIZE', 5000))
+BULK_UPSERT_CONCURRENCY_MAX: int = int(os.environ.get('BULK_UPSERT_CONCURRENCY_MAX', 4))   # Connections one request may use for parallel chunks
+BULK_UPSERT_CONNECTIONS_MAX: int = int(os.environ.get('BULK_UPSERT_CONNECTIONS_MAX', 8))   # Connections all requests together may use for commit mode chunks, keep well below the pool size
+# Background bulk jobs (/bulk/async)
+BULK_JOB_CHUNK_SIZE: int      = int(os.environ.get('BULK_JOB_CHUNK_SIZE', 10000))        # Items per commit, and per progress update
+BULK_JOB_TTL_SECONDS: int     = int(os.environ.get('BULK_JOB_TTL_SECONDS', 86400))       # How long payloads and results are kept in Redis
+BULK_JOB_TIMEOUT_SECONDS: int = int(os.environ.get('BULK_JOB_TIMEOUT_SECONDS', 3600))
+# What to do with filters/sorts no index can serve: 'warn' (log) or 'reject' (400)
+READ_ALL_UNINDEXED_POLICY: str  = os.environ.get('READ_ALL_UNINDEXED_POLICY', 'warn')
+# Serialize ORM objects straight to JSON bytes with orjson instead of going through the response models
+FAST_JSON_RESPONSES: bool       = get_env_bool('FAST_JSON_RESPONSES', False)
 
 # Redis
 REDIS_HOST: str               = os.environ.get('REDIS_HOST')
 REDIS_PORT: str               = os.environ.get('REDIS_PORT')
+ENQUEUE_BATCH_SIZE: int       = int(os.environ.get('ENQUEUE_BATCH_SIZE', 1000))          # Jobs per round trip in Bus.enqueue_many
 
 # Auth
 JWT_SECRET_KEY                = os.environ['JWT_SECRET_KEY']
 JWT_REFRESH_SECRET_KEY        = os.environ['JWT_REFRESH_SECRET_KEY']
 ACCESS_TOKEN_EXPIRE_MINUTES   = 30
 REFRESH_TOKEN_EXPIRE_MINUTES  = 60 * 24 * 7  # 7 days
+PASSWORD_HASH_ROUNDS: int     = int(os.environ.get('PASSWORD_HASH_ROUNDS', 12))     # bcrypt cost factor
+PASSWORD_HASH_WORKERS: int    = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))     # Max concurrent hashes
+
+# Login lookup cache
+LOGIN_CACHE_TTL_SECONDS: float  = float(os.environ.get('LOGIN_CACHE_TTL_SECONDS', 60))     # 0 to disable
+LOGIN_CACHE_MAX_SIZE: int       = int(os.environ.get('LOGIN_CACHE_MAX_SIZE', 10000))
+LOGIN_CACHE_REDIS: bool         = get_env_bool('LOGIN_CACHE_REDIS', False)                # Share the cache between processes
 
 # Multi-tenant
 SHARED_SCHEMA_NAME: str       = 'shared'
 TENANT_SCHEMA_NAME: str       = 'tenant'
+TENANT_SCHEMA_POOL_SIZE: int  = int(os.environ.get('TENANT_SCHEMA_POOL_SIZE', 10))    # Pre-cloned schemas kept ready, 0 to disable
+TENANT_MIGRATION_CONCURRENCY: int = int(os.environ.get('TENANT_MIGRATION_CONCURRENCY', 4))   # Worker processes migrating tenant schemas
@@ -0,0 +1,161 @@
+import asyncio
+from enum import Enum
+from typing import Iterable, List, Sequence, Tuple
+
+from asyncpg import Connection
+from sqlalchemy import Table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import BULK_UPSERT_CONNECTIONS_MAX
+from src.logging.service import logger
+from src.database.service import DatabaseService
+from src.database.exceptions import get_constraint_name, get_pgcode
+
+
+class UpsertMode(str, Enum):
+    # All chunks in the caller's transaction, all or nothing
+    TRANSACTION: str = 'transaction'
+    # All chunks in the caller's transaction, a failed chunk is rolled back to its savepoint and skipped
+    SAVEPOINT: str = 'savepoint'
+    # Each chunk commits on its own connection, so locks are only held for one chunk. Allows parallel chunks.
+    COMMIT: str = 'commit'
+
+
+# Commit mode chunks each check out an extra connection while the request still holds its own,
+# so the total is capped process-wide, not just per request, to keep concurrent bulk requests from draining the pool
+commit_mode_connections = asyncio.Semaphore(BULK_UPSERT_CONNECTIONS_MAX)
+
+
+class UpsertResult:
+    """Outcome of a chunked upsert, merged over all chunks in input order."""
+
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.inserted: int = 0
+        self.updated: int = 0
+        # Items in chunks that were rolled back, and why. Only the error codes, these are returned to clients.
+        self.failed: int = 0
+        self.errors: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return self.inserted + self.updated
+
+    def add_rows(self, rows: Sequence[Tuple[int, bool]]) -> None:
+        """Adds the (id, inserted) rows returned by one chunk."""
+        for id, inserted in rows:
+            self.ids.append(id)
+            if inserted:
+                self.inserted += 1
+            else:
+                self.updated += 1
+
+    def add_failure(self, chunk_index: int, item_count: int, error: Exception) -> None:
+        """Counts a chunk that was rolled back. The full error, with its statement and parameters, is for the server log only."""
+        self.failed += item_count
+        message = f"Chunk {chunk_index} ({item_count} items) failed with SQLSTATE {get_pgcode(error)}"
+        constraint_name = get_constraint_name(error)
+        if constraint_name is not None:
+            message += f" on constraint {constraint_name}"
+        self.errors.append(message)
+
+
+def chunked(records: Sequence[Tuple], chunk_size: int) -> Iterable[Sequence[Tuple]]:
+    for i in range(0, len(records), chunk_size):
+        yield records[i:i + chunk_size]
+
+
+def quote_table_name(schema_name: str, table_name: str) -> str:
+    return f'"{table_name}"' if schema_name is None else f'"{schema_name}"."{table_name}"'
+
+
+async def get_driver_connection(session: AsyncSession) -> Connection:
+    """Gets the raw asyncpg connection behind a session, e.g. to use COPY which SQLAlchemy doesn't expose.
+    The session's transaction is begun first, so whatever runs on the raw connection commits or rolls back with it.
+
+    Args:
+        session (AsyncSession): Session whose connection to unwrap
+
+    Returns:
+        Connection: asyncpg connection checked out by the session, in the session's transaction
+    """
+    # The asyncpg adapter only sends BEGIN with the first statement, until then the raw connection is in autocommit
+    await session.execute(text('select 1'))
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def copy_records(
+    session: AsyncSession,
+    table: Table,
+    columns: List[str],
+    records: Sequence[Tuple],
+    schema_name: str,
+    chunk_size: int,
+) -> int:
+    """Bulk loads records straight into the table using binary COPY, chunk_size records per COPY.
+
+    Args:
+        session (AsyncSession): Session to run on
+        table (Table): Target table
+        columns (List[str]): Columns in record order
+        records (Sequence[Tuple]): Rows to load
+        schema_name (str): Tenant/shared schema name, resolved to the physical schema via the schema context
+        chunk_size (int): Max records per COPY
+
+    Returns:
+        int: Number of records loaded
+    """
+    target_schema = DatabaseService.resolve_schema_name(table.schema, schema_name)
+    driver_conn = await get_driver_connection(session)
+    for chunk in chunked(records, chunk_size):
+        await driver_conn.copy_records_to_table(
+            table.name,
+            records=chunk,
+            columns=columns,
+            schema_name=target_schema,
+        )
+    return len(records)
+
+
+async def copy_records_returning_ids(
+    session: AsyncSession,
+    table: Table,
+    columns: List[str],
+    records: Sequence[Tuple],
+    schema_name: str,
+    chunk_size: int,
+) -> List[int]:
+    """Same as copy_records but returns the generated ids in input order.
+    COPY can't return anything, so records are copied into a temporary staging table that inherits the
+    target's defaults (which draws ids from the target's sequence), then moved across with a single
+    INSERT ... SELECT ... RETURNING id.
+
+    Args:
+        session (AsyncSession): Session to run on
+        table (Table): Target table
+        columns (List[str]): Columns in record order. Must not include id.
+        records (Sequence[Tuple]): Rows to load
+        schema_name (str): Tenant/shared schema name, resolved to the physical schema via the schema context
+        chunk_size (int): Max records per COPY
+
+    Returns:
+        List[int]: Ids of the new rows, in input order
+    """
+    target = quote_table_name(DatabaseService.resolve_schema_name(table.schema, schema_name), table.name)
+    staging = f"staging_{table.name}"
+    driver_conn = await get_driver_connection(session)
+    await driver_conn.execute(f'create temporary table "{staging}" (like {target} including defaults) on commit drop')
+    for chunk in chunked(records, chunk_size):
+        await driver_conn.copy_records_to_table(
+            staging,
+            records=chunk,
+            columns=columns,
+        )
+    rows = await driver_conn.fetch(f'insert into {target} select * from "{staging}" order by id returning id')
+    await driver_conn.execute(f'drop table "{staging}"')
+
+    logger.info(f"Copied {len(rows)} rows into {target}.")
+    # Staging ids were drawn from one sequence in COPY order, but RETURNING order isn't guaranteed
+    return sorted(r['id'] for r in rows)
@@ -8,26 +8,45 @@ from asyncpg.exceptions import (
 from fastapi import HTTPException, status
 
 
+# SQLAlchemy wraps driver errors, raw asyncpg calls (e.g. COPY) raise them directly
+def get_pgcode(e: Exception) -> str:
+    if isinstance(e, PostgresError):
+        return e.sqlstate
+    return getattr(getattr(e, 'orig', None), 'pgcode', None)
+
+
+def get_constraint_name(e: Exception) -> str:
+    if isinstance(e, PostgresError):
+        return e.constraint_name
+    return getattr(getattr(getattr(e, 'orig', None), '__context__', None), 'constraint_name', None)
+
+
+def get_detail(e: Exception) -> str:
+    if isinstance(e, PostgresError):
+        return str(e)
+    return str(e.orig.__context__)
+
+
 # If original exception has valid pgcode return that class, otherwise UnkownPostgresError
 def ExceptionProxy(e: IntegrityError) -> Exception:
-    klass = PostgresError.get_message_class_for_sqlstate(e.orig.pgcode)
+    klass = PostgresError.get_message_class_for_sqlstate(get_pgcode(e))
     return e.__class__ if klass == UnknownPostgresError else klass
 
 
 # Alternative version of the above that raises the exception
 def handle_exception(e: IntegrityError) -> None:
-    klass = PostgresError.get_message_class_for_sqlstate(e.orig.pgcode)
+    klass = PostgresError.get_message_class_for_sqlstate(get_pgcode(e))
 
     # Switch to raise specific exception class
     if klass == UniqueViolationError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail=str(e.orig.__context__)
+            detail=get_detail(e)
         )
     elif klass == ForeignKeyViolationError:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=str(e.orig.__context__),
+            detail=get_detail(e),
         )
     else:
         raise e
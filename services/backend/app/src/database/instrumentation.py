@@ -0,0 +1,147 @@
+import functools
+import inspect
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.logging.service import logger
+from src.config import (
+    SHARED_SCHEMA_NAME,
+    TENANT_SCHEMA_NAME,
+    DATABASE_SLOW_QUERY_SECONDS,
+    DATABASE_SLOW_QUERY_EXPLAIN,
+)
+from src.metrics.service import registry
+
+
+# Execution option carrying (model, operation) for statements run outside tag_queries, e.g. streamed ones
+QUERY_TAGS_OPTION = 'query_tags'
+
+# Execution option carrying the schema context, which the schema_translate_map doesn't show with search_path routing
+SCHEMA_NAME_OPTION = 'schema_name'
+
+# Tagged operations that only read, so their statements can be executed again by EXPLAIN ANALYZE
+READ_OPERATIONS = frozenset({
+    'read_by_id', 'read_by_ids', 'read_by_identifier', 'read_all', 'read_page', 'popo_read_all', 'stream_rows',
+    'get_count', 'get_max_id',
+})
+# A query reads from tables. Without FROM it's a function call like pg_advisory_lock() or clone_schema().
+FROM_CLAUSE = re.compile(r'\bfrom\b', re.IGNORECASE)
+
+# (model, operation) of the CRUD call currently running
+current_query_tags: ContextVar[Tuple[str, str]] = ContextVar('current_query_tags', default=('', ''))
+
+query_duration = registry.histogram(
+    'db_query_duration_seconds',
+    'Statement execution time, by model, CRUD operation and schema.',
+    ('model', 'operation', 'schema'),
+)
+pool_checkouts = registry.counter('db_pool_checkouts_total', 'Connections handed out by the pool.')
+pool_checkout_wait = registry.histogram('db_pool_checkout_wait_seconds', 'Time a session waited for a connection, including connecting.')
+pool_size = registry.gauge('db_pool_size', 'Configured number of persistent connections.')
+pool_checked_out = registry.gauge('db_pool_checked_out', 'Connections currently in use.')
+pool_checked_in = registry.gauge('db_pool_checked_in', 'Idle connections.')
+pool_overflow = registry.gauge('db_pool_overflow', 'Connections open beyond the pool size, negative while the pool is not yet full.')
+
+
+def tag_queries(fn: Callable) -> Callable:
+    """Tags the statements a CRUD method runs with its model and name, for the query metrics.
+    Apply beneath @classmethod. Coroutine functions only, async generators can't safely reset a ContextVar.
+    """
+    if not inspect.iscoroutinefunction(fn):
+        raise TypeError(f"tag_queries only supports coroutine functions, got {fn.__qualname__}.")
+
+    @functools.wraps(fn)
+    async def wrapper(cls_or_self: Any, *args, **kwargs):
+        model = cls_or_self.__name__ if isinstance(cls_or_self, type) else type(cls_or_self).__name__
+        token = current_query_tags.set((model, fn.__name__))
+        try:
+            return await fn(cls_or_self, *args, **kwargs)
+        finally:
+            current_query_tags.reset(token)
+
+    return wrapper
+
+
+def get_schema_label(execution_options: dict) -> str:
+    schema_name = execution_options.get(SCHEMA_NAME_OPTION) or execution_options.get('schema_translate_map', {}).get(TENANT_SCHEMA_NAME)
+    return SHARED_SCHEMA_NAME if schema_name is None else schema_name
+
+
+def is_plain_read(operation: str, statement: str) -> bool:
+    """Whether a statement is safe to execute twice, i.e. a query run by a read operation.
+    A select alone isn't enough: select pg_advisory_lock(...) would take its lock again.
+    """
+    return operation in READ_OPERATIONS and statement.lstrip().lower().startswith('select') and FROM_CLAUSE.search(statement) is not None
+
+
+def explain(conn, statement: str, parameters: Any, analyze: bool = False) -> str:
+    # ANALYZE executes the statement again
+    options = '(ANALYZE, BUFFERS)' if analyze else ''
+    cursor = conn.connection.cursor()
+    try:
+        # A failed EXPLAIN must not abort the caller's transaction
+        cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(f"EXPLAIN {options} {statement}", parameters)
+            plan = '\n'.join(r[0] for r in cursor.fetchall())
+        except:
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            raise
+        cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    finally:
+        cursor.close()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_time = getattr(context, '_query_start_time', None)
+    if start_time is None:
+        return
+    elapsed = time.perf_counter() - start_time
+
+    model, operation = context.execution_options.get(QUERY_TAGS_OPTION) or current_query_tags.get()
+    schema = get_schema_label(context.execution_options)
+    query_duration.observe(elapsed, model=model, operation=operation, schema=schema)
+
+    if DATABASE_SLOW_QUERY_SECONDS > 0 and elapsed >= DATABASE_SLOW_QUERY_SECONDS:
+        msg = f"Slow query ({elapsed:.3f}s) in {model}.{operation} on '{schema}': {statement}"
+        # Can't run a second statement while a server-side cursor is open
+        if DATABASE_SLOW_QUERY_EXPLAIN and not executemany and not context.execution_options.get('stream_results'):
+            try:
+                msg += f"\n{explain(conn, statement, parameters, analyze=is_plain_read(operation, statement))}"
+            except Exception as e:
+                msg += f"\nEXPLAIN failed: {e}"
+        logger.warning(msg)
+
+
+def on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_checkouts.inc()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registers the query timing and pool hooks on a (sync) engine, i.e. AsyncEngine.sync_engine.
+
+    Args:
+        engine (Engine): Engine to instrument
+    """
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine.pool, 'checkout', on_pool_checkout)
+
+    async def collect_pool_metrics():
+        pool_size.set(engine.pool.size())
+        pool_checked_out.set(engine.pool.checkedout())
+        pool_checked_in.set(engine.pool.checkedin())
+        pool_overflow.set(engine.pool.overflow())
+
+    registry.add_collector(collect_pool_metrics)
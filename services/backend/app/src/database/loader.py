@@ -0,0 +1,73 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+
+class ModelLoader:
+    """Dataloader-style batching of read_by_id calls, one instance per request (see UnitOfWork).
+    Calls made within the same event loop tick, e.g. from coroutines run with asyncio.gather,
+    are queued and resolved together by a single read_by_ids query per model and schema,
+    so resolving N related objects costs one query instead of N.
+
+    The first call of a tick leads: it yields once so the others can queue their ids,
+    then runs the queries in its own task. No extra task touches the request's session,
+    and the UnitOfWork's lock orders the queries with any other model calls running concurrently.
+
+    Nothing is cached beyond the batch: a later read_by_id in the same request queries again,
+    so it sees writes made in between.
+    """
+
+    def __init__(self) -> None:
+        # (model, schema) -> id -> future of the object, for the batch being queued
+        self._pending: Optional[Dict[Tuple[Type, str], Dict[int, asyncio.Future]]] = None
+        self.batch_count = 0
+
+    async def load(self, model_class: Type, id: int, schema_name: str) -> Optional[Any]:
+        """Queues a read_by_id and waits for its batch.
+
+        Args:
+            model_class (Type): Model to read, must provide read_by_ids
+            id (int): Id of the object
+            schema_name (str): Schema to read from
+
+        Returns:
+            Optional[Any]: The object, None if not found.
+        """
+        is_leader = self._pending is None
+        if is_leader:
+            self._pending = {}
+        batch = self._pending.setdefault((model_class, schema_name), {})
+        future = batch.get(id)
+        if future is None:
+            future = batch[id] = asyncio.get_running_loop().create_future()
+
+        if is_leader:
+            pending = None
+            try:
+                # Let every coroutine started in this tick queue its id
+                await asyncio.sleep(0)
+                pending, self._pending = self._pending, None
+                await self._flush(pending)
+            finally:
+                if pending is None:
+                    pending, self._pending = self._pending, None
+                # Only left undone if the leader was cancelled, don't leave the others waiting forever
+                for batch in pending.values():
+                    for other in batch.values():
+                        if not other.done():
+                            other.cancel()
+        return await future
+
+    async def _flush(self, pending: Dict[Tuple[Type, str], Dict[int, asyncio.Future]]) -> None:
+        for (model_class, schema_name), batch in pending.items():
+            self.batch_count += 1
+            try:
+                items: List[Any] = await model_class.read_by_ids(list(batch), schema_name=schema_name)
+            except Exception as e:
+                for future in batch.values():
+                    future.set_exception(e)
+                continue
+
+            by_id = {item.id: item for item in items}
+            for id, future in batch.items():
+                future.set_result(by_id.get(id))
@@ -1,11 +1,16 @@
 from __future__ import annotations
+import asyncio
 import os
+import time
+import uuid
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import Enum
 from functools import lru_cache
-from typing import AsyncIterator
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
 
 from fastapi import HTTPException, status
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database, drop_database
 from sqlalchemy import (
@@ -15,6 +20,8 @@ from sqlalchemy import (
 from sqlalchemy.schema import CreateSchema
 
 from src.logging.service import logger
+from src.database.loader import ModelLoader
+from src.database.instrumentation import instrument_engine, pool_checkout_wait, SCHEMA_NAME_OPTION
 from src.config import (
     APP_SRC_FOLDER_ABS,
     IN_MAINTENANCE,
@@ -22,11 +29,86 @@ from src.config import (
     DATABASE_NAME,
     DATABASE_URL_SYNC,
     DATABASE_URL_ASYNC,
+    DATABASE_ECHO,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_STATEMENT_CACHE_SIZE,
+    DATABASE_PGBOUNCER,
+    DATABASE_TENANT_ROUTING,
     SHARED_SCHEMA_NAME,
     TENANT_SCHEMA_NAME,
 )
 
 
+class UnitOfWork:
+    """A single session (and connection) shared by all model calls within one request.
+    The schema context is only re-applied when a call targets a different schema than the previous one,
+    and the work is committed once at the end of the request.
+    Concurrent read_by_id calls within the request are batched by its ModelLoader.
+    A session can only run one operation at a time, so model calls running concurrently
+    (e.g. with asyncio.gather) take turns on it, see acquire.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.schema_name: str = None
+        self.loader = ModelLoader()
+        self._lock = asyncio.Lock()
+        self._owner: asyncio.Task = None
+        # Run once the work is committed, see DatabaseService.after_commit
+        self.after_commit_callbacks: List[Callable[[], Awaitable]] = []
+
+    async def run_after_commit_callbacks(self) -> None:
+        callbacks, self.after_commit_callbacks = self.after_commit_callbacks, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                # The work is committed, a failing side effect must not fail the request
+                logger.error(f"After commit callback failed: {e}")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Holds the session for one model call. Reentrant within a task, so a model call can make nested ones."""
+        task = asyncio.current_task()
+        if self._owner is task:
+            yield
+            return
+
+        async with self._lock:
+            self._owner = task
+            try:
+                yield
+            finally:
+                self._owner = None
+
+    def is_held(self) -> bool:
+        """Whether the current task holds the session, i.e. is inside a model call."""
+        return self._owner is asyncio.current_task()
+
+    async def use_schema(self, schema_name: str) -> AsyncSession:
+        if schema_name != self.schema_name:
+            conn = await DatabaseService.connect(self.session)
+            # Modifies the checked out connection in place
+            await conn.execution_options(**DatabaseService.get_schema_context(schema_name))
+            await DatabaseService.set_search_path(conn, schema_name)
+            self.schema_name = schema_name
+        return self.session
+
+
+# The UnitOfWork of the current request, if any
+current_unit_of_work: ContextVar[UnitOfWork] = ContextVar('current_unit_of_work', default=None)
+
+
+class TenantRouting(str, Enum):
+    SCHEMA_TRANSLATE_MAP: str = 'schema_translate_map'
+    SEARCH_PATH: str = 'search_path'
+    SEARCH_PATH_LOCAL: str = 'search_path_local'
+
+
 # TODO: Proper singleton
 class DatabaseService:
     _instance = None
@@ -43,9 +125,15 @@ class DatabaseService:
         self._async_engine: AsyncEngine = create_async_engine(
             DATABASE_URL_ASYNC,
             future=True,
-            echo=True,
-            # pool_size=50,
+            echo=DATABASE_ECHO,
+            pool_size=DATABASE_POOL_SIZE,
+            max_overflow=DATABASE_POOL_MAX_OVERFLOW,
+            pool_timeout=DATABASE_POOL_TIMEOUT,
+            pool_recycle=DATABASE_POOL_RECYCLE,
+            pool_pre_ping=DATABASE_POOL_PRE_PING,
+            connect_args=__class__.get_connect_args(),
         )
+        instrument_engine(self._async_engine.sync_engine)
 
         self._async_session_maker: AsyncSession = sessionmaker(
             self._async_engine,
@@ -54,22 +142,154 @@ class DatabaseService:
         )
 
     @classmethod
-    def get_schema_context(cls, schema_name: str = SHARED_SCHEMA_NAME) -> None:
-        options = {}
+    def get_async_engine(cls) -> AsyncEngine:
+        return cls.get()._async_engine
+
+    @classmethod
+    def get_connect_args(cls) -> Dict:
+        """asyncpg connection arguments for the statement caches.
+
+        Returns:
+            Dict: Arguments for create_async_engine's connect_args
+        """
+        if DATABASE_PGBOUNCER:
+            # Server-side prepared statements don't survive PgBouncer transaction pooling,
+            # so disable both caches and use unique statement names to avoid collisions.
+            return {
+                'statement_cache_size': 0,
+                'prepared_statement_cache_size': 0,
+                'prepared_statement_name_func': lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        return {
+            'statement_cache_size': DATABASE_STATEMENT_CACHE_SIZE,
+            'prepared_statement_cache_size': DATABASE_STATEMENT_CACHE_SIZE,
+        }
+
+    @classmethod
+    async def warm_up(cls, connection_count: int) -> None:
+        """Eagerly opens connections so that the first requests don't pay for connection setup.
+        Connections are all checked out at once to force the pool to create distinct ones,
+        then returned to the pool.
+
+        Args:
+            connection_count (int): Number of connections to open, capped at the pool capacity.
+        """
+        connection_count = min(connection_count, DATABASE_POOL_SIZE + DATABASE_POOL_MAX_OVERFLOW)
+        if connection_count <= 0:
+            return
+
+        logger.info(f"Warming up database pool with {connection_count} connections...")
+        engine = cls.get_async_engine()
+        connections = await asyncio.gather(*[engine.connect() for _ in range(connection_count)])
+        try:
+            await asyncio.gather(*[c.execute(text('select 1')) for c in connections])
+        finally:
+            await asyncio.gather(*[c.close() for c in connections])
+        logger.info('Database pool warmed up.')
+
+    @classmethod
+    def get_schema_context(
+        cls,
+        schema_name: str = SHARED_SCHEMA_NAME,
+        routing: TenantRouting = TenantRouting(DATABASE_TENANT_ROUTING),
+    ) -> Dict:
+        options = {SCHEMA_NAME_OPTION: schema_name}
         if schema_name == SHARED_SCHEMA_NAME:
             options['schema_translate_map'] = { 'tenant': None }
-        else:
+        elif routing == TenantRouting.SCHEMA_TRANSLATE_MAP:
             options['schema_translate_map'] = { 'tenant': schema_name, 'shared': None }
+        else:
+            # The same for every tenant, the search_path picks the tenant's tables
+            options['schema_translate_map'] = { 'tenant': None, 'shared': None }
         return options
 
+    @classmethod
+    def get_search_path(cls, schema_name: str = SHARED_SCHEMA_NAME) -> str:
+        if schema_name == SHARED_SCHEMA_NAME:
+            return '"$user", public'
+        return '"' + schema_name.replace('"', '""') + '", public'
+
+    @classmethod
+    async def set_search_path(
+        cls,
+        conn: AsyncConnection,
+        schema_name: str = SHARED_SCHEMA_NAME,
+        routing: TenantRouting = TenantRouting(DATABASE_TENANT_ROUTING),
+    ) -> None:
+        """Points the connection's search_path at the schema context when routing tenants by search_path.
+        Statements then leave tenant tables unqualified, so they are the same SQL, and share the same
+        prepared statements, for every tenant. Postgres re-parses a prepared statement when the search_path changed.
+
+        Args:
+            conn (AsyncConnection): Connection to set up, with a transaction begun for SEARCH_PATH_LOCAL
+            schema_name (str): Schema context
+            routing (TenantRouting): Routing mode
+        """
+        if routing == TenantRouting.SCHEMA_TRANSLATE_MAP:
+            return
+        await conn.execute(
+            text('select set_config(\'search_path\', :search_path, :is_local)'),
+            {'search_path': cls.get_search_path(schema_name), 'is_local': routing == TenantRouting.SEARCH_PATH_LOCAL},
+        )
+
+    @classmethod
+    def resolve_schema_name(cls, table_schema: str, schema_name: str = SHARED_SCHEMA_NAME) -> str:
+        """Resolves the physical schema a table lives in for the given schema context,
+        e.g. for raw driver calls that bypass SQLAlchemy's schema_translate_map.
+
+        Args:
+            table_schema (str): Schema the table is declared in, e.g. 'tenant'
+            schema_name (str): Schema context, as passed to async_session
+
+        Returns:
+            str: Physical schema name, or None to resolve via the search_path.
+        """
+        schema_translate_map = cls.get_schema_context(schema_name, routing=TenantRouting.SCHEMA_TRANSLATE_MAP)['schema_translate_map']
+        return schema_translate_map.get(table_schema, table_schema)
+
+    @classmethod
+    async def connect(cls, session: AsyncSession, execution_options: Dict = None) -> AsyncConnection:
+        """Gets the session's connection, recording how long the checkout took if it had none yet.
+
+        Args:
+            session (AsyncSession): Session to get the connection of
+            execution_options (Dict): Options for a newly checked out connection
+
+        Returns:
+            AsyncConnection: The session's connection
+        """
+        if session.in_transaction():
+            return await session.connection(execution_options=execution_options)
+        s = time.perf_counter()
+        conn = await session.connection(execution_options=execution_options)
+        pool_checkout_wait.observe(time.perf_counter() - s)
+        return conn
+
+    @classmethod
+    def check_maintenance(cls) -> None:
+        if IN_MAINTENANCE:
+            logger.error("Request received during maintenance window.")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Service is currently under maintenance."
+            )
+
     @classmethod
     @asynccontextmanager
-    async def async_session(cls, schema_name: str = SHARED_SCHEMA_NAME) -> AsyncIterator[AsyncSession]:
+    async def async_session(
+        cls,
+        schema_name: str = SHARED_SCHEMA_NAME,
+        use_unit_of_work: bool = True,
+    ) -> AsyncIterator[AsyncSession]:
         """Async Context Manager to create a session with a specific schema context that auto commits.
         Will lazy init db service if not already done.
+        Within a request that opened a UnitOfWork the request's session is reused instead,
+        and committing is left to the UnitOfWork.
 
         Args:
             schema_name (str): Database Schema Name for use with e.g. 'SELECT * FROM {schema_name}.some_table'
+            use_unit_of_work (bool): Set to False for work that must run on its own connection,
+                e.g. concurrent work or work that outlives the request.
 
         Returns:
             AsyncSession: Async Session with the schema context set.
@@ -77,16 +297,18 @@ class DatabaseService:
         Yields:
             Iterator[AsyncSession]: Async Session with the schema context set.
         """
-        if IN_MAINTENANCE:
-            logger.error("Request received during maintenance window.")
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Service is currently under maintenance."
-            )
+        unit_of_work = current_unit_of_work.get()
+        if use_unit_of_work and unit_of_work is not None:
+            async with unit_of_work.acquire():
+                yield await unit_of_work.use_schema(schema_name)
+            return
+
+        cls.check_maintenance()
 
         # Handle tenant switch
         session = cls.get()._async_session_maker()
-        await session.connection(execution_options=cls.get_schema_context(schema_name))
+        conn = await cls.connect(session, execution_options=cls.get_schema_context(schema_name))
+        await cls.set_search_path(conn, schema_name)
 
         try:
             yield session
@@ -97,6 +319,47 @@ class DatabaseService:
         finally:
             await session.close()
 
+    @classmethod
+    async def unit_of_work(cls) -> AsyncIterator[UnitOfWork]:
+        """FastAPI dependency that opens one session for the whole request.
+        Model calls made while handling the request share it, and it is committed once at the end,
+        or rolled back if the request failed.
+
+        Yields:
+            Iterator[UnitOfWork]: The request's unit of work
+        """
+        cls.check_maintenance()
+
+        session = cls.get()._async_session_maker()
+        unit_of_work = UnitOfWork(session)
+        token = current_unit_of_work.set(unit_of_work)
+        try:
+            yield unit_of_work
+            await session.commit()
+        except:
+            await session.rollback()
+            raise
+        finally:
+            current_unit_of_work.reset(token)
+            await session.close()
+        await unit_of_work.run_after_commit_callbacks()
+
+    @classmethod
+    async def after_commit(cls, callback: Callable[[], Awaitable]) -> None:
+        """Runs a side effect of a write, e.g. a cache invalidation, once the write is committed.
+        Within a request the UnitOfWork commits at the end, so the callback is deferred until then,
+        and dropped if the request is rolled back. Otherwise async_session has already committed, so it runs right away.
+        Running it earlier would let a concurrent reader re-cache the row from before the write.
+
+        Args:
+            callback (Callable[[], Awaitable]): Coroutine function without arguments
+        """
+        unit_of_work = current_unit_of_work.get()
+        if unit_of_work is not None:
+            unit_of_work.after_commit_callbacks.append(callback)
+        else:
+            await callback()
+
     @classmethod
     def create_db(cls):
         if not database_exists(url=DATABASE_URL_SYNC):
@@ -177,6 +440,101 @@ class DatabaseService:
         logger.warning("Schema cloned.")
         sync_engine.dispose()
 
+    @classmethod
+    @asynccontextmanager
+    async def advisory_lock(cls, name: str) -> AsyncIterator[AsyncConnection]:
+        """Holds a session-level advisory lock on a dedicated connection, waiting without blocking the event loop.
+        The lock is keyed on a hash of the name, so e.g. f"provision:{schema_name}" serialises work on one schema only.
+
+        Args:
+            name (str): Lock name
+
+        Yields:
+            Iterator[AsyncConnection]: The connection holding the lock, free to use for the locked work.
+        """
+        async with cls.get_async_engine().connect() as conn:
+            await conn.execute(text('select pg_advisory_lock(hashtextextended(:name, 0))'), {'name': name})
+            await conn.commit()
+            try:
+                yield conn
+            finally:
+                # Discard failed work before releasing the lock
+                await conn.rollback()
+                await conn.execute(text('select pg_advisory_unlock(hashtextextended(:name, 0))'), {'name': name})
+                await conn.commit()
+
+    @classmethod
+    async def schema_exists(cls, conn: AsyncConnection, schema_name: str) -> bool:
+        res = await conn.execute(text('select 1 from pg_namespace where nspname = :name'), {'name': schema_name})
+        return res.scalar() is not None
+
+    @classmethod
+    async def get_schema_revision(cls, conn: AsyncConnection | AsyncSession, schema_name: str = 'public') -> str:
+        """Gets the alembic revision recorded in a schema's alembic_version table.
+
+        Returns:
+            str: Revision, empty if the schema has no version table (or row).
+        """
+        if (await conn.execute(text('select to_regclass(:table)'), {'table': f'"{schema_name}".alembic_version'})).scalar() is None:
+            return ''
+        return (await conn.execute(text(f'select version_num from "{schema_name}".alembic_version'))).scalar() or ''
+
+    @classmethod
+    async def set_schema_revision(cls, conn: AsyncConnection | AsyncSession, schema_name: str, revision: str) -> None:
+        """Records the alembic revision a tenant schema is at in its own alembic_version table,
+        which the tenant migrations start from. Tenant schemas are cloned from the template,
+        whose revision lives in public, so every clone needs this.
+
+        Args:
+            conn (AsyncConnection | AsyncSession): Connection, in the transaction that creates the schema
+            schema_name (str): Tenant schema
+            revision (str): Revision the schema's tables are at
+        """
+        await conn.execute(text(f'create table if not exists "{schema_name}".alembic_version (version_num varchar(32) not null primary key)'))
+        await conn.execute(text(f'delete from "{schema_name}".alembic_version'))
+        await conn.execute(text(f'insert into "{schema_name}".alembic_version (version_num) values (:revision)'), {'revision': revision})
+
+    @classmethod
+    async def clone_db_schema_async(
+        cls,
+        source_schema_name: str,
+        target_schema_name: str,
+        record_revision: bool = False,
+        comment: str = None,
+    ) -> bool:
+        """Async version of clone_db_schema, on the app's engine.
+        Creates the target schema. Idempotent, also under concurrency: a clone of the same target waits
+        for the one in progress and then finds the schema exists.
+
+        Args:
+            source_schema_name (str): Schema to clone
+            target_schema_name (str): Schema to clone into
+            record_revision (bool): Record the current public alembic revision in the clone (see set_schema_revision)
+                in the same transaction, for tenant schemas cloned from the template.
+            comment (str): Schema comment to set in the same transaction, e.g. the revision pooled schemas are tagged with.
+
+        Returns:
+            bool: True if the schema was cloned, False if the target existed already.
+        """
+        async with cls.get_async_engine().begin() as conn:
+            await conn.execute(text('select pg_advisory_xact_lock(hashtextextended(:name, 0))'), {'name': f"schema:{target_schema_name}"})
+            if await cls.schema_exists(conn, target_schema_name):
+                logger.info(f"Schema '{target_schema_name}' already exists, not cloning.")
+                return False
+            logger.warning(f"Cloning schema '{source_schema_name}' to '{target_schema_name}'...")
+            await conn.execute(
+                text('select public.clone_schema(cast(:source as text), cast(:target as text))'),
+                {'source': source_schema_name, 'target': target_schema_name},
+            )
+            if record_revision:
+                revision = await cls.get_schema_revision(conn)
+                if revision != '':
+                    await cls.set_schema_revision(conn, target_schema_name, revision)
+            if comment is not None:
+                await conn.execute(text(f"""comment on schema "{target_schema_name}" is '{comment.replace("'", "''")}'"""))
+        logger.warning('Schema cloned.')
+        return True
+
     # TODO: Do properly online with alembic
     @classmethod
     def run_migrations(cls):
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, List, Sequence
+
+
+class ExportFormat(str, Enum):
+    NDJSON: str = 'ndjson'
+    CSV: str = 'csv'
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: 'application/x-ndjson',
+    ExportFormat.CSV: 'text/csv',
+}
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+async def ndjson_chunks(
+    columns: List[str],
+    partitions: AsyncIterator[Sequence[Sequence]],
+) -> AsyncIterator[str]:
+    """Serializes partitions of raw rows to newline delimited JSON, one chunk of text per partition.
+
+    Args:
+        columns (List[str]): Column names, in row order
+        partitions (AsyncIterator[Sequence[Sequence]]): Partitions of row tuples
+
+    Yields:
+        str: One line per row
+    """
+    encoder = json.JSONEncoder(default=json_default, separators=(',', ':'))
+    async for rows in partitions:
+        yield ''.join([encoder.encode(dict(zip(columns, row))) + '\n' for row in rows])
+
+
+async def csv_chunks(
+    columns: List[str],
+    partitions: AsyncIterator[Sequence[Sequence]],
+) -> AsyncIterator[str]:
+    """Serializes partitions of raw rows to CSV with a header line, one chunk of text per partition.
+
+    Args:
+        columns (List[str]): Column names, in row order
+        partitions (AsyncIterator[Sequence[Sequence]]): Partitions of row tuples
+
+    Yields:
+        str: CSV text
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    # Header only for empty tables
+    if buffer.tell() > 0:
+        yield buffer.getvalue()
+
+
+EXPORTERS = {
+    ExportFormat.NDJSON: ndjson_chunks,
+    ExportFormat.CSV: csv_chunks,
+}
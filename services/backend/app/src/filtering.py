@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+FILTER_SEPARATOR = '__'
+FILTER_OPERATORS = ('eq', 'gt', 'gte', 'lt', 'lte', 'in', 'prefix', 'ilike')
+# Operators that only make sense on text columns
+TEXT_OPERATORS = ('prefix', 'ilike')
+# Operators a btree index can't serve, so they scan regardless of indexes
+UNINDEXABLE_OPERATORS = ('ilike',)
+
+
+class FieldFilter:
+    """A single condition parsed from a query parameter like 'release_year__gte=1990'."""
+
+    def __init__(self, field: str, operator: str, value: Any) -> None:
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def to_clause(self, column: InstrumentedAttribute) -> ColumnElement:
+        if self.operator == 'eq':
+            return column == self.value
+        if self.operator == 'gt':
+            return column > self.value
+        if self.operator == 'gte':
+            return column >= self.value
+        if self.operator == 'lt':
+            return column < self.value
+        if self.operator == 'lte':
+            return column <= self.value
+        if self.operator == 'in':
+            return column.in_(self.value)
+        if self.operator == 'prefix':
+            return column.startswith(self.value, autoescape=True)
+        if self.operator == 'ilike':
+            return column.icontains(self.value, autoescape=True)
+        raise ValueError(f"Unknown operator '{self.operator}'.")
+
+
+def parse_filter_key(key: str) -> Tuple[str, str]:
+    """Splits a query parameter name like 'release_year__gte' into its fieldname and operator.
+
+    Args:
+        key (str): Fieldname, optionally suffixed with '__<operator>'. Defaults to 'eq'.
+
+    Returns:
+        Tuple[str, str]: (fieldname, operator)
+    """
+    field, separator, operator = key.rpartition(FILTER_SEPARATOR)
+    if separator == '' or operator not in FILTER_OPERATORS:
+        return key, 'eq'
+    return field, operator
+
+
+def coerce_value(raw: str, value_type: type) -> Any:
+    if value_type is bool:
+        if raw.lower() in ('true', '1'):
+            return True
+        if raw.lower() in ('false', '0'):
+            return False
+        raise ValueError(f"'{raw}' is not a boolean.")
+    if value_type is datetime:
+        return datetime.fromisoformat(raw)
+    if value_type is uuid.UUID:
+        return uuid.UUID(raw)
+    return value_type(raw)
+
+
+def parse_filters(query_params: Iterable[Tuple[str, str]], field_types: Dict[str, type]) -> List[FieldFilter]:
+    """Parses filter query parameters against the fields of a model.
+
+    Args:
+        query_params (Iterable[Tuple[str, str]]): (name, value) pairs, e.g. from request.query_params.multi_items()
+        field_types (Dict[str, type]): Python type of each filterable field
+
+    Raises:
+        HTTPException: 400 if a field is unknown, an operator doesn't apply to the field's type or a value can't be converted.
+
+    Returns:
+        List[FieldFilter]: Filters, to be combined with AND
+    """
+    filters = []
+    for key, raw in query_params:
+        field, operator = parse_filter_key(key)
+        if field not in field_types:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot filter on '{field}'. Filterable fields: {', '.join(field_types)}.",
+            )
+        value_type = field_types[field]
+        if operator in TEXT_OPERATORS and value_type is not str:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Operator '{operator}' only applies to text fields, '{field}' is not one.",
+            )
+
+        try:
+            if operator == 'in':
+                value = [coerce_value(v, value_type) for v in raw.split(',')]
+            else:
+                value = coerce_value(raw, value_type)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid value for '{key}': '{raw}'.",
+            )
+
+        filters.append(FieldFilter(field=field, operator=operator, value=value))
+    return filters
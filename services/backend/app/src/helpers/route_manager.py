@@ -9,6 +9,7 @@ from src.modules.book.routes import router as book_router
 from src.modules.critic.routes import router as critic_router
 from src.modules.review.routes import router as review_router
 from src.modules.arqueue.routes import router as arqueue_router
+from src.metrics.routes import router as metrics_router
 
 
 def register_routes(app: FastAPI):
@@ -21,3 +22,4 @@ def register_routes(app: FastAPI):
     app.include_router(critic_router)
     app.include_router(review_router)
     app.include_router(arqueue_router)
+    app.include_router(metrics_router)
@@ -1,10 +1,16 @@
 import os
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import queue
+import random
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from datetime import datetime, timezone
+from typing import Dict
 import pathlib
 
-from src.config import APP_SRC_FOLDER_ABS
+from src.config import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLING
 
 
 class AppLogFormatter(logging.Formatter):
@@ -20,30 +26,104 @@ class AppLogFormatter(logging.Formatter):
     def __init__(self, fmt):
         super().__init__()
         self.fmt = fmt
-        self.FORMATS = {
-            logging.DEBUG: self.grey + self.fmt + self.reset,
-            logging.INFO: self.blue + self.fmt + self.reset,
-            logging.WARNING: self.yellow + self.fmt + self.reset,
-            logging.ERROR: self.red + self.fmt + self.reset,
-            logging.CRITICAL: self.bold_red + self.fmt + self.reset
+        # One formatter per level, built once rather than per record
+        self.FORMATTERS = {
+            logging.DEBUG: logging.Formatter(self.grey + self.fmt + self.reset),
+            logging.INFO: logging.Formatter(self.blue + self.fmt + self.reset),
+            logging.WARNING: logging.Formatter(self.yellow + self.fmt + self.reset),
+            logging.ERROR: logging.Formatter(self.red + self.fmt + self.reset),
+            logging.CRITICAL: logging.Formatter(self.bold_red + self.fmt + self.reset),
         }
+        self.default_formatter = logging.Formatter(self.fmt)
 
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self.FORMATTERS.get(record.levelno, self.default_formatter).format(record)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records below WARNING from noisy loggers.
+    Rates apply to a logger and its children, the most specific match wins.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    @classmethod
+    def parse(cls, spec: str) -> Dict[str, float]:
+        """Parses 'logger.name=rate,...' into a dict of rates."""
+        rates = {}
+        for part in spec.split(','):
+            if '=' in part:
+                name, rate = part.split('=', 1)
+                rates[name.strip()] = float(rate)
+        return rates
+
+    def get_rate(self, name: str) -> float:
+        while True:
+            if name in self.rates:
+                return self.rates[name]
+            if '.' not in name:
+                return self.rates.get('', 1.0)
+            name = name.rsplit('.', 1)[0]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or len(self.rates) == 0:
+            return True
+        return random.random() < self.get_rate(record.name)
+
+
+class AppQueueHandler(QueueHandler):
+    """Hands records over to the listener thread as-is.
+    Only the message is merged here, since its args may change after the call returns.
+    Formatting, including tracebacks, is left to the listener's handlers.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def get_formatter() -> logging.Formatter:
+    if LOG_FORMAT == 'json':
+        return JsonLogFormatter()
+    return AppLogFormatter(
+        '%(asctime)s | %(name)s |  %(levelname)s: %(message)s',
+        # '%Y-%m-%d %H:%M:%S'
+    )
 
 
 def get_logger(filename: str = 'log.txt') -> logging.Logger:
+    """Configures the root logger.
+    Callers only enqueue records, a listener thread formats them and does the (blocking) writes,
+    so logging doesn't stall the event loop.
+    """
     logdir = os.path.join(pathlib.Path(__file__).parent.resolve(), 'logs')
 
     if not os.path.exists(logdir):
         os.makedirs(logdir)
 
-    formatter = AppLogFormatter(
-        '%(asctime)s | %(name)s |  %(levelname)s: %(message)s',
-        # '%Y-%m-%d %H:%M:%S'
-    )
+    formatter = get_formatter()
 
     # stdout
     log_stream_handler = logging.StreamHandler()
@@ -55,6 +135,7 @@ def get_logger(filename: str = 'log.txt') -> logging.Logger:
         filename=os.path.join(logdir, f"log.txt"),
         maxBytes=1000000,   # 1MB
         backupCount=100,
+        encoding='utf-8',
     )
 
     ## To use a new log file for each launch instead
@@ -64,16 +145,27 @@ def get_logger(filename: str = 'log.txt') -> logging.Logger:
     log_file_handler.setFormatter(formatter)
     log_file_handler.setLevel(logging.DEBUG)
 
-    logging.basicConfig(
-        handlers=[
-            log_file_handler,
-            log_stream_handler,
-        ],
-        encoding='utf-8',
-        level=logging.INFO
+    log_queue = queue.SimpleQueue()
+    queue_handler = AppQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(SamplingFilter.parse(LOG_SAMPLING)))
+
+    listener = QueueListener(
+        log_queue,
+        log_file_handler,
+        log_stream_handler,
+        respect_handler_level=True,
     )
+    listener.start()
+    # Flush what's still queued on shutdown
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
 
-    return logging.getLogger()
+    return root
 
 
 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S%f')
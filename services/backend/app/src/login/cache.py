@@ -0,0 +1,208 @@
+from __future__ import annotations
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.logging.service import logger
+from src.config import LOGIN_CACHE_TTL_SECONDS, LOGIN_CACHE_MAX_SIZE, LOGIN_CACHE_REDIS
+from src.modules.arqueue.bus import Bus
+from src.metrics.service import registry
+
+
+REDIS_KEY_PREFIX = 'login_cache'
+# What token auth needs. Secrets like hashed_password and verification_token are never cached, not even in Redis.
+CACHED_FIELDS = ('id', 'identifier', 'verified', 'tenant_schema_name', 'created_at', 'updated_at')
+
+lookups = registry.counter('login_cache_lookups_total', 'Login lookups by token subject, by result and tier.', ('result', 'tier'))
+
+
+class LoginCache:
+    """Cache of verified Login records keyed by token subject (the login identifier).
+
+    The first tier is an in-process LRU with a TTL. The optional second tier lives in Redis,
+    reusing the arq connection pool, so that invalidations are seen by all processes.
+    Entries in other processes' first tier can be stale for at most the TTL.
+    Only CACHED_FIELDS are kept, so cached Logins are read-only: see Login.save.
+    """
+
+    def __init__(
+        self,
+        model_class: Type,
+        ttl_seconds: float = LOGIN_CACHE_TTL_SECONDS,
+        max_size: int = LOGIN_CACHE_MAX_SIZE,
+        use_redis: bool = LOGIN_CACHE_REDIS,
+    ) -> None:
+        self.model_class = model_class
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.use_redis = use_redis
+        self._entries: OrderedDict[str, Tuple[float, Dict]] = OrderedDict()
+        self._subjects_by_id: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @property
+    def redis(self):
+        return Bus.queue if self.use_redis else None
+
+    def serialize(self, login: Any) -> Dict:
+        return {c: getattr(login, c) for c in CACHED_FIELDS}
+
+    def deserialize(self, values: Dict) -> Any:
+        # Detached like a Login read in an earlier session. The other columns are left unloaded rather than None,
+        # and the instance is flagged so it is never saved.
+        login = self.model_class(**values)
+        make_transient_to_detached(login)
+        login.from_cache = True
+        return login
+
+    def encode(self, values: Dict) -> str:
+        return json.dumps(
+            {k: v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, uuid.UUID) else v for k, v in values.items()}
+        )
+
+    def decode(self, payload: str) -> Dict:
+        # Also drops fields cached by older versions
+        values = {k: v for k, v in json.loads(payload).items() if k in CACHED_FIELDS}
+        field_types = self.model_class.get_field_types(fields=CACHED_FIELDS)
+        for k, v in values.items():
+            if v is None:
+                continue
+            if field_types[k] is datetime:
+                values[k] = datetime.fromisoformat(v)
+            elif field_types[k] is uuid.UUID:
+                values[k] = uuid.UUID(v)
+        return values
+
+    async def get(self, subject: str) -> Optional[Any]:
+        """Gets the cached Login for a token subject.
+
+        Args:
+            subject (str): Token subject, i.e. the login identifier
+
+        Returns:
+            Optional[Any]: Login, or None on a cache miss
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(subject)
+        if entry is not None:
+            expires_at, values = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(subject)
+                self.hits += 1
+                lookups.inc(result='hit', tier='memory')
+                return self.deserialize(values)
+            self._entries.pop(subject, None)
+
+        if self.redis is not None:
+            try:
+                payload = await self.redis.get(f"{REDIS_KEY_PREFIX}:{subject}")
+                if payload is not None:
+                    values = self.decode(payload)
+                    self._store(subject, values)
+                    self.hits += 1
+                    lookups.inc(result='hit', tier='redis')
+                    return self.deserialize(values)
+            except Exception as e:
+                logger.error(f"Login cache Redis lookup failed: {e}")
+
+        self.misses += 1
+        lookups.inc(result='miss')
+        return None
+
+    async def set(self, login: Any) -> None:
+        """Caches a verified Login under its identifier.
+
+        Args:
+            login (Any): Login to cache
+        """
+        if not self.enabled or not login.verified:
+            return
+
+        values = self.serialize(login)
+        self._store(login.identifier, values)
+
+        if self.redis is not None:
+            try:
+                ttl = max(1, int(self.ttl_seconds))
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.set(f"{REDIS_KEY_PREFIX}:{login.identifier}", self.encode(values), ex=ttl)
+                    pipe.set(f"{REDIS_KEY_PREFIX}:id:{login.id}", login.identifier, ex=ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Login cache Redis write failed: {e}")
+
+    async def invalidate(self, identifier: str = None, id: int = None) -> None:
+        """Drops a Login from the cache by identifier and/or id.
+
+        Args:
+            identifier (str, optional): Login identifier
+            id (int, optional): Login id, for writes that don't know the (old) identifier
+        """
+        await self.invalidate_many(
+            identifiers=[identifier] if identifier is not None else [],
+            ids=[id] if id is not None else [],
+        )
+
+    async def invalidate_many(self, identifiers: Iterable[str] = (), ids: Iterable[int] = ()) -> None:
+        """Drops Logins from the cache by identifier and/or id, in at most two Redis round trips however many there are.
+
+        Args:
+            identifiers (Iterable[str], optional): Login identifiers
+            ids (Iterable[int], optional): Login ids, for writes that don't know the (old) identifiers
+        """
+        ids = list(ids)
+        subjects = set(identifiers)
+        id_keys = [f"{REDIS_KEY_PREFIX}:id:{id}" for id in ids]
+        subjects.update(self._subjects_by_id[id] for id in ids if id in self._subjects_by_id)
+
+        if self.redis is not None and len(id_keys) > 0:
+            try:
+                for subject in await self.redis.mget(*id_keys):
+                    if subject is not None:
+                        subjects.add(subject.decode() if isinstance(subject, bytes) else subject)
+            except Exception as e:
+                logger.error(f"Login cache Redis lookup failed: {e}")
+
+        for subject in subjects:
+            entry = self._entries.pop(subject, None)
+            if entry is not None:
+                self._subjects_by_id.pop(entry[1]['id'], None)
+
+        if self.redis is not None:
+            keys = [f"{REDIS_KEY_PREFIX}:{s}" for s in subjects] + id_keys
+            if len(keys) > 0:
+                try:
+                    await self.redis.delete(*keys)
+                except Exception as e:
+                    logger.error(f"Login cache Redis invalidation failed: {e}")
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._subjects_by_id.clear()
+        if self.redis is not None:
+            try:
+                keys = [k async for k in self.redis.scan_iter(match=f"{REDIS_KEY_PREFIX}:*")]
+                if len(keys) > 0:
+                    await self.redis.delete(*keys)
+            except Exception as e:
+                logger.error(f"Login cache Redis clear failed: {e}")
+
+    def _store(self, subject: str, values: Dict) -> None:
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, values)
+        self._entries.move_to_end(subject)
+        self._subjects_by_id[values['id']] = subject
+        while len(self._entries) > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._subjects_by_id.pop(evicted['id'], None)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Annotated, List
+from typing import Annotated, List, Union
 from typing_extensions import Self
 import uuid
 
@@ -12,13 +12,16 @@ from datetime import datetime
 from pydantic import ValidationError
 
 from src.logging.service import logger
-from src.config import SHARED_SCHEMA_NAME
+from src.config import SHARED_SCHEMA_NAME, BULK_UPSERT_CHUNK_SIZE
 from src.config import JWT_SECRET_KEY
 from src.auth import get_hashed_password, reuseable_oauth, ALGORITHM
 from src.auth import TokenPayload
 
 from src.models import AppModel, SharedModelMixin, IdentifierMixin
-from src.validators import CreateValidator, ReadValidator
+from src.database.service import DatabaseService
+from src.database.bulk import UpsertMode, UpsertResult
+from src.validators import AppValidator, CreateValidator, ReadValidator
+from src.login.cache import LoginCache
 
 class Login(SharedModelMixin, IdentifierMixin, AppModel):
     hashed_password:    Mapped[str]         = mapped_column(nullable=False)
@@ -26,6 +29,9 @@ class Login(SharedModelMixin, IdentifierMixin, AppModel):
     verified:           Mapped[bool]        = mapped_column(nullable=False, default=False)
     tenant_schema_name: Mapped[str]         = mapped_column(nullable=True)
 
+    # Set on Logins rebuilt by the login cache, which lack the secret columns
+    from_cache = False
+
     # Override this to handle the password => hashed_password conversion
     @classmethod
     async def create_one(
@@ -36,9 +42,73 @@ class Login(SharedModelMixin, IdentifierMixin, AppModel):
         password = item.password
         del item.password
         item_dict = item.to_dict()
-        item_dict['hashed_password'] = get_hashed_password(password)
+        item_dict['hashed_password'] = await get_hashed_password(password)
         return await super().create_one(item_dict, schema_name)
 
+    # Overrides below keep the login cache coherent with writes.
+    # Invalidation waits for the commit, until then concurrent requests would just re-cache the old row.
+    @classmethod
+    async def update_by_id(
+        cls,
+        id: int,
+        item: AppValidator,
+        schema_name = SHARED_SCHEMA_NAME,
+        apply_none_values: bool = False,
+    ) -> Union[None, Login]:
+        res = await super().update_by_id(id, item, schema_name, apply_none_values)
+        await DatabaseService.after_commit(lambda: login_cache.invalidate(id=id))
+        return res
+
+    @classmethod
+    async def upsert(
+        cls,
+        item: AppValidator,
+        schema_name = SHARED_SCHEMA_NAME,
+        apply_none_values: bool = False
+    ) -> Login:
+        res = await super().upsert(item, schema_name, apply_none_values)
+        await DatabaseService.after_commit(lambda: login_cache.invalidate(identifier=item.identifier))
+        return res
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        items: List[AppValidator],
+        schema_name = SHARED_SCHEMA_NAME,
+        apply_none_values: bool = False,
+        chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+        mode: UpsertMode = UpsertMode.TRANSACTION,
+        concurrency: int = 1,
+    ) -> UpsertResult:
+        res = await super().upsert_many(items, schema_name, apply_none_values, chunk_size, mode, concurrency)
+        identifiers = [item.identifier for item in items]
+        await DatabaseService.after_commit(lambda: login_cache.invalidate_many(identifiers=identifiers))
+        return res
+
+    @classmethod
+    async def delete_by_id(cls, id: int, schema_name = SHARED_SCHEMA_NAME) -> Union[None, int]:
+        res = await super().delete_by_id(id, schema_name)
+        await DatabaseService.after_commit(lambda: login_cache.invalidate(id=id))
+        return res
+
+    @classmethod
+    async def delete_all(cls, schema_name = SHARED_SCHEMA_NAME) -> List[int]:
+        res = await super().delete_all(schema_name)
+        await DatabaseService.after_commit(login_cache.clear)
+        return res
+
+    async def save(self, schema_name: str = SHARED_SCHEMA_NAME) -> Login:
+        if self.from_cache:
+            raise RuntimeError(f"Login {self.identifier} is a cached copy without its secret fields, read it from the database to save it.")
+        # E.g. verification
+        res = await super().save(schema_name)
+        identifier, id = self.identifier, self.id
+        await DatabaseService.after_commit(lambda: login_cache.invalidate(identifier=identifier, id=id))
+        return res
+
+
+login_cache = LoginCache(Login)
+
 
 async def get_unverified_login(token: Annotated[OAuth2PasswordBearer, Depends(reuseable_oauth)]) -> Login:
     try:
@@ -57,6 +127,10 @@ async def get_unverified_login(token: Annotated[OAuth2PasswordBearer, Depends(re
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
+        login = await login_cache.get(token_data.sub)
+        if login is not None:
+            return login
+
         login = await Login.read_by_identifier(
             identifier=token_data.sub,
             schema_name=SHARED_SCHEMA_NAME,
@@ -69,6 +143,8 @@ async def get_unverified_login(token: Annotated[OAuth2PasswordBearer, Depends(re
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
+        # Only verified logins are cached
+        await login_cache.set(login)
         return login
 
     except(jwt.JWTError, ValidationError):
@@ -156,6 +156,8 @@ RouteClass = generate_route_class(
     ReadValidatorClass         = LoginGet,
     UpdateValidatorClass       = LoginUpdate,
     UpdateWithIdValidatorClass = LoginUpdateWithId,
+    # Payloads carry plaintext passwords, which must not be staged in Redis
+    bulk_jobs                  = False,
 )
 router_instance = RouteClass()
 router: APIRouter = router_instance.router
@@ -190,7 +192,7 @@ async def signup(
     item: LoginCreate
 ) -> LoginGet:
     # Create Login
-    hashed_password = get_hashed_password(item.password)
+    hashed_password = await get_hashed_password(item.password)
     del item.password
     item_db = await Login(**item.to_dict(), hashed_password=hashed_password).save()
     # TODO: Send email with auth code
@@ -275,7 +277,7 @@ async def get_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
         )
     else:
         # Note that we never stored the raw password.
-        if not verify_password(form_data.password, login.hashed_password):
+        if not await verify_password(form_data.password, login.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Incorrect email or password"
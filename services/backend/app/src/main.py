@@ -3,10 +3,11 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from src.logging.service import logger
-from src.config import PROJECT_NAME
+from src.config import PROJECT_NAME, DATABASE_POOL_WARMUP
 from src.helpers.route_manager import register_routes
 from src.database.service import DatabaseService
 from src.modules.arqueue.bus import Bus
+from src.metrics.middleware import MetricsMiddleware
 
 
 # App lifespan context manager
@@ -14,6 +15,7 @@ from src.modules.arqueue.bus import Bus
 async def lifespan_ctx(app: FastAPI):
     logger.info("Starting up...")
     app.state.db = DatabaseService.get()
+    await DatabaseService.warm_up(DATABASE_POOL_WARMUP)
     await Bus.init()
     register_routes(app=app)
     yield
@@ -25,3 +27,4 @@ app = FastAPI(
     title=PROJECT_NAME,
     lifespan=lifespan_ctx
 )
+app.add_middleware(MetricsMiddleware)
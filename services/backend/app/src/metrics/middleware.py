@@ -0,0 +1,56 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.metrics.service import registry
+
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+request_duration = registry.histogram('http_request_duration_seconds', 'Time until the response was fully sent, by route.', ('method', 'route', 'status'))
+request_size = registry.histogram('http_request_size_bytes', 'Request body size, by route.', ('method', 'route'), buckets=SIZE_BUCKETS)
+response_size = registry.histogram('http_response_size_bytes', 'Response body size, by route.', ('method', 'route'), buckets=SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """Records latency and body sizes of every HTTP request, labelled with the route's path template
+    (e.g. '/api/v1/books/{id}') to keep the label set bounded.
+    Plain ASGI, so streamed bodies are counted as they pass through without being buffered.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        s = time.perf_counter()
+        sizes = {'request': 0, 'response': 0}
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message['type'] == 'http.request':
+                sizes['request'] += len(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            elif message['type'] == 'http.response.body':
+                sizes['response'] += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            # The router adds the matched route to the scope
+            route = scope.get('route')
+            route = route.path if route is not None else 'unmatched'
+            method = scope['method']
+            request_duration.observe(time.perf_counter() - s, method=method, route=route, status=status_code)
+            request_size.observe(sizes['request'], method=method, route=route)
+            response_size.observe(sizes['response'], method=method, route=route)
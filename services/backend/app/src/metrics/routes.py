@@ -0,0 +1,32 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from src.metrics.service import registry
+# Registers the collectors of metrics that live outside the request path
+import src.modules.arqueue.metrics
+
+
+router = APIRouter(
+    tags=['Metrics'],
+)
+
+
+@router.get(
+    '/metrics',
+    status_code=status.HTTP_200_OK,
+    summary='Metrics in the Prometheus text exposition format',
+    description='Covers HTTP requests, the database pool and queries, password hashing, the login cache and the arq queue.',
+    response_class=PlainTextResponse,
+)
+async def metrics() -> PlainTextResponse:
+    """
+    Metrics
+
+    Returns:
+        PlainTextResponse: All metrics, refreshed from their sources
+    """
+    await registry.collect()
+    return PlainTextResponse(
+        registry.render(),
+        media_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import bisect
+import threading
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from src.logging.service import logger
+
+
+# Seconds, suits anything from a cached lookup to a slow query
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list((extra or {}).items())
+    if len(pairs) == 0:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    type_name: str = None
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        # Observations can come from worker threads, e.g. password hashing
+        self._lock = threading.Lock()
+
+    def get_label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self.render_samples()
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self.get_label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels: str) -> None:
+        """For totals that are counted elsewhere and copied in by a collector."""
+        with self._lock:
+            self._values[self.get_label_values(labels)] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self.get_label_values(labels), 0)
+
+    def render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, k)} {format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+
+class Histogram(Metric):
+    """Cumulative histogram in the Prometheus sense, one series per label combination."""
+
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> (per bucket counts incl. +Inf, sum)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def get_bucket_index(self, value: float) -> int:
+        # Index of the smallest bound >= value, len(buckets) for +Inf
+        return bisect.bisect_left(self.buckets, value)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self.get_label_values(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][self.get_bucket_index(value)] += 1
+            series[1] += value
+
+    def load(self, counts: Sequence[int], total: float, **labels: str) -> None:
+        """Replaces a series with one aggregated elsewhere, e.g. by another process.
+
+        Args:
+            counts (Sequence[int]): Non-cumulative count per bucket, plus one for +Inf
+            total (float): Sum of all observations
+        """
+        with self._lock:
+            self._series[self.get_label_values(labels)] = [list(counts), total]
+
+    def get_count(self, **labels: str) -> int:
+        series = self._series.get(self.get_label_values(labels))
+        return 0 if series is None else sum(series[0])
+
+    def render_samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, {'le': format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]) -> None:
+        """Adds a coroutine function that refreshes metrics right before they are rendered,
+        for values that are cheaper to read on demand, e.g. pool or queue sizes.
+        """
+        self._collectors.append(collector)
+
+    async def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                await collector()
+            except Exception as e:
+                # A broken source shouldn't take the other metrics down with it
+                logger.error(f"Metrics collector {collector.__qualname__} failed: {e}")
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        return '\n'.join(m.render() for m in self._metrics.values()) + '\n'
+
+
+registry = MetricsRegistry()
@@ -1,4 +1,6 @@
 import asyncio
+import sys
+import time
 from logging.config import fileConfig
 from typing import List
 
@@ -7,7 +9,7 @@ from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
-from src.config import DATABASE_URL_ASYNC, SHARED_SCHEMA_NAME, TENANT_SCHEMA_NAME
+from src.config import DATABASE_URL_ASYNC, SHARED_SCHEMA_NAME, TENANT_SCHEMA_NAME, TENANT_MIGRATION_CONCURRENCY
 from src.models import AppModel
 from src.helpers.models_includer import *
 
@@ -83,18 +85,122 @@ def table_exists(connection: Connection, schema: str, table: str) -> bool:
     )[0]['exists']
 
 
+def get_tenant_schema_names(connection: Connection) -> List[str]:
+    """Schema names of all provisioned tenants, in a stable order so shards don't overlap."""
+    if not table_exists(connection=connection, schema=SHARED_SCHEMA_NAME, table='tenant'):
+        return []
+    return [
+        r['schema_name'] for r in execute_select(
+            connection=connection,
+            query=f"""
+                select t.schema_name
+                from {SHARED_SCHEMA_NAME}.tenant t
+                join pg_namespace n on n.nspname = t.schema_name
+                order by t.id
+            """,
+        )
+    ]
+
+
+def stamp_tenant_revisions(connection: Connection, revision: str) -> None:
+    """Gives each tenant schema without one its own alembic_version table.
+    Before per-tenant tracking all tenants were migrated in lockstep with public,
+    so they start out at the public revision from before this run.
+    Tenants provisioned since record their revision when cloned or claimed, so this only backfills older ones.
+    """
+    for schema in get_tenant_schema_names(connection=connection):
+        if get_revision(connection=connection, schema=schema) is None:
+            connection.execute(text(f'create table if not exists "{schema}".alembic_version (version_num varchar(32) not null primary key)'))
+            connection.execute(text(f'insert into "{schema}".alembic_version (version_num) values (:revision)'), {'revision': revision})
+
+
+def migrate_tenant(connection: Connection, tenant_schema_name: str) -> None:
+    # This is a huge hack:
+    # It looks like you can't map a schema to None so we create a dummy junk schema
+    # to map the SHARED_SCHEMA_NAME into and we just drop it again after.
+    # One per tenant so that concurrent workers don't trip over each other.
+    junk_schema_name = f"junk_{tenant_schema_name}"
+    connection.execution_options(
+        schema_translate_map={
+            SHARED_SCHEMA_NAME: junk_schema_name,
+            TENANT_SCHEMA_NAME: tenant_schema_name,
+        }
+    )
+    connection.execute(text(f'create schema if not exists "{junk_schema_name}"'))
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        version_table_schema=tenant_schema_name,
+    )
+    context.run_migrations()
+    connection.execute(text(f'drop schema if exists "{junk_schema_name}" cascade'))
+
+
+def migrate_tenants(connection: Connection, shard: int = 0, shard_count: int = 1) -> None:
+    """Migrates every shard_count-th tenant schema, each in its own transaction.
+    Tenants already at head are skipped, so a rerun resumes where a failed one stopped.
+    A failing tenant doesn't stop the others, failures are reported at the end.
+    A tenant without a recorded revision is a failure too: its tables could be at any revision,
+    so it needs to be stamped by hand rather than assumed to be at head.
+
+    Args:
+        connection (Connection): Connection to run on, must not be in a transaction
+        shard (int): Index of the shard to migrate
+        shard_count (int): Total number of shards
+    """
+    head = context.get_head_revision()
+    tenant_schema_names = get_tenant_schema_names(connection=connection)[shard::shard_count]
+    connection.commit()
+    print(f"Migrating {len(tenant_schema_names)} tenant schemas (shard {shard + 1} of {shard_count})...", flush=True)
+
+    failed = []
+    migrated = 0
+    for i, tenant_schema_name in enumerate(tenant_schema_names):
+        progress = f"({i + 1} of {len(tenant_schema_names)}) '{tenant_schema_name}'"
+        s = time.monotonic()
+        try:
+            with connection.begin():
+                pre_rev = get_revision(connection=connection, schema=tenant_schema_name)
+                if pre_rev is None:
+                    raise Exception('No alembic_version, the revision of its tables is unknown.')
+                if pre_rev == head:
+                    continue
+                migrate_tenant(connection=connection, tenant_schema_name=tenant_schema_name)
+                post_rev = get_revision(connection=connection, schema=tenant_schema_name)
+            migrated += 1
+            print(f"{progress} migrated '{pre_rev}' -> '{post_rev}' in {time.monotonic() - s:.3f}s.", flush=True)
+        except Exception as e:
+            failed.append(tenant_schema_name)
+            print(f"{progress} FAILED: {e}", flush=True)
+
+    print(f"Shard {shard + 1} of {shard_count} done: {migrated} migrated, {len(failed)} failed, {len(tenant_schema_names) - migrated - len(failed)} already at head.", flush=True)
+    if len(failed) > 0:
+        raise Exception(f"Migrations failed for tenant schemas: {', '.join(failed)}")
+
+
 def do_run_migrations(connection: Connection) -> None:
-    # TODO: Rethink how to deal with failed migrations
+    x_args = context.get_x_argument(as_dictionary=True)
+
+    # Worker process spawned by run_tenant_migration_workers
+    if 'tenant_shard' in x_args:
+        shard, shard_count = [int(v) for v in x_args['tenant_shard'].split('/')]
+        migrate_tenants(connection=connection, shard=shard, shard_count=shard_count)
+        return
+
     context.configure(
         connection=connection,
         target_metadata=target_metadata,
     )
 
-    with context.begin_transaction() as ctx:
-        # Get current version num so we can reset for each tenant
+    with connection.begin():
         public_revision_pre = get_revision(connection=connection, schema='public')
         print(f"Current revision is '{public_revision_pre}'.")
 
+        # Record the tenants' starting point in the same transaction as the template changes,
+        # so that an interrupted deploy can't lose track of it
+        if public_revision_pre is not None:
+            stamp_tenant_revisions(connection=connection, revision=public_revision_pre)
+
         # Shared + Tenant model schema
         print('Running migrations for shared & tenant model schema...')
         context.run_migrations()
@@ -102,47 +208,39 @@ def do_run_migrations(connection: Connection) -> None:
         public_revision_post = get_revision(connection=connection, schema='public')
         print(f"{SHARED_SCHEMA_NAME} and {TENANT_SCHEMA_NAME} migrated to revision {public_revision_post}.")
 
-        # Getting tenants
-        # TODO: Parallellise Migrations
-        if table_exists(connection=connection, schema=SHARED_SCHEMA_NAME, table='tenant'):
-            tenants = execute_select(connection=connection, query=f"select * from {SHARED_SCHEMA_NAME}.tenant")
-            if len(tenants) > 0:
-                set_revision(connection=connection, schema='public', revision=public_revision_pre)
-                print('=====================================')
-                print(f"Migrating {len(tenants)} tenant schemas...")
-                print('=====================================')
-                for i, tenant in enumerate(tenants):
-                    junk_schema_name = 'junk'
-                    tenant_schema_name = tenant['schema_name']
-                    print('-------------------------------------')
-                    print(f"Running migrations for specific tenant ({i + 1} of {len(tenants)}): '{tenant_schema_name}'")
-                    print(f"Resetting revision to '{public_revision_pre}'...")
-                    set_revision(connection=connection, schema='public', revision=public_revision_pre)
-
-                    # This is a huge hack:
-                    # It looks like you can't map a schema to None so we create a dummy junk schema
-                    # to map the SHARED_SCHEMA_NAME into and we just drop it again after.
-                    connection.execution_options(
-                        schema_translate_map={
-                            SHARED_SCHEMA_NAME: junk_schema_name,
-                            TENANT_SCHEMA_NAME: tenant_schema_name,
-                        }
-                    )
-                    print('Creating junk schema...')
-                    connection.execute(text(f"create schema if not exists {junk_schema_name}"))
-                    print('Running actual migrations...')
-                    context.run_migrations()
-                    print('Deleting junk schema...')
-                    connection.execute(text(f"drop schema if exists {junk_schema_name} cascade"))
-                    post_rev = get_revision(connection=connection, schema='public')
-                    print(f"Tenant migrated to revision '{post_rev}'.")
-
-        print('=====================================')
-        public_revision_post_tenants = get_revision(connection=connection, schema='public')
-        print(f"Final revision: '{public_revision_post_tenants}'")
-        result = public_revision_post == public_revision_post_tenants
-        print(f"Migration success?: {result}")
-        print('=====================================')
+
+async def run_tenant_migration_workers(concurrency: int) -> None:
+    """Migrates tenant schemas across worker processes, each on its own connection.
+    Alembic's context is process global, hence processes rather than tasks.
+
+    Args:
+        concurrency (int): Number of worker processes
+    """
+    print('=====================================')
+    print(f"Migrating tenant schemas with {concurrency} workers...")
+    print('=====================================', flush=True)
+
+    async def run_worker(shard: int) -> int:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'alembic',
+            '-c', config.config_file_name,
+            '-x', f"tenant_shard={shard}/{concurrency}",
+            'upgrade', 'head',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        async for line in proc.stdout:
+            print(f"[worker {shard + 1}] {line.decode().rstrip()}", flush=True)
+        return await proc.wait()
+
+    return_codes = await asyncio.gather(*[run_worker(shard) for shard in range(concurrency)])
+    failed_workers = [i + 1 for i, code in enumerate(return_codes) if code != 0]
+
+    print('=====================================')
+    print(f"Migration success?: {len(failed_workers) == 0}")
+    print('=====================================', flush=True)
+    if len(failed_workers) > 0:
+        raise Exception(f"Tenant migrations failed in workers: {failed_workers}. Rerun to resume.")
 
 
 async def run_async_migrations() -> None:
@@ -157,11 +255,23 @@ async def run_async_migrations() -> None:
         poolclass=pool.NullPool,
     )
 
+    x_args = context.get_x_argument(as_dictionary=True)
+    concurrency = int(x_args.get('concurrency', TENANT_MIGRATION_CONCURRENCY))
+
     async with connectable.connect() as connection:
         await connection.run_sync(do_run_migrations)
+        if 'tenant_shard' not in x_args:
+            # No point in spawning more workers than there are tenants
+            concurrency = min(concurrency, len(await connection.run_sync(get_tenant_schema_names)))
+            await connection.commit()
+            if concurrency == 1:
+                await connection.run_sync(migrate_tenants)
 
     await connectable.dispose()
 
+    if 'tenant_shard' not in x_args and concurrency > 1:
+        await run_tenant_migration_workers(concurrency=concurrency)
+
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
@@ -1,30 +1,47 @@
 from __future__ import annotations
 import asyncio
 from functools import lru_cache
-from typing import Any, Dict, List, Optional, Type, Tuple, Union
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Type, Tuple, Union
 from typing_extensions import Self
 from datetime import datetime
 import uuid
 
-from sqlalchemy import BigInteger, Insert, text, UniqueConstraint
-from sqlalchemy import select, delete, update, insert
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger, Boolean, Column, Insert, Row, UniqueConstraint, literal_column
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy import Select, any_, bindparam, inspect, select, delete, update, insert, tuple_
 from sqlalchemy.dialects.postgresql import insert as upsert
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy import func
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import (
     DeclarativeBase,
+    Load,
     Mapped,
+    joinedload,
     mapped_column,
+    selectinload,
 )
 from sqlalchemy_utils import get_class_by_table
 from inflection import titleize, pluralize, underscore, camelize
 
 from src.logging.service import logger
-from src.config import SHARED_SCHEMA_NAME, TENANT_SCHEMA_NAME
+from src.config import (
+    SHARED_SCHEMA_NAME,
+    TENANT_SCHEMA_NAME,
+    READ_ALL_LIMIT_DEFAULT,
+    EXPORT_CHUNK_SIZE,
+    BULK_COPY_CHUNK_SIZE,
+    BULK_UPSERT_CHUNK_SIZE,
+    READ_ALL_UNINDEXED_POLICY,
+)
 from src.utils import ToDictMixin
-from src.database.service import DatabaseService
+from src.database.service import DatabaseService, current_unit_of_work
+from src.database.instrumentation import tag_queries, QUERY_TAGS_OPTION
+from src.database.bulk import commit_mode_connections, copy_records, copy_records_returning_ids, chunked, UpsertMode, UpsertResult
 from src.validators import AppValidator
+from src.pagination import KeysetCursor, parse_sort, encode_cursor, decode_cursor
+from src.filtering import FieldFilter, UNINDEXABLE_OPERATORS, parse_filters
 
 
 @lru_cache()
@@ -58,16 +75,115 @@ class IdMixin:
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
 
     @classmethod
+    @tag_queries
     async def read_by_id(
         cls,
         id: int,
         schema_name = SHARED_SCHEMA_NAME,
-    ) -> Union[None, Self]:
+        fields: Sequence[str] = None,
+        include: Sequence[str] = None,
+    ) -> Union[None, Self, Row]:
+        """Reads one object by id. Within a request, calls made in the same event loop tick
+        are coalesced into one read_by_ids query per model and schema by the request's ModelLoader.
+
+        Args:
+            id (int): Id of the object
+            schema_name (str): Schema to read from
+            fields (Sequence[str], optional): Only select these columns. Projections are not batched.
+            include (Sequence[str], optional): Relationships to eager load, see get_load_options. Not batched either.
+
+        Returns:
+            Union[None, Self, Row]: The object, or a row if fields is given. None if not found.
+        """
+        unit_of_work = current_unit_of_work.get()
+        # Nested in another model call the batch would wait for the session this task holds
+        if fields is None and include is None and unit_of_work is not None and not unit_of_work.is_held():
+            return await unit_of_work.loader.load(cls.get_model_class(), id, schema_name)
+
         async with DatabaseService.async_session(schema_name) as session:
-            q = select(cls.get_model_class()).where(cls.get_model_class().id == id)
-            res = await session.execute(q)
+            if fields is not None:
+                res = await session.execute(cls.get_read_by_id_statement(tuple(fields)), {'id': id})
+                return res.first()
+
+            include = tuple(include) if include is not None else None
+            res = await session.execute(cls.get_read_by_id_statement(include=include), {'id': id})
             return res.scalars().first()
 
+    @classmethod
+    @tag_queries
+    async def read_by_ids(
+        cls,
+        ids: Sequence[int],
+        schema_name = SHARED_SCHEMA_NAME,
+        fields: Sequence[str] = None,
+        include: Sequence[str] = None,
+    ) -> List[Union[Self, Row]]:
+        """Reads many objects by id in one query. The ids are bound as a single array, i.e. `id = ANY($1)`,
+        so the statement (and its server side prepared statement) is the same for any number of ids.
+
+        Args:
+            ids (Sequence[int]): Ids of the objects
+            schema_name (str): Schema to read from
+            fields (Sequence[str], optional): Only select these columns, plus id.
+            include (Sequence[str], optional): Relationships to eager load, ignored with fields. See get_load_options.
+
+        Returns:
+            List[Union[Self, Row]]: The objects (or rows if fields is given) in the order of ids.
+                Ids that don't exist are skipped, duplicates are returned once.
+        """
+        if len(ids) == 0:
+            return []
+
+        async with DatabaseService.async_session(schema_name) as session:
+            if fields is not None:
+                res = await session.execute(cls.get_read_by_ids_statement(tuple(fields) + ('id',)), {'ids': list(ids)})
+                items = res.all()
+            else:
+                include = tuple(include) if include is not None else None
+                res = await session.execute(cls.get_read_by_ids_statement(include=include), {'ids': list(ids)})
+                items = res.scalars().all()
+
+        by_id = {item.id: item for item in items}
+        return [by_id[id] for id in dict.fromkeys(ids) if id in by_id]
+
+    @classmethod
+    @lru_cache()
+    def get_read_by_id_statement(cls, fields: Tuple[str, ...] = None, include: Tuple[str, ...] = None) -> Select:
+        """Statement for read_by_id, built once per model (and projection or includes) with the id as a bound parameter.
+        Reusing the statement object also reuses its memoized cache key, so executing it is a straight compiled cache hit.
+
+        Args:
+            fields (Tuple[str, ...]): Columns to select, the ORM entity if None.
+            include (Tuple[str, ...]): Relationships to eager load, only applies to the ORM entity.
+
+        Returns:
+            Select: Statement taking an 'id' parameter
+        """
+        entities = cls.get_columns(fields) if fields is not None else [cls.get_model_class()]
+        q = select(*entities).where(cls.get_model_class().id == bindparam('id'))
+        if fields is None and include is not None:
+            q = q.options(*cls.get_load_options(include))
+        return q
+
+    @classmethod
+    @lru_cache()
+    def get_read_by_ids_statement(cls, fields: Tuple[str, ...] = None, include: Tuple[str, ...] = None) -> Select:
+        """Statement for read_by_ids, built once per model (and projection or includes). See get_read_by_id_statement.
+
+        Args:
+            fields (Tuple[str, ...]): Columns to select, the ORM entity if None.
+            include (Tuple[str, ...]): Relationships to eager load, only applies to the ORM entity.
+
+        Returns:
+            Select: Statement taking an 'ids' array parameter
+        """
+        entities = cls.get_columns(fields) if fields is not None else [cls.get_model_class()]
+        ids = bindparam('ids', type_=ARRAY(BigInteger))
+        q = select(*entities).where(cls.get_model_class().id == any_(ids))
+        if fields is None and include is not None:
+            q = q.options(*cls.get_load_options(include))
+        return q
+
 
 class AuditTimestampsMixin:
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
@@ -85,16 +201,22 @@ class IdentifierMixin:
     identifier: Mapped[str] = mapped_column(unique=True)
 
     @classmethod
+    @tag_queries
     async def read_by_identifier(
         cls,
         identifier: str,
         schema_name = SHARED_SCHEMA_NAME,
     ) -> Self:
         async with DatabaseService.async_session(schema_name) as session:
-            q = select(cls.get_model_class()).where(cls.get_model_class().identifier == identifier)
-            res = await session.execute(q)
+            res = await session.execute(cls.get_read_by_identifier_statement(), {'identifier': identifier})
             return res.scalars().first()
 
+    @classmethod
+    @lru_cache()
+    def get_read_by_identifier_statement(cls) -> Select:
+        """Statement for read_by_identifier, built once per model. See get_read_by_id_statement."""
+        return select(cls.get_model_class()).where(cls.get_model_class().identifier == bindparam('identifier'))
+
 
 class GUIDMixin:
     guid: Mapped[uuid.uuid4] = mapped_column(UUID(as_uuid=True), default=uuid.uuid4, unique=True)
@@ -130,7 +252,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         return underscore(cls.__name__)
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
     def get_model_class(cls) -> Type[AppModel]:
         """Gets a reference to the model class we're currently in
 
@@ -150,20 +272,20 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         return pluralize(titleize(cls.__tablename__))
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
     def get_unique_fieldnames(cls) -> List[str]:
         return [
             c.name for c in cls.get_model_class().__table__.columns if c.unique
         ]
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
     def get_unique_constraint_names(cls) -> List[str]:
         return [c.name for c in cls.get_model_class().__table__.constraints if isinstance(c, UniqueConstraint)]
 
     # TODO: Use reflection instead of hardcoding this
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
     def get_system_fieldnames(cls) -> List[str]:
         """Get a list of fieldnames that are controlled by the system.
         This includes fields such as id, created_at, updated_at, etc.
@@ -174,7 +296,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         return ['id', 'created_at', 'updated_at']
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
     def get_settable_fieldnames(cls) -> List[str]:
         """Get a list of fieldnames that can be set by the user.
         This excludes fields such as id, created_at, updated_at, etc.
@@ -188,7 +310,104 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         ]
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
+    def get_indexed_fieldnames(cls) -> List[str]:
+        """Get a list of fieldnames backed by an index, i.e. that can be filtered and sorted on without a table scan.
+
+        Returns:
+            List[str]: List of indexed fieldnames.
+        """
+        table = cls.get_model_class().__table__
+        leading_index_columns = [list(i.columns)[0].name for i in table.indexes]
+        return [
+            c.name for c in table.columns
+            if c.primary_key or c.unique or c.index or c.name in leading_index_columns
+        ]
+
+    @classmethod
+    @lru_cache()
+    def get_sortable_fieldnames(cls) -> List[str]:
+        """Get a list of fieldnames that can be used as keyset pagination sort keys.
+        Only non-nullable columns backed by an index qualify, so that keyset pagination
+        on (field, id) stays an index range scan regardless of page depth.
+
+        Returns:
+            List[str]: List of fieldnames that can be sorted on.
+        """
+        table = cls.get_model_class().__table__
+        return [c for c in cls.get_indexed_fieldnames() if not table.columns[c].nullable]
+
+    @classmethod
+    def check_index_backed(cls, field: str, operation: str) -> None:
+        """Applies READ_ALL_UNINDEXED_POLICY to a filter or sort that can't use an index.
+
+        Args:
+            field (str): Fieldname
+            operation (str): What is done with the field, for the messages, e.g. 'sort' or 'filter (ilike)'
+
+        Raises:
+            HTTPException: 400 if the policy is 'reject'.
+        """
+        msg = f"{cls.__name__}: {operation} on '{field}' can't use an index and will scan the table."
+        if READ_ALL_UNINDEXED_POLICY == 'reject':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{msg} Indexed fields: {', '.join(cls.get_indexed_fieldnames())}.",
+            )
+        logger.warning(msg)
+
+    @classmethod
+    def get_sort_field(cls, sort: str, keyset: bool = False) -> Tuple[str, bool]:
+        """Validates a sort expression like '-identifier' against the fields of the model.
+
+        Args:
+            sort (str): Fieldname, optionally prefixed with '-' for descending order.
+            keyset (bool): Whether the sort is used for keyset pagination, which requires a sortable field.
+
+        Raises:
+            HTTPException: 400 if the field cannot be sorted on.
+
+        Returns:
+            Tuple[str, bool]: (fieldname, descending)
+        """
+        field, descending = parse_sort(sort)
+        if keyset and field not in cls.get_sortable_fieldnames():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot sort on '{field}'. Sortable fields: {', '.join(cls.get_sortable_fieldnames())}.",
+            )
+        if field not in cls.get_column_names():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot sort on unknown field '{field}'.",
+            )
+        if field not in cls.get_indexed_fieldnames():
+            cls.check_index_backed(field, 'sort')
+        return field, descending
+
+    @classmethod
+    def get_filters(cls, query_params: Iterable[Tuple[str, str]], fields: Sequence[str] = None) -> List[FieldFilter]:
+        """Parses filter query parameters like 'release_year__gte=1990' into filters for read_all.
+
+        Args:
+            query_params (Iterable[Tuple[str, str]]): (name, value) pairs, without the route's own parameters.
+            fields (Sequence[str], optional): Fields clients may filter on, e.g. the read validator's. All columns if omitted.
+                Filtering on a field reveals its values, so columns that aren't returned must not be filterable.
+
+        Raises:
+            HTTPException: 400 for invalid filters, or filters that can't use an index if the policy is 'reject'.
+
+        Returns:
+            List[FieldFilter]: Filters, to be combined with AND
+        """
+        filters = parse_filters(query_params, cls.get_field_types(fields=tuple(fields or cls.get_column_names())))
+        for f in filters:
+            if f.field not in cls.get_indexed_fieldnames() or f.operator in UNINDEXABLE_OPERATORS:
+                cls.check_index_backed(f.field, f"filter ({f.operator})")
+        return filters
+
+    @classmethod
+    @lru_cache()
     def get_field_types(cls, fields: Tuple[str, ...]) -> Dict[str, Any]:
         field_types = {}
         for field in fields:
@@ -248,7 +467,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         schema_name = SHARED_SCHEMA_NAME,
     ) -> List[Self]:
         items = await cls.get_mock_instances(count=count, schema_name=schema_name)
-        return await cls.create_many(items, schema_name)
+        return await cls.copy_many(items, schema_name)
 
     @classmethod
     async def seed_one(
@@ -259,6 +478,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         return await cls.get_mock_instance(idx=idx).save(schema_name=schema_name)
 
     @classmethod
+    @tag_queries
     async def get_max_id(
         cls,
         schema_name = SHARED_SCHEMA_NAME,
@@ -269,6 +489,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
             return res.scalar() or 0
 
     @classmethod
+    @tag_queries
     async def get_count(
         cls,
         schema_name = SHARED_SCHEMA_NAME,
@@ -280,105 +501,332 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
 
     # TODO: Find best way to do List[Self]
     @classmethod
+    @tag_queries
     async def create_one(
         cls,
         item: AppValidator | Dict,
         schema_name = SHARED_SCHEMA_NAME,
     ) -> Self:
-        id = None
         async with DatabaseService.async_session(schema_name) as session:
-            q = insert(cls.get_model_class()).returning(cls.get_model_class().id)
-            res = await session.execute(q, item if isinstance(item, dict) else item.to_dict())
-            await session.commit()
-            items = res.scalars().all()
-            if len(items) > 0:
-                id = items[0]
-
-        if id is not None:
-            return await cls.read_by_id(id, schema_name=schema_name)
-        else:
-            return None
+            # RETURNING the full row saves a second read_by_id round trip
+            q = insert(cls.get_model_class()).returning(cls.get_model_class())
+            res = await session.execute(q, [item if isinstance(item, dict) else item.to_dict()])
+            return res.scalars().first()
 
-    # TODO: Add metadata to the response
     @classmethod
+    @tag_queries
     async def read_all(
         cls,
         schema_name = SHARED_SCHEMA_NAME,
         offset: int = None,
         limit: int = None,
-    ) -> List[Self]:
+        sort: str = None,
+        after: KeysetCursor = None,
+        filters: List[FieldFilter] = None,
+        fields: Sequence[str] = None,
+        include: Sequence[str] = None,
+    ) -> List[Self] | List[Row]:
+        """Gets objects from the database, either paged by offset or by keyset.
+
+        Args:
+            schema_name (str): Schema to read from.
+            offset (int, optional): Number of rows to skip. Cost grows with the offset.
+            limit (int, optional): Maximum number of rows to return.
+            sort (str, optional): Fieldname, optionally prefixed with '-' for descending order.
+                Ties are broken on id.
+            after (KeysetCursor, optional): Only return rows positioned after this cursor in the sort order.
+                Requires a sortable sort field.
+            filters (List[FieldFilter], optional): Conditions the rows must all match, see get_filters.
+            fields (Sequence[str], optional): Only select these columns, plus id and the sort field.
+                Returns plain rows instead of ORM objects, skipping the identity map.
+            include (Sequence[str], optional): Relationships to eager load, ignored with fields. See get_load_options.
+
+        Returns:
+            List[Self] | List[Row]: The matching objects, or rows if fields is given.
+        """
         async with DatabaseService.async_session(schema_name) as session:
-            q = select(cls.get_model_class())
+            model = cls.get_model_class()
+            if fields is not None:
+                # Keyset pagination needs id and the sort value of the last row
+                extra_fields = ['id'] + ([parse_sort(sort)[0]] if sort is not None else [])
+                q = select(*cls.get_columns(list(fields) + extra_fields))
+            else:
+                q = select(model)
+                if include is not None:
+                    q = q.options(*cls.get_load_options(tuple(include)))
+
+            for f in filters or []:
+                q = q.where(f.to_clause(getattr(model, f.field)))
+
+            if sort is not None:
+                field, descending = cls.get_sort_field(sort, keyset=after is not None)
+                if field == 'id':
+                    keys = [model.id]
+                    position = after.id if after is not None else None
+                else:
+                    keys = [getattr(model, field), model.id]
+                    position = tuple_(after.value, after.id) if after is not None else None
+                q = q.order_by(*[k.desc() if descending else k for k in keys])
+
+                if after is not None:
+                    key = keys[0] if len(keys) == 1 else tuple_(*keys)
+                    q = q.where(key < position if descending else key > position)
+
             if offset is not None:
                 q = q.offset(offset)
             if limit is not None:
                 q = q.limit(limit)
 
             res = await session.execute(q)
-            all = res.scalars().all()
-            # meta = {
-            #     "offset": offset,
-            #     "limit": limit,
-            #     "total": len(all)
-            # }
-            # return {
-            #     'meta': meta,
-            #     'data': all,
-            # }
-            return all
-
-    @classmethod
-    async def popo_read_all(cls, schema_name = SHARED_SCHEMA_NAME) -> List[Dict]:
-        """Gets all objects from the database as plain old python objects.
+            return res.all() if fields is not None else res.scalars().all()
+
+    @classmethod
+    @tag_queries
+    async def read_page(
+        cls,
+        schema_name = SHARED_SCHEMA_NAME,
+        limit: int = READ_ALL_LIMIT_DEFAULT,
+        sort: str = 'id',
+        cursor: str = None,
+        filters: List[FieldFilter] = None,
+        fields: Sequence[str] = None,
+        include: Sequence[str] = None,
+    ) -> Tuple[List[Self] | List[Row], Optional[str]]:
+        """Gets one page of objects using keyset pagination, so that every page costs the same as the first.
+
+        Args:
+            schema_name (str): Schema to read from.
+            limit (int): Page size.
+            sort (str): Sortable fieldname, optionally prefixed with '-' for descending order.
+            cursor (str, optional): Cursor returned with the previous page. Omit or leave empty for the first page.
+            filters (List[FieldFilter], optional): Conditions the rows must all match. Must be the same for every page.
+            fields (Sequence[str], optional): Only select these columns, see read_all.
+            include (Sequence[str], optional): Relationships to eager load, see read_all.
+
+        Returns:
+            Tuple[List[Self] | List[Row], Optional[str]]: The page and the cursor for the next page, None if this is the last page.
+        """
+        field, _ = cls.get_sort_field(sort, keyset=True)
+        after = None
+        if cursor:
+            after = decode_cursor(
+                cursor,
+                sort=sort,
+                value_type=cls.get_field_types(fields=(field,))[field],
+            )
+
+        # Fetch one extra row to know whether there is a next page
+        items = await cls.read_all(
+            schema_name=schema_name,
+            limit=limit + 1,
+            sort=sort,
+            after=after,
+            filters=filters,
+            fields=fields,
+            include=include,
+        )
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(sort, getattr(last, field), last.id)
+
+        return items, next_cursor
+
+    @classmethod
+    @tag_queries
+    async def popo_read_all(
+        cls,
+        schema_name = SHARED_SCHEMA_NAME,
+        offset: int = None,
+        limit: int = None,
+        sort: str = None,
+        filters: List[FieldFilter] = None,
+        fields: Sequence[str] = None,
+    ) -> List[Dict]:
+        """Gets objects from the database as plain old python objects ("core mode").
+        Same as read_all, but rows are fetched as tuples without building ORM objects,
+        so the result can be serialized straight to JSON without to_dict or validators.
+
+        Args:
+            schema_name (str): Schema to read from.
+            offset (int, optional): Number of rows to skip.
+            limit (int, optional): Maximum number of rows to return.
+            sort (str, optional): Fieldname, optionally prefixed with '-' for descending order.
+            filters (List[FieldFilter], optional): Conditions the rows must all match, see get_filters.
+            fields (Sequence[str], optional): Only return these fields. All columns if omitted.
 
         Returns:
             List[Dict]: List of dicts composed of plain old python objects
         """
-        async with DatabaseService.async_session(schema_name) as session:
-            q = select(cls.get_model_class())
-            res = await session.execute(text(str(q)))
-            # return [row for row in res]
-            return res
+        rows = await cls.read_all(
+            schema_name=schema_name,
+            offset=offset,
+            limit=limit,
+            sort=sort,
+            filters=filters,
+            fields=fields or cls.get_column_names(),
+        )
+        return cls.rows_to_dicts(rows, fields)
+
+    @classmethod
+    def rows_to_dicts(cls, rows: Sequence[Row], fields: Sequence[str] = None) -> List[Dict]:
+        """Converts rows of a projection (see read_all's fields) to dicts.
+
+        Args:
+            rows (Sequence[Row]): Rows
+            fields (Sequence[str], optional): Fields to keep, e.g. to drop the extra pagination columns. All if omitted.
+
+        Returns:
+            List[Dict]: One dict per row
+        """
+        if fields is None:
+            return [row._asdict() for row in rows]
+        return [{f: row._mapping[f] for f in fields} for row in rows]
+
+    @classmethod
+    @lru_cache()
+    def get_column_names(cls) -> List[str]:
+        """Get the names of all columns in table order, e.g. to label raw rows.
+
+        Returns:
+            List[str]: List of column names.
+        """
+        return [c.name for c in cls.get_model_class().__table__.columns]
+
+    @classmethod
+    def get_columns(cls, fields: Sequence[str]) -> List[Column]:
+        """Get the columns for a projection, in table order and without duplicates.
+
+        Args:
+            fields (Sequence[str]): Column names
+
+        Returns:
+            List[Column]: Columns to select
+        """
+        return [c for c in cls.get_model_class().__table__.columns if c.name in fields]
+
+    @classmethod
+    @lru_cache()
+    def get_relationship_names(cls) -> Tuple[str, ...]:
+        """Names of the relationships that can be eager loaded, e.g. ('critic', 'book') for Review.
+
+        Returns:
+            Tuple[str, ...]: Relationship names, in mapping order
+        """
+        return tuple(r.key for r in inspect(cls.get_model_class()).relationships)
 
     @classmethod
-    async def delete_by_id(cls, id: int, schema_name = SHARED_SCHEMA_NAME) -> int:
+    @lru_cache()
+    def get_load_options(cls, include: Tuple[str, ...]) -> List[Load]:
+        """Eager load options for some relationships, so they are fetched with the objects instead of one query per object.
+        Many-to-one relationships are joined into the same query, which can't multiply rows.
+        Collections are loaded with one extra `IN` query each, which keeps LIMIT working on the parent rows.
+        Either way the number of queries doesn't depend on the number of objects.
+
+        Args:
+            include (Tuple[str, ...]): Relationship names, see get_relationship_names
+
+        Returns:
+            List[Load]: Options for Select.options
+        """
+        relationships = inspect(cls.get_model_class()).relationships
+        return [
+            selectinload(relationships[name].class_attribute) if relationships[name].uselist
+            else joinedload(relationships[name].class_attribute)
+            for name in include
+        ]
+
+    @classmethod
+    async def stream_rows(
+        cls,
+        schema_name = SHARED_SCHEMA_NAME,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+        fields: Sequence[str] = None,
+    ) -> AsyncIterator[Sequence[Sequence]]:
+        """Streams all rows of the table through a server-side cursor, in partitions of chunk_size.
+        Rows are plain tuples in the order of fields, no ORM instances are built,
+        so memory stays flat regardless of table size.
+
+        Args:
+            schema_name (str): Schema to read from.
+            chunk_size (int): Number of rows fetched from the cursor per round trip.
+            fields (Sequence[str], optional): Columns to select, in row order. All columns (get_column_names) if omitted.
+
+        Yields:
+            Sequence[Sequence]: Partition of up to chunk_size rows.
+        """
+        # Streaming outlives the request handler, so use a dedicated session
+        async with DatabaseService.async_session(schema_name, use_unit_of_work=False) as session:
+            columns = cls.get_model_class().__table__.columns
+            q = select(*[columns[f] for f in fields or cls.get_column_names()]).order_by(cls.get_model_class().id)
+            res = await session.stream(
+                q,
+                execution_options={
+                    'yield_per': chunk_size,
+                    QUERY_TAGS_OPTION: (cls.__name__, 'stream_rows'),
+                },
+            )
+            async for partition in res.partitions(chunk_size):
+                yield partition
+
+    @classmethod
+    @tag_queries
+    async def delete_by_id(cls, id: int, schema_name = SHARED_SCHEMA_NAME) -> Union[None, int]:
+        """Deletes the object with the given id.
+
+        Returns:
+            Union[None, int]: The id if the object was deleted, None if it doesn't exist.
+        """
         async with DatabaseService.async_session(schema_name) as session:
-            q = delete(cls.get_model_class()).where(cls.get_model_class().id == id)
-            await session.execute(q)
-            return id
+            q = delete(cls.get_model_class()).where(cls.get_model_class().id == id).returning(cls.get_model_class().id)
+            res = await session.execute(q)
+            return res.scalar()
 
     @classmethod
+    @tag_queries
     async def delete_all(cls, schema_name = SHARED_SCHEMA_NAME,) -> List[int]:
         async with DatabaseService.async_session(schema_name) as session:
             q = delete(cls.get_model_class()).returning(cls.get_model_class().id)
             res = await session.execute(q)
-            await session.commit()
             return res.scalars().all()
 
     @classmethod
+    @tag_queries
     async def update_by_id(
         cls,
         id: int,
         item: AppValidator,
         schema_name = SHARED_SCHEMA_NAME,
         apply_none_values: bool = False,
-    ) -> Self:
+    ) -> Union[None, Self]:
+        """Updates the object with the given id and returns it as stored, in a single statement.
+
+        Returns:
+            Union[None, Self]: The updated object, None if it doesn't exist.
+        """
+        values = {
+            k: v for k, v in item.to_dict(keep_none_values=apply_none_values).items() if k != 'id'
+        }
+
+        # Nothing to set, so don't touch updated_at
+        if len(values) == 0:
+            return await cls.read_by_id(id=id, schema_name=schema_name)
+
         async with DatabaseService.async_session(schema_name) as session:
-            q = update(cls.get_model_class())
-            await session.execute(
-                q,
-                [
-                    {
-                        'id': id,
-                        **item.to_dict(keep_none_values=apply_none_values)
-                    }
-                ]
+            q = (
+                update(cls.get_model_class())
+                .where(cls.get_model_class().id == id)
+                .values(**values)
+                .returning(cls.get_model_class())
             )
-            await session.commit()
-            return await cls.read_by_id(id=id, schema_name=schema_name)
+            res = await session.execute(q, execution_options={'populate_existing': True})
+            return res.scalars().first()
 
     # TODO: Find best way to do List[Self]
     @classmethod
+    @tag_queries
     async def create_many(
         cls,
         items: List[AppValidator] | List[Self],
@@ -387,11 +835,85 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         async with DatabaseService.async_session(schema_name) as session:
             q = insert(cls.get_model_class()).returning(cls.get_model_class().id)
             res = await session.execute(q, [d.to_dict() for d in items])
-            await session.commit()
             return res.scalars().all()
 
     @classmethod
-    @lru_cache(maxsize=1)
+    @lru_cache()
+    def get_copy_fieldnames(cls) -> List[str]:
+        """Get a list of fieldnames to COPY. The id is left to the database sequence.
+
+        Returns:
+            List[str]: List of fieldnames to COPY.
+        """
+        return [c for c in cls.get_column_names() if c != 'id']
+
+    @classmethod
+    def get_copy_record(cls, item: Dict) -> Tuple:
+        """Converts an item into a record for COPY.
+        COPY bypasses SQLAlchemy, so client-side column defaults (e.g. created_at) are applied here.
+
+        Args:
+            item (Dict): Item to convert
+
+        Returns:
+            Tuple: Values in get_copy_fieldnames order
+        """
+        columns = cls.get_model_class().__table__.columns
+        record = []
+        for f in cls.get_copy_fieldnames():
+            if f in item:
+                record.append(item[f])
+            elif columns[f].default is None:
+                record.append(None)
+            elif columns[f].default.is_callable:
+                record.append(columns[f].default.arg(None))
+            else:
+                record.append(columns[f].default.arg)
+        return tuple(record)
+
+    @classmethod
+    @tag_queries
+    async def copy_many(
+        cls,
+        items: List[AppValidator] | List[Self],
+        schema_name = SHARED_SCHEMA_NAME,
+        return_ids: bool = True,
+        chunk_size: int = BULK_COPY_CHUNK_SIZE,
+    ) -> List[int]:
+        """Bulk loads items using binary COPY, which is an order of magnitude faster than create_many for large inputs.
+
+        Args:
+            items (List[AppValidator] | List[Self]): Items to create
+            schema_name (str): Schema to load into.
+            return_ids (bool): Whether to return the new ids. Requires a pass through a staging table.
+            chunk_size (int): Max records per COPY.
+
+        Returns:
+            List[int]: Ids of the created items in input order, or an empty list if return_ids is False.
+        """
+        records = [cls.get_copy_record(item.to_dict()) for item in items]
+        async with DatabaseService.async_session(schema_name) as session:
+            if return_ids:
+                return await copy_records_returning_ids(
+                    session,
+                    table=cls.get_model_class().__table__,
+                    columns=cls.get_copy_fieldnames(),
+                    records=records,
+                    schema_name=schema_name,
+                    chunk_size=chunk_size,
+                )
+            await copy_records(
+                session,
+                table=cls.get_model_class().__table__,
+                columns=cls.get_copy_fieldnames(),
+                records=records,
+                schema_name=schema_name,
+                chunk_size=chunk_size,
+            )
+            return []
+
+    @classmethod
+    @lru_cache()
     def get_on_conflict_fields(cls) -> List[str]:
         """Gets a list of fieldnames that should be used in the ON CONFLICT clause of an upsert query.
 
@@ -413,6 +935,7 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         return { f: q.excluded[f] for f in cls.get_on_conflict_fields() }
 
     @classmethod
+    @tag_queries
     async def upsert(
         cls,
         item: AppValidator,
@@ -420,64 +943,130 @@ class AppModel(DeclarativeBase, IdMixin, AuditTimestampsMixin, ToDictMixin):
         apply_none_values: bool = False
     ) -> Self:
         async with DatabaseService.async_session(schema_name) as session:
-            q = upsert(cls.get_model_class())
+            res = await session.execute(cls.get_upsert_statement(), [item.to_dict()], execution_options={'populate_existing': True})
+            return res.scalars().first()
 
-            ucn = cls.get_unique_constraint_names()
-            ucf = cls.get_unique_fieldnames()
+    @classmethod
+    def get_on_conflict_statement(cls) -> Insert:
+        """INSERT ... ON CONFLICT DO UPDATE on the model's unique fields, or else its first unique constraint.
 
-            logger.warning('HEEEEEEEEEEEEEREEEEEEEEEEE')
-            logger.warning(ucn)
-            logger.warning(ucf)
+        Returns:
+            Insert: Statement without a RETURNING clause
+        """
+        q = upsert(cls.get_model_class())
+
+        ucn = cls.get_unique_constraint_names()
+        ucf = cls.get_unique_fieldnames()
+
+        # TODO: Ensure this is the desired behaviour. This allows only the following:
+        # If there are any fields marked as unique, use those to uniquely identify the record.
+        # If there are no fields marked as unique, use the first unique constraint.
+        if len(ucf) > 0:
+            q = q.on_conflict_do_update(
+                index_elements=cls.get_unique_fieldnames(),
+                set_=cls.get_on_conflict_params(q=q)
+            )
+        elif len(ucn) > 0:
+            q = q.on_conflict_do_update(
+                constraint=ucn[0],      # TODO: Handle multiple unique constraints?
+                set_=cls.get_on_conflict_params(q=q)
+            )
+        return q
 
-            # TODO: Ensure this is the desired behaviour
-            if len(ucf) > 0:
-                q = q.on_conflict_do_update(
-                    index_elements=cls.get_unique_fieldnames(),
-                    set_=cls.get_on_conflict_params(q=q)
-                )
-            elif len(ucn) > 0:
-                q = q.on_conflict_do_update(
-                    constraint=ucn[0],      # TODO: Handle multiple unique constraints?
-                    set_=cls.get_on_conflict_params(q=q)
-                )
+    @classmethod
+    @lru_cache()
+    def get_upsert_statement(cls) -> Insert:
+        """Statement for upsert, built once per model. The values are passed as parameters on execution."""
+        return cls.get_on_conflict_statement().returning(cls.get_model_class())
 
-            q = q.returning(cls.get_model_class().id)
-            res = await session.execute(q, item.to_dict())
-            await session.commit()
-            return await cls.read_by_id(id=res.scalar(), schema_name=schema_name)
+    @classmethod
+    @lru_cache()
+    def get_upsert_many_statement(cls) -> Insert:
+        """Statement for upsert_many, built once per model. The values are passed as parameters on execution."""
+        # xmax is 0 for rows the statement inserted, and the updating transaction's id for rows it updated
+        return cls.get_on_conflict_statement().returning(
+            cls.get_model_class().id,
+            literal_column('(xmax = 0)', Boolean),
+            sort_by_parameter_order=True,
+        )
 
     @classmethod
+    @tag_queries
     async def upsert_many(
         cls,
         items: List[AppValidator],
         schema_name = SHARED_SCHEMA_NAME,
         apply_none_values: bool = False,
-    ) -> List[int]:
-        async with DatabaseService.async_session(schema_name) as session:
-            q = upsert(cls.get_model_class())
-
-            ucn = cls.get_unique_constraint_names()
-            ucf = cls.get_unique_fieldnames()
-
-            # TODO: Ensure this is the desired behaviour. This allows only the following:
-            # If there are any fields marked as unique, use those to uniquely identify the record.
-            # If there are no fields marked as unique, use the first unique constraint.
-            if len(ucf) > 0:
-                q = q.on_conflict_do_update(
-                    index_elements=cls.get_unique_fieldnames(),
-                    set_=cls.get_on_conflict_params(q=q)
-                )
-            elif len(ucn) > 0:
-                q = q.on_conflict_do_update(
-                    constraint=ucn[0],      # TODO: Handle multiple unique constraints?
-                    set_=cls.get_on_conflict_params(q=q)
-                )
-            q = q.returning(cls.get_model_class().id)
-            res = await session.execute(q, [item.to_dict(keep_none_values=apply_none_values) for item in items])
-            await session.commit()
-            return res.scalars().all()
+        chunk_size: int = BULK_UPSERT_CHUNK_SIZE,
+        mode: UpsertMode = UpsertMode.TRANSACTION,
+        concurrency: int = 1,
+    ) -> UpsertResult:
+        """Creates or updates items with INSERT ... ON CONFLICT, chunk_size items per statement.
 
+        Args:
+            items (List[AppValidator]): Items to upsert
+            schema_name (str): Schema to upsert into.
+            apply_none_values (bool): Whether None values overwrite stored values.
+            chunk_size (int): Max items per statement.
+            mode (UpsertMode): How chunks are committed and what a failed chunk does, see UpsertMode.
+            concurrency (int): Chunks upserted at once, each on its own connection. Only applies to UpsertMode.COMMIT.
+                All requests together are capped at BULK_UPSERT_CONNECTIONS_MAX connections.
+
+        Raises:
+            DBAPIError: In UpsertMode.TRANSACTION, if any chunk fails.
+
+        Returns:
+            UpsertResult: Ids in input order, inserted vs updated counts and the failed chunks.
+        """
+        q = cls.get_upsert_many_statement()
+
+        # Chunks are converted as they are sent, so only one chunk of dicts is in memory per connection
+        def get_params(chunk: Sequence[AppValidator]) -> List[Dict]:
+            return [item.to_dict(keep_none_values=apply_none_values) for item in chunk]
+
+        chunks = list(chunked(items, chunk_size))
+        result = UpsertResult()
+
+        if mode == UpsertMode.COMMIT:
+            semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+            async def upsert_chunk(chunk: Sequence[AppValidator]) -> Union[Sequence[Row], DBAPIError]:
+                async with semaphore, commit_mode_connections:
+                    try:
+                        async with DatabaseService.async_session(schema_name, use_unit_of_work=False) as session:
+                            return (await session.execute(q, get_params(chunk))).all()
+                    except DBAPIError as e:
+                        return e
+
+            outcomes = await asyncio.gather(*[upsert_chunk(chunk) for chunk in chunks])
+            for i, (chunk, outcome) in enumerate(zip(chunks, outcomes)):
+                if isinstance(outcome, DBAPIError):
+                    logger.error(f"Upsert of {cls.__name__} chunk {i} ({len(chunk)} items) failed: {outcome}")
+                    result.add_failure(i, len(chunk), outcome)
+                else:
+                    result.add_rows(outcome)
+            return result
+
+        async with DatabaseService.async_session(schema_name) as session:
+            for i, chunk in enumerate(chunks):
+                if mode == UpsertMode.TRANSACTION:
+                    result.add_rows((await session.execute(q, get_params(chunk))).all())
+                    continue
+
+                try:
+                    async with session.begin_nested():
+                        rows = (await session.execute(q, get_params(chunk))).all()
+                except DBAPIError as e:
+                    logger.error(f"Upsert of {cls.__name__} chunk {i} ({len(chunk)} items) failed: {e}")
+                    result.add_failure(i, len(chunk), e)
+                    continue
+                result.add_rows(rows)
+        return result
+
+    @tag_queries
     async def save(self, schema_name: str = SHARED_SCHEMA_NAME) -> Self:
         async with DatabaseService.async_session(schema_name) as session:
             session.add(self)
+            # Populate generated fields now, the commit may be deferred to the end of the request
+            await session.flush()
             return self
@@ -1,13 +1,101 @@
+from datetime import timedelta
+from typing import Any, Iterable, List, Optional, Sequence, Union
+from uuid import uuid4
+
 from arq import create_pool, ArqRedis
+from arq.constants import expires_extra_ms, job_key_prefix, result_key_prefix
+from arq.jobs import Job, serialize_job
+from arq.utils import timestamp_ms, to_ms
+from redis.commands.core import AsyncScript
 
 from src.logging.service import logger
+from src.config import ENQUEUE_BATCH_SIZE
 from src.modules.arqueue.config import REDIS_SETTINGS
 
 
+# Enqueues a batch of jobs atomically, skipping ids that have a job or result already, like ArqRedis.enqueue_job.
+# KEYS: queue, then (job key, result key) per job. ARGV: (job id, score, expiry ms, serialized job) per job.
+# Returns 1 per job that was enqueued, 0 per duplicate.
+ENQUEUE_MANY_SCRIPT = """
+local enqueued = {}
+for i = 0, #ARGV / 4 - 1 do
+    if redis.call('exists', KEYS[2 + i * 2], KEYS[3 + i * 2]) == 0 then
+        redis.call('psetex', KEYS[2 + i * 2], ARGV[3 + i * 4], ARGV[4 + i * 4])
+        redis.call('zadd', KEYS[1], ARGV[2 + i * 4], ARGV[1 + i * 4])
+        enqueued[i + 1] = 1
+    else
+        enqueued[i + 1] = 0
+    end
+end
+return enqueued
+"""
+
+
 class Bus:
     queue: ArqRedis = None
+    _enqueue_many_script: AsyncScript = None
 
     @classmethod
     async def init(cls):
         logger.warning('Creating Redis pool...')
         cls.queue = await create_pool(REDIS_SETTINGS)
+        cls._enqueue_many_script = cls.queue.register_script(ENQUEUE_MANY_SCRIPT)
+
+    @classmethod
+    async def enqueue_many(
+        cls,
+        function: str,
+        args: Iterable[Sequence[Any]],
+        job_ids: Sequence[str] = None,
+        queue_name: str = None,
+        defer_by: Union[None, int, float, timedelta] = None,
+        batch_size: int = ENQUEUE_BATCH_SIZE,
+    ) -> List[Optional[Job]]:
+        """Enqueues one job per set of arguments, batch_size jobs per round trip.
+        Each batch is checked and written atomically by a script, so ids that already have a job or a result
+        are skipped, like with ArqRedis.enqueue_job, which needs a WATCH/MULTI round trip per job.
+
+        Args:
+            function (str): Name of the job function
+            args (Iterable[Sequence[Any]]): Positional arguments per job
+            job_ids (Sequence[str]): Job id per job, to dedupe jobs. Random if omitted.
+            queue_name (str): Queue to add the jobs to. The default queue if omitted.
+            defer_by (Union[None, int, float, timedelta]): Duration to wait before running the jobs
+            batch_size (int): Max jobs per round trip. Redis is blocked while a batch is written.
+
+        Returns:
+            List[Optional[Job]]: One per set of arguments, None where a job with that id already existed.
+        """
+        queue_name = queue_name or cls.queue.default_queue_name
+        args = list(args)
+        if job_ids is None:
+            job_ids = [uuid4().hex for _ in args]
+        elif len(job_ids) != len(args):
+            raise ValueError(f"Got {len(job_ids)} job ids for {len(args)} jobs.")
+
+        defer_by_ms = to_ms(defer_by) or 0
+        expires_ms = defer_by_ms + expires_extra_ms
+
+        jobs = []
+        for start in range(0, len(args), batch_size):
+            batch_ids = job_ids[start:start + batch_size]
+            enqueue_time_ms = timestamp_ms()
+            score = enqueue_time_ms + defer_by_ms
+
+            keys = [queue_name]
+            argv = []
+            for job_id, job_args in zip(batch_ids, args[start:start + batch_size]):
+                keys += [job_key_prefix + job_id, result_key_prefix + job_id]
+                argv += [
+                    job_id,
+                    score,
+                    expires_ms,
+                    serialize_job(function, tuple(job_args), {}, None, enqueue_time_ms, serializer=cls.queue.job_serializer),
+                ]
+
+            enqueued = await cls._enqueue_many_script(keys=keys, args=argv)
+            jobs += [
+                Job(job_id, redis=cls.queue, _queue_name=queue_name, _deserializer=cls.queue.job_deserializer) if e else None
+                for job_id, e in zip(batch_ids, enqueued)
+            ]
+        return jobs
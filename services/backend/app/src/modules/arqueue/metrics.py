@@ -0,0 +1,59 @@
+import time
+
+from arq import ArqRedis
+from arq.constants import default_queue_name
+
+from src.modules.arqueue.bus import Bus
+from src.metrics.service import registry
+
+
+# Jobs run in the worker processes, so their timings are aggregated in Redis rather than in memory
+JOB_METRICS_KEY = 'metrics:arq_jobs'
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+queue_depth = registry.gauge('arq_queue_depth', 'Jobs in the arq queue, including deferred ones.')
+queue_oldest_due_age = registry.gauge('arq_queue_oldest_due_job_age_seconds', 'How long the oldest due job has been waiting for a worker.')
+job_queued = registry.histogram('arq_job_queued_seconds', 'Time from enqueueing until a worker started the job.', buckets=JOB_BUCKETS)
+job_duration = registry.histogram('arq_job_duration_seconds', 'Job run time.', buckets=JOB_BUCKETS)
+
+JOB_HISTOGRAMS = {
+    'queued': job_queued,
+    'duration': job_duration,
+}
+
+
+async def record_job(redis: ArqRedis, queued_seconds: float, duration_seconds: float) -> None:
+    """Adds a finished job's timings to the shared histograms. Called by the workers.
+
+    Args:
+        redis (ArqRedis): Worker's Redis connection
+        queued_seconds (float): Time from enqueueing until the job started
+        duration_seconds (float): Job run time
+    """
+    values = {'queued': queued_seconds, 'duration': duration_seconds}
+    async with redis.pipeline(transaction=False) as pipe:
+        for name, histogram in JOB_HISTOGRAMS.items():
+            pipe.hincrby(JOB_METRICS_KEY, f"{name}:{histogram.get_bucket_index(values[name])}", 1)
+            pipe.hincrbyfloat(JOB_METRICS_KEY, f"{name}:sum", values[name])
+        await pipe.execute()
+
+
+async def collect_queue_metrics() -> None:
+    if Bus.queue is None:
+        return
+
+    now_ms = time.time() * 1000
+    queue_depth.set(await Bus.queue.zcard(default_queue_name))
+    # Jobs are scored by the time they are due
+    oldest_due = await Bus.queue.zrangebyscore(default_queue_name, '-inf', now_ms, start=0, num=1, withscores=True)
+    queue_oldest_due_age.set((now_ms - oldest_due[0][1]) / 1000 if len(oldest_due) > 0 else 0)
+
+    raw = {k.decode(): v.decode() for k, v in (await Bus.queue.hgetall(JOB_METRICS_KEY)).items()}
+    for name, histogram in JOB_HISTOGRAMS.items():
+        histogram.load(
+            counts=[int(raw.get(f"{name}:{i}", 0)) for i in range(len(histogram.buckets) + 1)],
+            total=float(raw.get(f"{name}:sum", 0)),
+        )
+
+
+registry.add_collector(collect_queue_metrics)
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from typing import Dict
 
 from fastapi import APIRouter, status, Response
@@ -54,25 +55,33 @@ async def sandbox(response: Response) -> Dict:
     summary='Throughput testing Arqueue',
     description='Endpoint description. Will use the docstring if not provided.',
 )
-async def no_op_task(n: int = 2500) -> Dict:
+async def no_op_task(n: int = 2500, pipelined: bool = True) -> Dict:
     logger.warning(f'Enqueuing {n} tasks...')
-    # Blast
-    # 11s for 5k with 1 worker - 450/s, very slow too
-    # 6s for 5k with 20 worker - 900/s, very slow too
-    # tasks = [Bus.queue.enqueue_job('no_op_task', i) for i in range(n)]
-    # await asyncio.gather(*tasks)
+    s = time.monotonic()
+    if pipelined:
+        # One scripted round trip per ENQUEUE_BATCH_SIZE jobs
+        await Bus.enqueue_many('no_op_task', ((i,) for i in range(n)))
+    else:
+        # Blast
+        # 11s for 5k with 1 worker - 450/s, very slow too
+        # 6s for 5k with 20 worker - 900/s, very slow too
+        # tasks = [Bus.queue.enqueue_job('no_op_task', i) for i in range(n)]
+        # await asyncio.gather(*tasks)
 
-    # Iterate
-    # 25s for 10k with 1 worker: 400/s, very slow
-    # 6s for 5k with 20 worker: 900/s, very slow too
-    # 125s for 50k with 2 worker: 400/s, very slow too
-    # 48 for 50k with 20 worker: 1000/s, very slow too
-    for i in range(n):
-        await Bus.queue.enqueue_job('no_op_task', i)
-    logger.warning(f'Enqueued {n} tasks')
+        # Iterate
+        # 25s for 10k with 1 worker: 400/s, very slow
+        # 6s for 5k with 20 worker: 900/s, very slow too
+        # 125s for 50k with 2 worker: 400/s, very slow too
+        # 48 for 50k with 20 worker: 1000/s, very slow too
+        for i in range(n):
+            await Bus.queue.enqueue_job('no_op_task', i)
+    took = time.monotonic() - s
+    logger.warning(f'Enqueued {n} tasks in {took:.3f}s: {n / took:.0f}/s')
 
     return {
         'message': 'Sandbox tasks enqueued.',
+        'seconds': took,
+        'jobs_per_second': n / took,
     }
 
 
@@ -83,8 +92,7 @@ async def no_op_task(n: int = 2500) -> Dict:
     description='Endpoint description. Will use the docstring if not provided.',
 )
 async def db_task(n: int = 2500) -> Dict:
-    tasks = [Bus.queue.enqueue_job('db_task', i) for i in range(n)]
-    await asyncio.gather(*tasks)
+    await Bus.enqueue_many('db_task', ((i,) for i in range(n)))
     return {
         'message': 'Sandbox tasks enqueued.',
     }
@@ -1,11 +1,20 @@
 import random
+import time
 
+from arq import cron
+from arq.worker import func
 from httpx import AsyncClient
 
 from src.logging.service import logger
 from src.modules.arqueue.config import REDIS_SETTINGS
+from src.modules.arqueue.metrics import record_job
 from src.database.service import DatabaseService
 from src.modules.book.models import Book
+from src.tenant import pool
+from src.bulk_jobs import run_bulk_job
+from src.config import BULK_JOB_TIMEOUT_SECONDS
+# Generating the routes registers the models bulk jobs can run on
+import src.helpers.route_manager
 
 # Command line docker compose command to increase the number of workers:
 # docker compose scale worker=10
@@ -31,6 +40,21 @@ async def db_task(ctx, param):
     res = await Book.read_all(limit=10000)
     return f'Finished task for {res[random.randint(0, len(res) - 1)].name}'
 
+async def top_up_tenant_schema_pool(ctx):
+    created = await pool.top_up()
+    return f'Cloned {created} tenant schemas'
+
+async def on_job_start(ctx):
+    ctx['started_at'] = time.time()
+
+async def on_job_end(ctx):
+    finished_at = time.time()
+    await record_job(
+        ctx['redis'],
+        queued_seconds=ctx['started_at'] - ctx['enqueue_time'].timestamp(),
+        duration_seconds=finished_at - ctx['started_at'],
+    )
+
 async def startup(ctx):
     logger.info('Worker starting up...')
     ctx['session'] = AsyncClient()
@@ -45,8 +69,20 @@ async def shutdown(ctx):
 # it's used by the arq cli.
 # For a list of available settings, see https://arq-docs.helpmanual.io/#arq.worker.Worker
 class ArqueueWorkerSettings:
-    functions = [download_content, no_op_task, db_task]
+    functions = [
+        download_content,
+        no_op_task,
+        db_task,
+        # No result kept, it would dedupe the fixed job id used by Tenant.provision until it expires
+        func(top_up_tenant_schema_pool, keep_result=0),
+        # Not retried, a rerun would repeat the chunks that were already committed
+        func(run_bulk_job, timeout=BULK_JOB_TIMEOUT_SECONDS, max_tries=1),
+    ]
+    # Also catches pool schemas made stale by migrations
+    cron_jobs = [cron(top_up_tenant_schema_pool, second=0, run_at_startup=True)]
     on_startup = startup
     on_shutdown = shutdown
+    on_job_start = on_job_start
+    on_job_end = on_job_end
     redis_settings=REDIS_SETTINGS
     poll_delay=0.025
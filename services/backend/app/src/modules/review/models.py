@@ -16,9 +16,11 @@ from src.modules.book.models import Book
 class Review(TenantModelMixin, AppModel):
     title:     Mapped[str]           = mapped_column()
     critic_id: Mapped[int]           = mapped_column(BigInteger, ForeignKey(Critic.id))
-    # critic:    Mapped[Critic]        = relationship(back_populates='reviews')
+    # Only loaded when asked for, e.g. with include=critic. Lazy loading would be an implicit query per review,
+    # which doesn't work with async sessions anyway, so it raises instead.
+    critic:    Mapped[Critic]        = relationship(lazy='raise')
     book_id:   Mapped[int]           = mapped_column(BigInteger, ForeignKey(Book.id))
-    # book:      Mapped[Book]          = relationship(back_populates='reviews')
+    book:      Mapped[Book]          = relationship(lazy='raise')
     rating:    Mapped[int]           = mapped_column()
     body:      Mapped[Optional[str]] = mapped_column()
 
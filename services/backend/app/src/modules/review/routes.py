@@ -5,6 +5,8 @@ from src.modules.review.validators import (
     ReviewUpdate,
     ReviewUpdateWithId
 )
+from src.modules.critic.validators import CriticGet
+from src.modules.book.validators import BookGet
 from src.routes import generate_route_class
 
 
@@ -14,5 +16,9 @@ RouteClass = generate_route_class(
     ReadValidatorClass         = ReviewGet,
     UpdateValidatorClass       = ReviewUpdate,
     UpdateWithIdValidatorClass = ReviewUpdateWithId,
+    IncludeValidatorClasses    = {
+        'critic': CriticGet,
+        'book':   BookGet,
+    },
 )
 router = RouteClass().router
@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException, status
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class KeysetCursor:
+    """Position of the last row of a page for keyset pagination.
+
+    Rows are ordered by (sort field, id) so the cursor holds both values of the last row served.
+    """
+
+    def __init__(self, sort: str, value: Any, id: int) -> None:
+        self.sort = sort
+        self.value = value
+        self.id = id
+
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    """Splits a sort expression like '-created_at' into its fieldname and direction.
+
+    Args:
+        sort (str): Fieldname, optionally prefixed with '-' for descending order.
+
+    Returns:
+        Tuple[str, bool]: (fieldname, descending)
+    """
+    if sort.startswith('-'):
+        return sort[1:], True
+    return sort, False
+
+
+def encode_cursor(sort: str, value: Any, id: int) -> str:
+    """Encodes the position of the last row of a page into an opaque, url-safe token.
+
+    Args:
+        sort (str): Sort expression used for the page, e.g. '-identifier'
+        value (Any): Value of the sort field for the last row
+        id (int): Id of the last row
+
+    Returns:
+        str: Opaque cursor
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort, 'v': value, 'i': id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, value_type: type) -> KeysetCursor:
+    """Decodes a cursor produced by encode_cursor for the given sort expression.
+
+    Args:
+        cursor (str): Opaque cursor as received from the client
+        sort (str): Sort expression of the current request. Must match the one the cursor was issued for.
+        value_type (type): Python type of the sort field, used to restore the value
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or was issued for a different sort order.
+
+    Returns:
+        KeysetCursor: Decoded cursor
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value = payload['v']
+        if value is not None and value_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif value is not None:
+            value = value_type(value)
+        decoded = KeysetCursor(sort=payload['s'], value=value, id=int(payload['i']))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor.',
+        )
+
+    if decoded.sort != sort:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cursor was issued for sort '{decoded.sort}', not '{sort}'.",
+        )
+
+    return decoded
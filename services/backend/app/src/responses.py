@@ -0,0 +1,71 @@
+from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Tuple, Type
+
+from fastapi import Response
+from pydantic_core import to_json
+
+# Ships with fastapi[all], fall back to pydantic's serializer without it
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def default(value: Any) -> Any:
+    # Types orjson doesn't handle natively, output the way pydantic does
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return to_json(content)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson. Content that is already bytes is passed through as-is."""
+
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class ModelEncoder:
+    """Serializes ORM objects of one model straight to JSON bytes.
+    The attribute getter for the fields is built once per model, so encoding is one C-level getter call
+    and one dict per object, and no validator instances are built or re-validated by FastAPI.
+    """
+
+    def __init__(self, fields: Tuple[str, ...]) -> None:
+        self.fields = fields
+        self._get_values = attrgetter(*fields) if len(fields) > 1 else (lambda item: (getattr(item, fields[0]),))
+
+    def to_dict(self, item: Any) -> Dict:
+        return dict(zip(self.fields, self._get_values(item)))
+
+    def encode_one(self, item: Any) -> bytes:
+        return dumps(self.to_dict(item))
+
+    def encode_many(self, items: Iterable[Any]) -> bytes:
+        return dumps([self.to_dict(item) for item in items])
+
+
+@lru_cache()
+def get_model_encoder(model_class: Type, fields: Tuple[str, ...]) -> ModelEncoder:
+    """Cached encoder for a model and the fields of its read validator.
+
+    Args:
+        model_class (Type): Model the objects belong to
+        fields (Tuple[str, ...]): Fields to output, in order
+
+    Returns:
+        ModelEncoder: Encoder
+    """
+    return ModelEncoder(fields)
@@ -1,4 +1,4 @@
-from typing import Type, List, Dict
+from typing import Type, List, Dict, Optional, Tuple, Union
 
 from fastapi import (
     APIRouter,
@@ -6,31 +6,59 @@ from fastapi import (
     HTTPException,
     Query,
     Depends,
+    Request,
+    Response,
 )
+from fastapi.responses import StreamingResponse, JSONResponse
 from httpx import get
 from inflection import pluralize
+from pydantic_core import to_json
 
 from src.logging.service import logger
-from src.config import READ_ALL_LIMIT_DEFAULT, READ_ALL_LIMIT_MAX
+from src.config import (
+    READ_ALL_LIMIT_DEFAULT,
+    READ_ALL_LIMIT_MAX,
+    FAST_JSON_RESPONSES,
+    BULK_UPSERT_CHUNK_SIZE,
+    BULK_UPSERT_CONCURRENCY_MAX,
+)
 from src.versions import ApiVersion
+from src.database.service import DatabaseService
 from src.database.exceptions import handle_exception
+from src.pagination import NEXT_CURSOR_HEADER, parse_sort
+from src.filtering import FILTER_OPERATORS
+from src.database.bulk import UpsertMode
+from src.bulk_jobs import BulkOperation, register_bulk_model, stage_bulk_job, get_bulk_job
+from src.modules.arqueue.bus import Bus
+from src.responses import FastJSONResponse, get_model_encoder
+from src.export import ExportFormat, EXPORTERS, MEDIA_TYPES
 from src.models import AppModel, SharedModelMixin, TenantModelMixin
 from src.login.models import Login, get_current_login, get_unverified_login
-from src.validators import Bulk
+from src.validators import Bulk, BulkUpsert, BulkJob
 from src.validators import (
     ReadValidator,
     CreateValidator,
     UpdateValidator,
     UpdateWithIdValidator,
+    get_partial_validator,
+    get_included_validator,
+    get_list_adapter,
 )
 
 
+# Query parameters of the list route that aren't filters
+READ_ALL_PARAMS = ('offset', 'limit', 'cursor', 'sort', 'fields', 'core', 'ids', 'include')
+
+
 def generate_route_class(
     ModelClass: Type[AppModel],
     ReadValidatorClass: Type[ReadValidator],
     CreateValidatorClass: Type[CreateValidator],
     UpdateValidatorClass: Type[UpdateValidator],
     UpdateWithIdValidatorClass: Type[UpdateWithIdValidator],
+    fast_json: bool = FAST_JSON_RESPONSES,
+    IncludeValidatorClasses: Dict[str, Type[ReadValidator]] = None,
+    bulk_jobs: bool = True,
 ):
     # Basic setup
     klass = type(f"{ModelClass.__name__}Routes", (object,), {})
@@ -38,6 +66,10 @@ def generate_route_class(
         tags=[ModelClass.__tablename_friendly__],
         prefix=f"{ApiVersion.V1}/{ModelClass.__tablename__}",
         redirect_slashes=False,
+        # Router dependencies resolve first, so auth and CRUD calls all share the request's session.
+        # Function scope commits before the response is sent, so a failed commit fails the request.
+        dependencies=[Depends(DatabaseService.unit_of_work, scope='function')],
+        default_response_class=FastJSONResponse if fast_json else JSONResponse,
     )
 
     # Link attributes to dynamic class
@@ -47,6 +79,20 @@ def generate_route_class(
     setattr(klass, 'CreateValidatorClass',       CreateValidatorClass)
     setattr(klass, 'UpdateValidatorClass',       UpdateValidatorClass)
     setattr(klass, 'UpdateWithIdValidatorClass', UpdateWithIdValidatorClass)
+    # Relationship name -> read validator of the related model, for ?include=
+    IncludeValidatorClasses = IncludeValidatorClasses or {}
+    setattr(klass, 'IncludeValidatorClasses',    IncludeValidatorClasses)
+
+    # Columns the read validator exposes. Anything that reads raw columns (projections, core mode, export)
+    # is limited to these, so columns like Login.hashed_password never leave the database.
+    readable_fields = tuple(f for f in ReadValidatorClass.model_fields if f in ModelClass.get_column_names())
+    setattr(klass, 'readable_fields',            readable_fields)
+    # For the docs of ?fields=, e.g. `id,identifier`
+    fields_example = ','.join(['id'] + [f for f in readable_fields if f != 'id'][:1])
+
+    # So the worker can run background bulk jobs for this model
+    if bulk_jobs:
+        register_bulk_model(ModelClass, CreateValidatorClass, UpdateValidatorClass)
 
     # Injects the login's tenant_schema_name
     def get_extra_params(login: Login = None) -> Dict:
@@ -62,6 +108,92 @@ def generate_route_class(
             }
     setattr(klass, 'get_extra_params',           get_extra_params)
 
+    # Parses a sparse fieldset like 'id,title,rating', keeping the validator's field order so partial validators are reused
+    def get_fields(fields: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+        if fields is None:
+            return None
+        requested = set(f.strip() for f in fields.split(',') if f.strip() != '')
+        if len(requested) == 0 or not requested.issubset(readable_fields):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid fields '{fields}'. Selectable fields: {', '.join(readable_fields)}.",
+            )
+        return tuple(f for f in readable_fields if f in requested)
+    setattr(klass, 'get_fields',                 get_fields)
+
+    # Parses a batch of ids like '3,1,2', keeping their order and dropping duplicates
+    def get_ids(ids: Optional[str] = None) -> Optional[List[int]]:
+        if ids is None:
+            return None
+        try:
+            parsed = list(dict.fromkeys(int(id) for id in ids.split(',') if id.strip() != ''))
+        except ValueError:
+            parsed = []
+        if len(parsed) == 0 or len(parsed) > READ_ALL_LIMIT_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid ids '{ids}'. Pass 1 to {READ_ALL_LIMIT_MAX} comma separated integer ids.",
+            )
+        return parsed
+    setattr(klass, 'get_ids',                    get_ids)
+
+    # Parses relationships to embed like 'critic,book', in the order they are configured
+    includable = [name for name in IncludeValidatorClasses if name in ModelClass.get_relationship_names()]
+    def get_include(include: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+        if include is None:
+            return None
+        requested = set(i.strip() for i in include.split(',') if i.strip() != '')
+        if len(requested) == 0 or not requested.issubset(includable):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid include '{include}'. Includable: {', '.join(includable) or 'none'}.",
+            )
+        return tuple(i for i in includable if i in requested)
+    setattr(klass, 'get_include',                get_include)
+
+    # Serializes objects with eager loaded relationships through a validator that embeds them
+    def get_included_response(include: Tuple[str, ...], res: Union[AppModel, List[AppModel]], headers: Dict = None) -> Response:
+        IncludedValidatorClass = get_included_validator(
+            ReadValidatorClass,
+            tuple((name, IncludeValidatorClasses[name]) for name in include),
+        )
+        def construct(item: AppModel) -> ReadValidator:
+            related = {}
+            for name in include:
+                value = getattr(item, name)
+                related[name] = None if value is None else IncludeValidatorClasses[name].model_construct(**value.to_dict())
+            return IncludedValidatorClass.model_construct(**{**item.to_dict(), **related})
+
+        if isinstance(res, AppModel):
+            content = construct(res).model_dump_json()
+        else:
+            content = get_list_adapter(IncludedValidatorClass).dump_json([construct(item) for item in res])
+        return Response(content=content, media_type='application/json', headers=headers)
+    setattr(klass, 'get_included_response',      get_included_response)
+
+    # Serializes projected rows through a partial validator, bypassing the route's full response model
+    def get_partial_response(fields: Tuple[str, ...], rows: List, headers: Dict = None) -> Response:
+        PartialValidatorClass = get_partial_validator(ReadValidatorClass, fields)
+        items = [PartialValidatorClass.model_construct(**{f: getattr(row, f) for f in fields}) for row in rows]
+        return Response(
+            content=get_list_adapter(PartialValidatorClass).dump_json(items),
+            media_type='application/json',
+            headers=headers,
+        )
+    setattr(klass, 'get_partial_response',       get_partial_response)
+
+    # Opt-in: encode ORM objects straight to bytes, skipping model_construct and FastAPI's validate/serialize pass
+    encoder = get_model_encoder(ModelClass, readable_fields)
+    def get_read_response(res: Union[AppModel, List[AppModel]], headers: Dict = None) -> Union[ReadValidator, List[ReadValidator], Response]:
+        if fast_json:
+            content = encoder.encode_one(res) if isinstance(res, AppModel) else encoder.encode_many(res)
+            return FastJSONResponse(content=content, headers=headers)
+        # We use model_construct to ignore validations as this data is coming from the db and already validated
+        if isinstance(res, AppModel):
+            return ReadValidatorClass.model_construct(**res.to_dict())
+        return [ReadValidatorClass.model_construct(**item.to_dict()) for item in res]
+    setattr(klass, 'get_read_response',          get_read_response)
+
 
     # Endpoints
     @router.post(
@@ -78,8 +210,7 @@ def generate_route_class(
             # Using new creat_one
             res = await ModelClass.create_one(item, **get_extra_params(login))
 
-            # We use model_construct to ignore validations as this data is coming from the db and already validated
-            return ReadValidatorClass.model_construct(**res.to_dict())
+            return get_read_response(res)
         except Exception as e:
             handle_exception(e)
 
@@ -95,16 +226,15 @@ def generate_route_class(
         item: UpdateValidatorClass,
         login: Login = Depends(get_current_login),
     ) -> ReadValidatorClass:
-        db_item = await ModelClass.read_by_id(id=id, **get_extra_params(login))
+        res = await ModelClass.update_by_id(id=id, item=item, **get_extra_params(login))
 
-        if db_item is None:
+        if res is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Object with id={id} not found."
             )
 
-        res = await ModelClass.update_by_id(id=id, item=item, **get_extra_params(login))
-        return ReadValidatorClass.model_construct(**res.to_dict())
+        return get_read_response(res)
 
 
     @router.patch(
@@ -117,16 +247,15 @@ def generate_route_class(
         item: UpdateWithIdValidatorClass,
         login: Login = Depends(get_current_login),
     ) -> ReadValidatorClass:
-        db_item = await ModelClass.read_by_id(id=item.id, **get_extra_params(login))
+        res = await ModelClass.update_by_id(id=item.id, item=item, **get_extra_params(login))
 
-        if db_item is None:
+        if res is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Object with id={id} not found."
+                detail=f"Object with id={item.id} not found."
             )
 
-        res = await ModelClass.update_by_id(id=item.id, item=item, **get_extra_params(login))
-        return ReadValidatorClass.model_construct(**res.to_dict())
+        return get_read_response(res)
 
 
     @router.put(
@@ -141,7 +270,7 @@ def generate_route_class(
     ) -> ReadValidatorClass:
         try:
             res = await ModelClass.upsert(item=item, **get_extra_params(login))
-            return ReadValidatorClass.model_construct(**res.to_dict())
+            return get_read_response(res)
         except Exception as e:
             handle_exception(e)
 
@@ -156,15 +285,14 @@ def generate_route_class(
         id: int,
         login: Login = Depends(get_current_login),
     ) -> Bulk:
-        db_item = await ModelClass.read_by_id(id=id, **get_extra_params(login))
+        res = await ModelClass.delete_by_id(id=id, **get_extra_params(login))
 
-        if db_item is None:
+        if res is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Object with id={id} not found."
             )
 
-        await ModelClass.delete_by_id(id=id, **get_extra_params(login))
         return Bulk(
             message=f'Deleted one {ModelClass.__name__} from the database.',
             count=1,
@@ -172,6 +300,30 @@ def generate_route_class(
         )
 
 
+    # Registered before '/{id}' so that 'export' is not parsed as an id
+    @router.get(
+        '/export',
+        status_code=status.HTTP_200_OK,
+        summary=f"Export all {pluralize(ModelClass.__name__)} stored in the database as NDJSON or CSV.",
+        description='Streams rows straight from a server-side cursor, so the table size does not affect memory use.',
+        response_class=StreamingResponse,
+    )
+    async def export(
+        format: ExportFormat = ExportFormat.NDJSON,
+        login: Login = Depends(get_current_login),
+    ) -> StreamingResponse:
+        return StreamingResponse(
+            EXPORTERS[format](
+                list(readable_fields),
+                ModelClass.stream_rows(**get_extra_params(login), fields=readable_fields),
+            ),
+            media_type=MEDIA_TYPES[format],
+            headers={
+                'Content-Disposition': f'attachment; filename="{ModelClass.__tablename__}.{format.value}"',
+            },
+        )
+
+
     @router.get(
         '/{id}',
         status_code=status.HTTP_200_OK,
@@ -181,8 +333,23 @@ def generate_route_class(
     async def read_by_id(
         id: int,
         login: Login = Depends(get_current_login),
+        fields: Optional[str] = Query(
+            default=None,
+            description=f"Comma separated fields to return, e.g. `{fields_example}`. All fields if omitted.",
+        ),
+        include: Optional[str] = Query(
+            default=None,
+            description=f"Comma separated related objects to embed. Includable: {', '.join(includable) or 'none'}.",
+        ),
     ) -> ReadValidatorClass:
-        item = await ModelClass.read_by_id(id=id, **get_extra_params(login))
+        projection = get_fields(fields)
+        relationships = get_include(include)
+        if projection is not None and relationships is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='include cannot be combined with fields.',
+            )
+        item = await ModelClass.read_by_id(id=id, **get_extra_params(login), fields=projection, include=relationships)
 
         if item is None:
             raise HTTPException(
@@ -190,7 +357,16 @@ def generate_route_class(
                 detail=f"Object with id={id} not found."
             )
 
-        return ReadValidatorClass.model_construct(**item.to_dict())
+        if projection is not None:
+            PartialValidatorClass = get_partial_validator(ReadValidatorClass, projection)
+            return Response(
+                content=PartialValidatorClass.model_construct(**{f: getattr(item, f) for f in projection}).model_dump_json(),
+                media_type='application/json',
+            )
+        if relationships is not None:
+            return get_included_response(relationships, item)
+
+        return get_read_response(item)
 
 
     @router.delete(
@@ -214,9 +390,17 @@ def generate_route_class(
         '',
         status_code=status.HTTP_200_OK,
         summary=f"Get all {pluralize(ModelClass.__name__)} stored in the database.",
-        description='Endpoint description. Will use the docstring if not provided.',
+        description=(
+            'Any other query parameter filters on a field: `<field>[__<operator>]=<value>`, '
+            'e.g. `?release_year__gte=1990&name__prefix=The`. '
+            f"Operators: {', '.join(FILTER_OPERATORS)}. `eq` is the default, `in` takes comma separated values "
+            'and `ilike` is a case insensitive contains. '
+            'Filters and sorts that no index can serve are logged or rejected, as configured.'
+        ),
     )
     async def read_all(
+        request: Request,
+        response: Response,
         login: Login = Depends(get_current_login),
         offset: int = Query(
             default=0,
@@ -227,9 +411,97 @@ def generate_route_class(
             ge=1,
             le=READ_ALL_LIMIT_MAX,
         ),
+        cursor: Optional[str] = Query(
+            default=None,
+            description=f"Keyset pagination cursor. Pass an empty value for the first page, then the `{NEXT_CURSOR_HEADER}` response header of the previous page. Cannot be combined with `offset`.",
+        ),
+        sort: Optional[str] = Query(
+            default=None,
+            description=f"Field to sort on, prefixed with '-' for descending order. With `cursor` one of: {', '.join(f for f in ModelClass.get_sortable_fieldnames() if f in readable_fields)}.",
+        ),
+        fields: Optional[str] = Query(
+            default=None,
+            description=f"Comma separated fields to return, e.g. `{fields_example}`. All fields if omitted.",
+        ),
+        core: bool = Query(
+            default=False,
+            description='Core mode: rows are fetched as tuples and serialized straight to JSON, skipping ORM objects and the response model. Much faster for large pages.',
+        ),
+        ids: Optional[str] = Query(
+            default=None,
+            description="Comma separated ids to fetch in one query, e.g. `?ids=3,1,2`. Items are returned in that order, missing ids are skipped. Cannot be combined with pagination, sorting or filters.",
+        ),
+        include: Optional[str] = Query(
+            default=None,
+            description=f"Comma separated related objects to embed, loaded with a constant number of queries per page. Includable: {', '.join(includable) or 'none'}. Cannot be combined with `fields` or `core`.",
+        ),
     ) -> List[ReadValidatorClass]:
         limit = min(limit, READ_ALL_LIMIT_MAX)
-        return [ReadValidatorClass.model_construct(**item.to_dict()) for item in await ModelClass.read_all(**get_extra_params(login), offset=offset, limit=limit)]
+        projection = get_fields(fields)
+        id_batch = get_ids(ids)
+        relationships = get_include(include)
+        if relationships is not None and (projection is not None or core):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='include cannot be combined with fields or core.',
+            )
+        filters = ModelClass.get_filters(
+            [(k, v) for k, v in request.query_params.multi_items() if k not in READ_ALL_PARAMS],
+            fields=readable_fields,
+        )
+        # Sorting on a field reveals its order, so only readable fields can be sorted on
+        if sort is not None and parse_sort(sort)[0] not in readable_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot sort on '{parse_sort(sort)[0]}'. Readable fields: {', '.join(readable_fields)}.",
+            )
+        # Core mode reads plain rows, i.e. a projection of the readable columns
+        select_fields = projection
+        if core and projection is None:
+            select_fields = readable_fields
+
+        next_cursor = None
+        if id_batch is not None:
+            if cursor is not None or offset > 0 or sort is not None or len(filters) > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail='ids cannot be combined with pagination, sorting or filters.',
+                )
+            items = await ModelClass.read_by_ids(id_batch, **get_extra_params(login), fields=select_fields, include=relationships)
+        elif cursor is None:
+            items = await ModelClass.read_all(**get_extra_params(login), offset=offset, limit=limit, sort=sort, filters=filters, fields=select_fields, include=relationships)
+        else:
+            if offset > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail='Use either offset or cursor pagination, not both.',
+                )
+            items, next_cursor = await ModelClass.read_page(
+                **get_extra_params(login),
+                limit=limit,
+                sort=sort or 'id',
+                cursor=cursor,
+                filters=filters,
+                fields=select_fields,
+                include=relationships,
+            )
+            if next_cursor is not None:
+                response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+        # Responses built here bypass the injected response, so copy the header over
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else None
+        if core:
+            return Response(
+                content=to_json(ModelClass.rows_to_dicts(items, select_fields)),
+                media_type='application/json',
+                headers=headers,
+            )
+        if projection is not None:
+            return get_partial_response(projection, items, headers=headers)
+        if relationships is not None:
+            return get_included_response(relationships, items, headers=headers)
+
+        return get_read_response(items, headers=headers)
 
 
     @router.post(
@@ -241,12 +513,23 @@ def generate_route_class(
     async def create_many(
         items: List[CreateValidatorClass],
         login: Login = Depends(get_current_login),
+        copy: bool = Query(
+            default=False,
+            description='Load the items with binary COPY instead of INSERT. Much faster for large payloads.',
+        ),
+        return_ids: bool = Query(
+            default=True,
+            description='Only applies to COPY: whether to return the new ids. Skipping this avoids a staging table.',
+        ),
     ) -> Bulk:
         try:
-            res = await ModelClass.create_many(items=items, **get_extra_params(login))
+            if copy:
+                res = await ModelClass.copy_many(items=items, return_ids=return_ids, **get_extra_params(login))
+            else:
+                res = await ModelClass.create_many(items=items, **get_extra_params(login))
             return Bulk(
                 message=f'Created multiple {pluralize(ModelClass.__name__)} in the database.',
-                count=len(res),
+                count=len(items),
                 ids=res
             )
         except Exception as e:
@@ -262,18 +545,107 @@ def generate_route_class(
     async def upsert_many(
         items: List[UpdateValidatorClass],
         login: Login = Depends(get_current_login),
-    ) -> Bulk:
+        chunk_size: int = Query(
+            default=BULK_UPSERT_CHUNK_SIZE,
+            ge=1,
+            description='Max items per statement.',
+        ),
+        mode: UpsertMode = Query(
+            default=UpsertMode.TRANSACTION,
+            description=(
+                '`transaction`: all or nothing. '
+                '`savepoint`: failed chunks are skipped, the rest is committed with the request. '
+                '`commit`: each chunk commits on its own connection, so locks are only held per chunk.'
+            ),
+        ),
+        concurrency: int = Query(
+            default=1,
+            ge=1,
+            le=BULK_UPSERT_CONCURRENCY_MAX,
+            description='Chunks upserted in parallel. Only applies to `commit` mode.',
+        ),
+    ) -> BulkUpsert:
         try:
-            res = await ModelClass.upsert_many(items=items, apply_none_values=False, **get_extra_params(login))
-            return Bulk(
+            res = await ModelClass.upsert_many(
+                items=items,
+                apply_none_values=False,
+                chunk_size=chunk_size,
+                mode=mode,
+                concurrency=concurrency,
+                **get_extra_params(login),
+            )
+            return BulkUpsert(
                 message=f'Created or updated multiple {pluralize(ModelClass.__name__)} in the database.',
-                count=len(res),
-                ids=res
+                count=res.count,
+                ids=res.ids,
+                inserted=res.inserted,
+                updated=res.updated,
+                failed=res.failed,
+                errors=res.errors,
             )
         except Exception as e:
             handle_exception(e)
 
 
+    # Background bulk jobs stage the payload in Redis, so models whose payloads carry secrets opt out
+    if bulk_jobs:
+        @router.post(
+            '/bulk/async',
+            status_code=status.HTTP_202_ACCEPTED,
+            summary=f"Create multiple {pluralize(ModelClass.__name__)} in the database in the background.",
+            description='Stages the payload and returns a job to poll at `/bulk/jobs/{job_id}`. Items are committed in chunks as the job progresses.',
+        )
+        async def create_many_async(
+            items: List[CreateValidatorClass],
+            login: Login = Depends(get_current_login),
+            copy: bool = Query(
+                default=False,
+                description='Load the items with binary COPY instead of INSERT.',
+            ),
+        ) -> BulkJob:
+            extra_params = get_extra_params(login)
+            job_id = await stage_bulk_job(Bus.queue, ModelClass, BulkOperation.CREATE, items, options={'copy': copy}, **extra_params)
+            return await get_bulk_job(Bus.queue, job_id, ModelClass, **extra_params)
+
+
+        @router.put(
+            '/bulk/async',
+            status_code=status.HTTP_202_ACCEPTED,
+            summary=f"Create or update many {pluralize(ModelClass.__name__)} in the database in the background.",
+            description='Stages the payload and returns a job to poll at `/bulk/jobs/{job_id}`. Items are committed in chunks as the job progresses.',
+        )
+        async def upsert_many_async(
+            items: List[UpdateValidatorClass],
+            login: Login = Depends(get_current_login),
+            mode: UpsertMode = Query(
+                default=UpsertMode.SAVEPOINT,
+                description='How each chunk of the job handles failures, see `PUT /bulk`. `savepoint` skips failed items and keeps going.',
+            ),
+        ) -> BulkJob:
+            extra_params = get_extra_params(login)
+            job_id = await stage_bulk_job(Bus.queue, ModelClass, BulkOperation.UPSERT, items, options={'mode': mode.value}, **extra_params)
+            return await get_bulk_job(Bus.queue, job_id, ModelClass, **extra_params)
+
+
+        @router.get(
+            '/bulk/jobs/{job_id}',
+            status_code=status.HTTP_200_OK,
+            summary=f"Get the status of a background bulk write of {pluralize(ModelClass.__name__)}.",
+            description='Progress counters update after each chunk. The ids are included once the job is complete.',
+        )
+        async def read_bulk_job(
+            job_id: str,
+            login: Login = Depends(get_current_login),
+        ) -> BulkJob:
+            job = await get_bulk_job(Bus.queue, job_id, ModelClass, **get_extra_params(login))
+            if job is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Bulk job with id={job_id} not found."
+                )
+            return job
+
+
     @router.post(
         '/test/seed_data',
         status_code=status.HTTP_200_OK,
@@ -300,21 +672,25 @@ def generate_route_class(
         description='Endpoint description. Will use the docstring if not provided.',
     )
     async def performance_test(
-        login: Login = Depends(get_current_login)
+        login: Login = Depends(get_current_login),
+        core: bool = False,
     ) -> Dict:
         import time
 
         # Raw fetch
         s = time.monotonic()
-        res = await ModelClass.read_all(**get_extra_params(login))  # 10.190340717992513 for 1 mil, Calc: 0.4833592210052302
-        # res = await Book.popo_read_all() # 2.038523224997334 for 1 mil, Calc: 68.26654115399288
+        if core:
+            res = await ModelClass.popo_read_all(**get_extra_params(login))
+        else:
+            res = await ModelClass.read_all(**get_extra_params(login))  # 10.190340717992513 for 1 mil, Calc: 0.4833592210052302
         logger.warning(f"Fetch: {time.monotonic() - s}")
 
-        # Sum all release years
+        # Serialize like the list route would
         s = time.monotonic()
-        # ry = sum([item.release_year for item in res])
-        ry = sum([ReadValidatorClass.model_validate(item).id for item in res])
-        # ry = sum([ReadValidatorClass.model_construct(**item.to_dict()).release_year for item in res])
+        if core:
+            ry = len(to_json(res))
+        else:
+            ry = len(get_list_adapter(ReadValidatorClass).dump_json([ReadValidatorClass.model_construct(**item.to_dict()) for item in res]))
 
         logger.warning(f"Calc: res={ry} took {time.monotonic() - s}")
         return {
@@ -328,11 +704,16 @@ def generate_route_class(
     setattr(klass, 'update_one_with_id', update_one_with_id)
     setattr(klass, 'upsert_one',         upsert_one)
     setattr(klass, 'delete_one',         delete_one)
+    setattr(klass, 'export',             export)
     setattr(klass, 'read_by_id',         read_by_id)
     setattr(klass, 'delete_all',         delete_all)
     setattr(klass, 'read_all',           read_all)
     setattr(klass, 'create_many',        create_many)
     setattr(klass, 'upsert_many',        upsert_many)
+    if bulk_jobs:
+        setattr(klass, 'create_many_async',  create_many_async)
+        setattr(klass, 'upsert_many_async',  upsert_many_async)
+        setattr(klass, 'read_bulk_job',      read_bulk_job)
     setattr(klass, 'seed_data',          seed_data)
     setattr(klass, 'performance_test',   performance_test)
 
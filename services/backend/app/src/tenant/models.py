@@ -1,3 +1,4 @@
+import time
 import uuid
 from functools import lru_cache
 from typing import Type, List, Union
@@ -10,6 +11,16 @@ from src.logging.service import logger
 from src.config import TENANT_SCHEMA_NAME
 from src.database.service import DatabaseService
 from src.models import AppModel, IdentifierMixin, SharedModelMixin
+from src.tenant import pool
+from src.modules.arqueue.bus import Bus
+from src.metrics.service import registry
+
+
+provision_duration = registry.histogram(
+    'tenant_provision_phase_seconds',
+    'Time spent in each phase of provisioning a tenant: lock, claim, clone, enqueue_top_up.',
+    ('phase',),
+)
 
 
 TENANT_SCHEMA_NAME_PREFIX = 'tenant_'
@@ -39,16 +50,44 @@ class Tenant(AppModel, IdentifierMixin, SharedModelMixin):
     #     self._CRUD = None
 
     async def provision(self):
-        """Creates the required database schema for this tenant. Idempotent.
+        """Creates the required database schema for this tenant. Idempotent, also when provisioned concurrently.
         """
         if self.schema_name is None:
             logger.error(f"Tenant {self.identifier} cannot be provisioned: No schema name specified!")
         else:
-            # Create a new schema for the tenant
-            # DatabaseService.get().create_schema(schema_name=self.schema_name)
-
-            # Create schema tables
-            DatabaseService.get().clone_db_schema(source_schema_name=TENANT_SCHEMA_NAME, target_schema_name=self.schema_name)
+            timings = {}
+            s = time.monotonic()
+            async with DatabaseService.advisory_lock(f"provision:{self.schema_name}") as conn:
+                timings['lock'] = time.monotonic() - s
+
+                if await DatabaseService.schema_exists(conn, self.schema_name):
+                    logger.info(f"Tenant {self.identifier} is already provisioned.")
+                    return
+
+                # Claim a pre-cloned schema, only clone on the spot if the pool has run dry
+                s = time.monotonic()
+                claimed = await pool.claim_schema(target_schema_name=self.schema_name)
+                timings['claim'] = time.monotonic() - s
+                if not claimed:
+                    s = time.monotonic()
+                    await DatabaseService.clone_db_schema_async(
+                        source_schema_name=TENANT_SCHEMA_NAME,
+                        target_schema_name=self.schema_name,
+                        record_revision=True,
+                    )
+                    timings['clone'] = time.monotonic() - s
+
+            # Replace the claimed schema. The fixed job id dedupes queued top-ups, and the job keeps no result
+            # so the id is free again as soon as it has run.
+            if Bus.queue is not None:
+                s = time.monotonic()
+                await Bus.queue.enqueue_job('top_up_tenant_schema_pool', _job_id='top_up_tenant_schema_pool')
+                timings['enqueue_top_up'] = time.monotonic() - s
+
+            for phase, seconds in timings.items():
+                provision_duration.observe(seconds, phase=phase)
+            breakdown = ', '.join(f"{phase}={seconds:.3f}s" for phase, seconds in timings.items())
+            logger.info(f"Tenant {self.identifier} provisioned in {sum(timings.values()):.3f}s ({breakdown}).")
 
     @classmethod
     @lru_cache()
@@ -0,0 +1,131 @@
+"""
+Pool of pre-provisioned tenant schemas.
+
+Cloning the tenant template schema takes seconds, so the arq worker keeps TENANT_SCHEMA_POOL_SIZE
+unassigned clones ready and a new tenant just renames one of them.
+Pooled schemas are tagged (schema comment) with the alembic revision they were cloned at,
+only schemas at the current revision can be claimed and stale ones are replaced on the next top-up.
+The tag is set in the same transaction as the clone, so a schema is never pooled untagged.
+Until migrations have run there is no revision to tag with, so the pool stays empty.
+"""
+import uuid
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.logging.service import logger
+from src.config import SHARED_SCHEMA_NAME, TENANT_SCHEMA_NAME, TENANT_SCHEMA_POOL_SIZE
+from src.database.service import DatabaseService
+
+
+POOL_SCHEMA_NAME_PREFIX = 'pool_tenant_'
+
+# Advisory lock keys
+CLAIM_LOCK_KEY = 7_310_001
+TOP_UP_LOCK_KEY = 7_310_002
+
+
+def generate_pool_schema_name() -> str:
+    return f"{POOL_SCHEMA_NAME_PREFIX}{str(uuid.uuid4()).replace('-', '_')}"
+
+
+async def get_revision(conn: AsyncConnection | AsyncSession) -> str:
+    """Gets the current alembic revision, which pooled schemas must match to be claimable.
+
+    Returns:
+        str: Revision, empty if migrations haven't run yet.
+    """
+    return await DatabaseService.get_schema_revision(conn)
+
+
+async def get_pool_schema_names(conn: AsyncConnection | AsyncSession, revision: str = None) -> List[str]:
+    """Lists pooled schemas, optionally only those at a specific revision."""
+    q = """
+        select n.nspname
+        from pg_namespace n
+        where n.nspname like :pattern
+    """
+    params = {'pattern': POOL_SCHEMA_NAME_PREFIX.replace('_', '\\_') + '%'}
+    if revision is not None:
+        q += " and coalesce(obj_description(n.oid, 'pg_namespace'), '') = :revision"
+        params['revision'] = revision
+    res = await conn.execute(text(q), params)
+    return list(res.scalars().all())
+
+
+async def claim_schema(target_schema_name: str) -> bool:
+    """Claims a pooled schema for a new tenant by renaming it to the tenant's schema name.
+
+    Args:
+        target_schema_name (str): Schema name of the tenant
+
+    Returns:
+        bool: True if a schema was claimed, False if the pool is empty and the caller should clone.
+    """
+    async with DatabaseService.async_session(SHARED_SCHEMA_NAME, use_unit_of_work=False) as session:
+        # Serialise claims so two tenants can't grab the same schema
+        await session.execute(text('select pg_advisory_xact_lock(:key)'), {'key': CLAIM_LOCK_KEY})
+        revision = await get_revision(session)
+        if revision == '':
+            logger.warning('No alembic revision, not claiming from the tenant schema pool.')
+            return False
+        candidates = await get_pool_schema_names(session, revision=revision)
+        if len(candidates) == 0:
+            logger.warning('Tenant schema pool is empty.')
+            return False
+
+        await session.execute(text(f'alter schema "{candidates[0]}" rename to "{target_schema_name}"'))
+        await session.execute(text(f'comment on schema "{target_schema_name}" is null'))
+        # The tag moves into the tenant's own version table, which its migrations start from
+        await DatabaseService.set_schema_revision(session, target_schema_name, revision)
+        logger.info(f"Claimed pooled schema '{candidates[0]}' as '{target_schema_name}'.")
+        return True
+
+
+async def top_up(pool_size: int = TENANT_SCHEMA_POOL_SIZE) -> int:
+    """Drops pooled schemas cloned at an old revision and clones new ones until the pool is full.
+    Each clone is committed on its own so it can be claimed straight away.
+    Concurrent top-ups are skipped.
+
+    Args:
+        pool_size (int): Number of claimable schemas to keep
+
+    Returns:
+        int: Number of schemas cloned
+    """
+    created = 0
+    async with DatabaseService.get_async_engine().connect() as conn:
+        # Session-level lock, held across the per-clone commits below
+        if not (await conn.execute(text('select pg_try_advisory_lock(:key)'), {'key': TOP_UP_LOCK_KEY})).scalar():
+            logger.info('Tenant schema pool top-up already running.')
+            return created
+        await conn.commit()
+
+        try:
+            revision = await get_revision(conn)
+            if revision == '':
+                logger.warning('No alembic revision to tag pooled schemas with, not topping up.')
+                return created
+            current = await get_pool_schema_names(conn, revision=revision)
+            for schema_name in set(await get_pool_schema_names(conn)) - set(current):
+                logger.warning(f"Dropping stale pooled schema '{schema_name}'...")
+                await conn.execute(text(f'drop schema if exists "{schema_name}" cascade'))
+                await conn.commit()
+
+            for _ in range(pool_size - len(current)):
+                schema_name = generate_pool_schema_name()
+                await DatabaseService.clone_db_schema_async(
+                    source_schema_name=TENANT_SCHEMA_NAME,
+                    target_schema_name=schema_name,
+                    comment=revision,
+                )
+                created += 1
+        finally:
+            # Discard a failed clone before releasing the lock
+            await conn.rollback()
+            await conn.execute(text('select pg_advisory_unlock(:key)'), {'key': TOP_UP_LOCK_KEY})
+            await conn.commit()
+
+    logger.info(f"Tenant schema pool topped up with {created} schemas.")
+    return created
@@ -1,6 +1,8 @@
-from typing import List
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, create_model
 
 from src.utils import ToDictMixin
 
@@ -29,3 +31,75 @@ class Bulk(AppValidator):
     message: str
     count: int
     ids: List[int]
+
+
+class BulkUpsert(Bulk):
+    inserted: int
+    updated: int
+    failed: int
+    # Why each failed chunk was rolled back
+    errors: List[str]
+
+
+class BulkJob(AppValidator):
+    job_id: str
+    operation: str
+    status: str
+    total: int
+    processed: int
+    inserted: int
+    updated: int
+    failed: int
+    stale: bool = False                         # Still running, but the worker stopped reporting progress
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None     # Last progress update
+    error: Optional[str] = None
+    ids: Optional[List[int]] = None             # Once complete
+
+
+@lru_cache()
+def get_partial_validator(validator_class: Type[ReadValidator], fields: Tuple[str, ...]) -> Type[ReadValidator]:
+    """Derives a validator with only some of the fields of another, e.g. for sparse fieldsets.
+    Cached, so each combination of fields is only built once.
+
+    Args:
+        validator_class (Type[ReadValidator]): Validator to derive from
+        fields (Tuple[str, ...]): Fields to keep, must all exist on validator_class
+
+    Returns:
+        Type[ReadValidator]: Validator with only the given fields
+    """
+    return create_model(
+        f"{validator_class.__name__}Partial_{'_'.join(fields)}",
+        __base__=ReadValidator,
+        **{f: (validator_class.model_fields[f].annotation, validator_class.model_fields[f]) for f in fields},
+    )
+
+
+@lru_cache()
+def get_included_validator(
+    validator_class: Type[ReadValidator],
+    includes: Tuple[Tuple[str, Type[ReadValidator]], ...],
+) -> Type[ReadValidator]:
+    """Derives a validator that embeds related objects, e.g. ReviewGet with its critic and book.
+    Cached, so each combination of includes is only built once.
+
+    Args:
+        validator_class (Type[ReadValidator]): Validator to derive from
+        includes (Tuple[Tuple[str, Type[ReadValidator]], ...]): (relationship name, validator of the related object) pairs
+
+    Returns:
+        Type[ReadValidator]: Validator with an optional field per include
+    """
+    return create_model(
+        f"{validator_class.__name__}Including_{'_'.join(name for name, _ in includes)}",
+        __base__=validator_class,
+        **{name: (Optional[related_class], None) for name, related_class in includes},
+    )
+
+
+@lru_cache()
+def get_list_adapter(validator_class: Type[AppValidator]) -> TypeAdapter:
+    """Cached adapter to serialize lists of a validator straight to JSON."""
+    return TypeAdapter(List[validator_class])
@@ -21,6 +21,20 @@ assert os.environ.get('DATABASE_NAME') != TEST_DB_SUFFIX
 assert DatabaseService.drop_db(db_name_suffix_check=TEST_DB_SUFFIX)
 
 
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', default=False, help='Also run tests marked as benchmark.')
+
+
+def pytest_collection_modifyitems(config, items):
+    # Timings depend on the machine and large datasets are slow, so benchmarks are opt-in
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='Benchmark, run with --benchmark.')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(scope='session')
 def anyio_backend():
     return 'asyncio'
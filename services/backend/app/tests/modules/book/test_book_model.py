@@ -1,9 +1,19 @@
-import pytest
+import asyncio
+import json
+import time
 
+import pytest
 from httpx import AsyncClient
+from pydantic_core import to_json
+from sqlalchemy import event
+from sqlalchemy.engine.default import CACHE_HIT
 
 from src.login.models import Login
+from src.logging.service import logger
+from src.database.service import DatabaseService
 from src.modules.book.models import Book
+from src.modules.book.validators import BookCreate, BookGet, BookUpdate
+from src.validators import get_list_adapter
 
 
 @pytest.mark.anyio
@@ -21,3 +31,159 @@ async def test_create_one(client: AsyncClient, login: Login):
     assert book.name == 'SomeName001'
     assert book.author == 'SomeAuthor001'
     assert book.release_year == 1999
+
+
+@pytest.mark.anyio
+async def test_popo_read_all(client: AsyncClient, login: Login):
+    """Core mode returns the same data as ORM objects + validators."""
+    await Book.delete_all(schema_name=login.tenant_schema_name)
+    await Book.seed_multiple(10, schema_name=login.tenant_schema_name)
+
+    items = await Book.read_all(schema_name=login.tenant_schema_name, sort='id')
+    orm_json = get_list_adapter(BookGet).dump_json([BookGet.model_construct(**item.to_dict()) for item in items])
+    core_json = to_json(await Book.popo_read_all(schema_name=login.tenant_schema_name, sort='id'))
+
+    await Book.delete_all(schema_name=login.tenant_schema_name)
+    assert len(items) == 10
+    assert json.loads(core_json) == json.loads(orm_json)
+
+
+@pytest.mark.anyio
+@pytest.mark.benchmark
+async def test_popo_read_all_benchmark(client: AsyncClient, login: Login):
+    """Benchmark: core mode should fetch and serialize faster than ORM objects + validators."""
+    await Book.delete_all(schema_name=login.tenant_schema_name)
+    await Book.seed_multiple(20000, schema_name=login.tenant_schema_name)
+
+    s = time.monotonic()
+    items = await Book.read_all(schema_name=login.tenant_schema_name)
+    orm_json = get_list_adapter(BookGet).dump_json([BookGet.model_construct(**item.to_dict()) for item in items])
+    orm_time = time.monotonic() - s
+
+    s = time.monotonic()
+    core_json = to_json(await Book.popo_read_all(schema_name=login.tenant_schema_name))
+    core_time = time.monotonic() - s
+
+    logger.info(f"20k rows: ORM {orm_time:.3f}s ({len(orm_json)} bytes), core {core_time:.3f}s ({len(core_json)} bytes)")
+    await Book.delete_all(schema_name=login.tenant_schema_name)
+    assert core_time < orm_time
+
+
+@pytest.mark.anyio
+async def test_read_by_id_hits_compiled_cache(client: AsyncClient, login: Login):
+    book = await Book(
+        identifier='SomeIdentifier002',
+        name='SomeName002',
+        author='SomeAuthor002',
+    ).save(login.tenant_schema_name)
+
+    cache_hits = []
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        cache_hits.append(context.cache_hit == CACHE_HIT)
+
+    engine = DatabaseService.get_async_engine().sync_engine
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+        for _ in range(2):
+            assert (await Book.read_by_id(id=book.id, schema_name=login.tenant_schema_name)).id == book.id
+            assert (await Book.read_by_identifier(identifier=book.identifier, schema_name=login.tenant_schema_name)).id == book.id
+    finally:
+        event.remove(engine, 'after_cursor_execute', after_cursor_execute)
+
+    # The second round reuses the statements compiled by the first
+    assert cache_hits[2:] == [True, True]
+
+
+@pytest.mark.anyio
+async def test_read_by_ids(client: AsyncClient, login: Login):
+    books = [
+        await Book(identifier=f"SomeIdentifier10{i}", name=f"SomeName10{i}", author=f"SomeAuthor10{i}").save(login.tenant_schema_name)
+        for i in range(3)
+    ]
+    ids = [books[2].id, books[0].id, -1, books[2].id]
+
+    items = await Book.read_by_ids(ids, schema_name=login.tenant_schema_name)
+    assert [item.id for item in items] == [books[2].id, books[0].id]
+
+    rows = await Book.read_by_ids(ids, schema_name=login.tenant_schema_name, fields=['name'])
+    assert [(row.id, row.name) for row in rows] == [(books[2].id, books[2].name), (books[0].id, books[0].name)]
+
+    assert await Book.read_by_ids([], schema_name=login.tenant_schema_name) == []
+
+
+@pytest.mark.anyio
+async def test_read_by_id_coalesced_in_unit_of_work(client: AsyncClient, login: Login):
+    books = [
+        await Book(identifier=f"SomeIdentifier11{i}", name=f"SomeName11{i}", author=f"SomeAuthor11{i}").save(login.tenant_schema_name)
+        for i in range(5)
+    ]
+
+    statements = []
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = DatabaseService.get_async_engine().sync_engine
+    unit_of_work_dependency = DatabaseService.unit_of_work()
+    unit_of_work = await unit_of_work_dependency.__anext__()
+    # Switch schemas up front, so only the reads are counted
+    await unit_of_work.use_schema(login.tenant_schema_name)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+        items = await asyncio.gather(*[
+            Book.read_by_id(id=id, schema_name=login.tenant_schema_name)
+            for id in [b.id for b in books] + [books[0].id, -1]
+        ])
+    finally:
+        event.remove(engine, 'after_cursor_execute', after_cursor_execute)
+        with pytest.raises(StopAsyncIteration):
+            await unit_of_work_dependency.__anext__()
+
+    assert [item.id if item is not None else None for item in items] == [b.id for b in books] + [books[0].id, None]
+    assert len(statements) == 1
+    assert unit_of_work.loader.batch_count == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_model_calls_share_unit_of_work(client: AsyncClient, login: Login):
+    books = [
+        await Book(identifier=f"SomeIdentifier12{i}", name=f"SomeName12{i}", author=f"SomeAuthor12{i}").save(login.tenant_schema_name)
+        for i in range(3)
+    ]
+
+    unit_of_work_dependency = DatabaseService.unit_of_work()
+    unit_of_work = await unit_of_work_dependency.__anext__()
+    try:
+        # Other model calls take turns with the batch on the request's session
+        by_id, page, by_ids, count, updated = await asyncio.gather(
+            Book.read_by_id(id=books[0].id, schema_name=login.tenant_schema_name),
+            Book.read_all(schema_name=login.tenant_schema_name, limit=2, sort='id'),
+            Book.read_by_ids([b.id for b in books], schema_name=login.tenant_schema_name),
+            Book.get_count(schema_name=login.tenant_schema_name),
+            Book.update_by_id(id=books[1].id, item=BookUpdate(name='SomeName12Updated'), schema_name=login.tenant_schema_name),
+        )
+    finally:
+        with pytest.raises(StopAsyncIteration):
+            await unit_of_work_dependency.__anext__()
+
+    assert by_id.id == books[0].id
+    assert len(page) == 2
+    assert [b.id for b in by_ids] == [b.id for b in books]
+    assert count >= 3
+    assert updated.name == 'SomeName12Updated'
+
+
+@pytest.mark.anyio
+async def test_copy_many_rolled_back_with_unit_of_work(client: AsyncClient, login: Login):
+    items = [
+        BookCreate(identifier=f"SomeIdentifier13{i}", name=f"SomeName13{i}", author=f"SomeAuthor13{i}")
+        for i in range(3)
+    ]
+
+    unit_of_work_dependency = DatabaseService.unit_of_work()
+    await unit_of_work_dependency.__anext__()
+    # COPY is the first statement of the unit of work, it must still join its transaction
+    ids = await Book.copy_many(items, schema_name=login.tenant_schema_name)
+    with pytest.raises(RuntimeError):
+        await unit_of_work_dependency.athrow(RuntimeError('Request failed'))
+
+    assert await Book.read_by_ids(ids, schema_name=login.tenant_schema_name) == []
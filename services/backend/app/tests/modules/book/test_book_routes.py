@@ -1,10 +1,23 @@
+import asyncio
+import csv
+import io
+import json
+import time
+
 from fastapi import status
 import pytest
-from httpx import AsyncClient
+from httpx import AsyncClient, ASGITransport
 from datetime import datetime
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.main import app
 from src.versions import ApiVersion
 from src.modules.book.models import Book
+from src.modules.book.validators import BookCreate
+from src.modules.arqueue.bus import Bus
+from src.bulk_jobs import get_key, run_bulk_job
+from src.config import BULK_JOB_TIMEOUT_SECONDS
 from src.login.models import Login
 
 
@@ -12,6 +25,7 @@ ModelClass = Book
 route_base = f"{ApiVersion.V1}/{ModelClass.__tablename__}"
 get_model_member_count = 7
 bulk_response_member_count = 3
+bulk_upsert_response_member_count = 7
 
 
 @pytest.mark.anyio
@@ -48,6 +62,32 @@ async def test_create_one_with_all_fields(client: AsyncClient):
     assert data['updated_at'] is not None
 
 
+@pytest.mark.anyio
+async def test_create_one_commit_fails(client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+    item_count = await Book.get_count(schema_name=client.login.tenant_schema_name)
+
+    async def commit(self):
+        raise RuntimeError('Commit failed')
+    monkeypatch.setattr(AsyncSession, 'commit', commit)
+
+    # Report app errors as a 500 instead of raising, so we see what the client would see
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url='http://test', headers=client.headers) as c:
+        response = await c.post(
+            route_base,
+            json={
+                'identifier': '978-3-16-148410-9',
+                'name': 'A Brief Horror Story of Time',
+                'author': 'Stephen Hawk King',
+            }
+        )
+    monkeypatch.undo()
+
+    # The commit runs before the response is sent, so its failure is the response
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR, response.text
+    assert await Book.get_count(schema_name=client.login.tenant_schema_name) == item_count
+
+
 @pytest.mark.anyio
 async def test_create_one_with_only_mandatory_fields(client: AsyncClient):
     response = await client.post(
@@ -474,7 +514,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 2
+    assert data['updated'] == 0
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Books in the database.'
     assert len(data['ids']) == 2
@@ -532,7 +575,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 0
+    assert data['updated'] == 2
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Books in the database.'
     assert len(data['ids']) == 2
@@ -628,3 +674,504 @@ async def test_read_all_full(client: AsyncClient):
     assert all_items_route[last_idx]['release_year'] == item_last.release_year
     assert all_items_route[last_idx]['created_at'] == item_last.created_at.isoformat()
     assert all_items_route[last_idx]['updated_at'] == item_last.updated_at.isoformat()
+
+
+@pytest.mark.anyio
+async def test_read_all_cursor(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    await Book.seed_multiple(5, schema_name=client.login.tenant_schema_name)
+    all_items_db = await Book.read_all(schema_name=client.login.tenant_schema_name, sort='-identifier')
+
+    # Walk all pages
+    ids = []
+    cursor = ''
+    while cursor is not None:
+        response = await client.get(
+            route_base,
+            params={
+                'cursor': cursor,
+                'limit': 2,
+                'sort': '-identifier',
+            }
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+        data = response.json()
+        assert len(data) <= 2
+        ids += [item['id'] for item in data]
+        cursor = response.headers.get('X-Next-Cursor')
+
+    assert ids == [item.id for item in all_items_db]
+
+
+@pytest.mark.anyio
+async def test_read_all_cursor_rejects_unindexed_sort(client: AsyncClient):
+    response = await client.get(
+        route_base,
+        params={
+            'cursor': '',
+            'sort': 'author',
+        }
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+
+@pytest.mark.anyio
+async def test_read_all_cursor_and_offset(client: AsyncClient):
+    response = await client.get(
+        route_base,
+        params={
+            'cursor': '',
+            'offset': 10,
+        }
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+
+@pytest.mark.anyio
+async def test_read_all_filtered(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    response = await client.post(
+        f"{route_base}/bulk",
+        json=[
+            {'identifier': 'filter-1', 'name': 'The Old', 'author': 'Ann Author', 'release_year': 1980},
+            {'identifier': 'filter-2', 'name': 'The New', 'author': 'Bob Writer', 'release_year': 2000},
+            {'identifier': 'filter-3', 'name': 'A Newer', 'author': 'Cid Author', 'release_year': 2010},
+        ]
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+    response = await client.get(
+        route_base,
+        params={
+            'release_year__gte': 1990,
+            'name__prefix': 'The',
+            'sort': '-release_year',
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [item['identifier'] for item in response.json()] == ['filter-2']
+
+    response = await client.get(
+        route_base,
+        params={
+            'identifier__in': 'filter-1,filter-3',
+            'author__ilike': 'AUTHOR',
+            'sort': 'identifier',
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [item['identifier'] for item in response.json()] == ['filter-1', 'filter-3']
+
+
+@pytest.mark.anyio
+async def test_read_all_filter_invalid(client: AsyncClient):
+    response = await client.get(route_base, params={'colour': 'red'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+    response = await client.get(route_base, params={'release_year__gte': 'last year'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+    response = await client.get(route_base, params={'release_year__prefix': '19'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+
+@pytest.mark.anyio
+async def test_read_all_fields(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    await Book.seed_multiple(3, schema_name=client.login.tenant_schema_name)
+
+    response = await client.get(
+        route_base,
+        params={
+            'fields': 'name,id',
+            'sort': 'id',
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert len(data) == 3
+    assert all(list(item.keys()) == ['id', 'name'] for item in data)
+
+    # Cursor pages work on projections too
+    response = await client.get(
+        route_base,
+        params={
+            'fields': 'name',
+            'cursor': '',
+            'limit': 2,
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert all(list(item.keys()) == ['name'] for item in response.json())
+    assert response.headers.get('X-Next-Cursor') is not None
+
+
+@pytest.mark.anyio
+async def test_read_by_id_fields(client: AsyncClient):
+    ids = await Book.seed_multiple(1, schema_name=client.login.tenant_schema_name)
+    response = await client.get(
+        f"{route_base}/{ids[0]}",
+        params={'fields': 'identifier'},
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert list(response.json().keys()) == ['identifier']
+
+    response = await client.get(route_base, params={'fields': 'id,not_a_field'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+
+@pytest.mark.anyio
+async def test_read_by_ids(client: AsyncClient):
+    ids = await Book.seed_multiple(3, schema_name=client.login.tenant_schema_name)
+    requested = [ids[2], ids[0], -1, ids[2]]
+
+    response = await client.get(route_base, params={'ids': ','.join(str(id) for id in requested)})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [item['id'] for item in response.json()] == [ids[2], ids[0]]
+
+    response = await client.get(route_base, params={'ids': f"{ids[1]}", 'fields': 'name'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [list(item.keys()) for item in response.json()] == [['name']]
+
+    response = await client.get(route_base, params={'ids': 'a,b'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+    response = await client.get(route_base, params={'ids': f"{ids[0]}", 'cursor': ''})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+
+@pytest.mark.anyio
+async def test_read_all_core(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    await Book.seed_multiple(5, schema_name=client.login.tenant_schema_name)
+
+    response = await client.get(route_base, params={'sort': 'id'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    orm_data = response.json()
+
+    response = await client.get(route_base, params={'sort': 'id', 'core': True})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json() == orm_data
+
+    response = await client.get(route_base, params={'sort': 'id', 'core': True, 'fields': 'id,name'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json() == [{'id': item['id'], 'name': item['name']} for item in orm_data]
+
+
+@pytest.mark.anyio
+async def test_export_ndjson(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    await Book.seed_multiple(3, schema_name=client.login.tenant_schema_name)
+
+    response = await client.get(
+        f"{route_base}/export",
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    all_items_db = await Book.read_all(schema_name=client.login.tenant_schema_name, sort='id')
+    assert [line['id'] for line in lines] == [item.id for item in all_items_db]
+    assert lines[0]['identifier'] == all_items_db[0].identifier
+    assert lines[0]['created_at'] == all_items_db[0].created_at.isoformat()
+
+
+@pytest.mark.anyio
+async def test_export_csv(client: AsyncClient):
+    await Book.delete_all(schema_name=client.login.tenant_schema_name)
+    await Book.seed_multiple(3, schema_name=client.login.tenant_schema_name)
+
+    response = await client.get(
+        f"{route_base}/export",
+        params={
+            'format': 'csv',
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 3
+    assert set(rows[0].keys()) == set(Book.get_column_names())
+
+
+@pytest.mark.anyio
+async def test_create_bulk_copy(client: AsyncClient):
+    item_count = await Book.get_count(schema_name=client.login.tenant_schema_name)
+
+    response = await client.post(
+        f"{route_base}/bulk",
+        params={
+            'copy': True,
+        },
+        json=[
+                {
+                    'identifier': '978-3-16-148410-115',
+                    'name': 'A Brief Horror Story of Time 115',
+                    'author': 'Stephen Hawk Kingston',
+                    'release_year': 2039,
+                },
+                {
+                    'identifier': '978-3-16-148410-116',
+                    'name': 'A Brief Horror Story of Time 116',
+                    'author': 'Stephen Hawk Kingston Jamaica',
+                }
+        ]
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['count'] == 2
+    assert len(data['ids']) == 2
+    assert (
+        await Book.get_count(
+            schema_name=client.login.tenant_schema_name
+        )
+    ) == (item_count + 2)
+
+    item1 = await Book.read_by_id(
+        id=data['ids'][0],
+        schema_name=client.login.tenant_schema_name,
+    )
+    assert item1.identifier == '978-3-16-148410-115'
+    assert item1.release_year == 2039
+    assert item1.created_at is not None
+    assert item1.updated_at is not None
+
+    item2 = await Book.read_by_id(
+        id=data['ids'][1],
+        schema_name=client.login.tenant_schema_name,
+    )
+    assert item2.identifier == '978-3-16-148410-116'
+    assert item2.release_year is None
+
+
+@pytest.mark.anyio
+async def test_create_bulk_copy_conflict(client: AsyncClient):
+    item = {
+        'identifier': '978-3-16-148410-117',
+        'name': 'A Brief Horror Story of Time 117',
+        'author': 'Stephen Hawk Kingston',
+    }
+    response = await client.post(
+        f"{route_base}/bulk",
+        params={
+            'copy': True,
+            'return_ids': False,
+        },
+        json=[item, item],
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT, response.text
+
+
+@pytest.mark.anyio
+async def test_update_one_not_found(client: AsyncClient):
+    max_id = await Book.get_max_id(schema_name=client.login.tenant_schema_name)
+    response = await client.patch(
+        f"{route_base}/{max_id + 1}",
+        json={
+            'name': 'A Brief Horror Story of Nothing',
+        }
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+@pytest.mark.anyio
+async def test_delete_one_not_found(client: AsyncClient):
+    max_id = await Book.get_max_id(schema_name=client.login.tenant_schema_name)
+    response = await client.delete(
+        f"{route_base}/{max_id + 1}",
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
+
+
+@pytest.mark.anyio
+async def test_upsert_bulk_chunked(client: AsyncClient):
+    items = [
+        {
+            'identifier': f'978-3-16-148411-{i}',
+            'name': f'A Brief Horror Story of Chunk {i}',
+            'author': 'Stephen Hawk King',
+        }
+        for i in range(5)
+    ]
+
+    # Parallel chunks that each commit on their own
+    response = await client.put(
+        f"{route_base}/bulk",
+        params={
+            'chunk_size': 2,
+            'mode': 'commit',
+            'concurrency': 2,
+        },
+        json=items[:3],
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['count'] == 3
+    assert data['inserted'] == 3
+    assert data['updated'] == 0
+    assert data['failed'] == 0
+    ids = data['ids']
+
+    # Ids stay in input order across chunks
+    response = await client.put(
+        f"{route_base}/bulk",
+        params={
+            'chunk_size': 2,
+            'mode': 'commit',
+            'concurrency': 2,
+        },
+        json=items,
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['inserted'] == 2
+    assert data['updated'] == 3
+    assert data['ids'][:3] == ids
+
+
+@pytest.mark.anyio
+async def test_upsert_bulk_commit_connections_capped(client: AsyncClient, monkeypatch):
+    class CountingSemaphore(asyncio.Semaphore):
+        held = 0
+        max_held = 0
+
+        async def __aenter__(self):
+            await super().__aenter__()
+            CountingSemaphore.held += 1
+            CountingSemaphore.max_held = max(CountingSemaphore.max_held, CountingSemaphore.held)
+
+        async def __aexit__(self, *args):
+            CountingSemaphore.held -= 1
+            await super().__aexit__(*args)
+
+    # The process-wide cap wins over the per-request concurrency, across concurrent requests
+    monkeypatch.setattr('src.models.commit_mode_connections', CountingSemaphore(1))
+    responses = await asyncio.gather(*[
+        client.put(
+            f"{route_base}/bulk",
+            params={
+                'chunk_size': 1,
+                'mode': 'commit',
+                'concurrency': 4,
+            },
+            json=[
+                {
+                    'identifier': f'978-3-16-148414-{r}{i}',
+                    'name': f'A Brief Horror Story of Request {r}',
+                    'author': 'Stephen Hawk King',
+                }
+                for i in range(4)
+            ],
+        )
+        for r in range(2)
+    ])
+    for response in responses:
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.json()['inserted'] == 4
+    assert CountingSemaphore.max_held == 1
+
+
+@pytest.mark.anyio
+async def test_upsert_bulk_savepoint(client: AsyncClient):
+    item = {
+        'identifier': '978-3-16-148412-0',
+        'name': 'A Brief Horror Story of Savepoints',
+        'author': 'Stephen Hawk King',
+    }
+    other = {**item, 'identifier': '978-3-16-148412-1'}
+
+    # The second chunk updates the same row twice, which Postgres rejects
+    response = await client.put(
+        f"{route_base}/bulk",
+        params={
+            'chunk_size': 2,
+            'mode': 'savepoint',
+        },
+        json=[item, other, {**item, 'identifier': '978-3-16-148412-2'}, {**item, 'identifier': '978-3-16-148412-2'}],
+    )
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['inserted'] == 2
+    assert data['failed'] == 2
+    # Just the error code, not the statement or the values of the failed chunk
+    assert data['errors'] == ['Chunk 1 (2 items) failed with SQLSTATE 21000']
+    assert len(data['ids']) == 2
+    assert (await Book.read_by_id(id=data['ids'][0], schema_name=client.login.tenant_schema_name)).identifier == item['identifier']
+
+    # All or nothing by default
+    with pytest.raises(DBAPIError):
+        await Book.upsert_many(
+            items=[BookCreate(**{**item, 'identifier': i}) for i in ('978-3-16-148412-3', '978-3-16-148412-2', '978-3-16-148412-2')],
+            schema_name=client.login.tenant_schema_name,
+        )
+    assert await Book.read_by_identifier(identifier='978-3-16-148412-3', schema_name=client.login.tenant_schema_name) is None
+
+
+@pytest.mark.anyio
+async def test_upsert_bulk_async(client: AsyncClient):
+    items = [
+        {
+            'identifier': f'978-3-16-148413-{i}',
+            'name': f'A Brief Horror Story of Jobs {i}',
+            'author': 'Stephen Hawk King',
+        }
+        for i in range(3)
+    ]
+    response = await client.put(
+        f"{route_base}/bulk/async",
+        json=items,
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED, response.text
+    data = response.json()
+    assert data['status'] == 'queued'
+    assert data['total'] == 3
+    assert data['processed'] == 0
+    assert data['started_at'] is None
+    job_id = data['job_id']
+
+    # Run the job here rather than in a worker
+    await run_bulk_job({'redis': Bus.queue}, job_id)
+
+    response = await client.get(f"{route_base}/bulk/jobs/{job_id}")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['status'] == 'complete'
+    assert data['processed'] == 3
+    assert data['inserted'] == 3
+    assert data['updated'] == 0
+    assert data['failed'] == 0
+    assert len(data['ids']) == 3
+    assert data['started_at'] is not None
+    assert data['heartbeat_at'] >= data['started_at']
+    assert not data['stale']
+    item = await Book.read_by_id(id=data['ids'][2], schema_name=client.login.tenant_schema_name)
+    assert item.identifier == items[2]['identifier']
+
+
+@pytest.mark.anyio
+async def test_read_bulk_job_stale(client: AsyncClient):
+    response = await client.post(
+        f"{route_base}/bulk/async",
+        json=[{'identifier': '978-3-16-148415-0', 'name': 'A Brief Horror Story of Dead Workers', 'author': 'Stephen Hawk King'}],
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED, response.text
+    job_id = response.json()['job_id']
+
+    # A worker that died mid-job, long enough ago for arq to have timed the job out
+    heartbeat_at = time.time() - BULK_JOB_TIMEOUT_SECONDS - 1
+    await Bus.queue.hset(get_key(job_id), mapping={'status': 'running', 'started_at': heartbeat_at, 'heartbeat_at': heartbeat_at})
+    response = await client.get(f"{route_base}/bulk/jobs/{job_id}")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['status'] == 'running'
+    assert data['stale']
+
+    await Bus.queue.hset(get_key(job_id), 'heartbeat_at', time.time())
+    response = await client.get(f"{route_base}/bulk/jobs/{job_id}")
+    assert not response.json()['stale']
+
+
+@pytest.mark.anyio
+async def test_read_bulk_job_not_found(client: AsyncClient):
+    response = await client.get(f"{route_base}/bulk/jobs/nope")
+    assert response.status_code == status.HTTP_404_NOT_FOUND, response.text
@@ -11,6 +11,7 @@ ModelClass = Critic
 route_base = f"{ApiVersion.V1}/{ModelClass.__tablename__}"
 get_model_member_count = 6
 bulk_response_member_count = 3
+bulk_upsert_response_member_count = 7
 
 
 @pytest.mark.anyio
@@ -414,7 +415,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 2
+    assert data['updated'] == 0
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Critics in the database.'
     assert len(data['ids']) == 2
@@ -457,7 +461,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 0
+    assert data['updated'] == 2
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Critics in the database.'
     assert len(data['ids']) == 2
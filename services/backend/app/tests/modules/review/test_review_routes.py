@@ -2,8 +2,10 @@ from fastapi import status
 import pytest
 from httpx import AsyncClient
 from datetime import datetime
+from sqlalchemy import event
 
 from src.versions import ApiVersion
+from src.database.service import DatabaseService
 from src.login.models import Login
 from src.modules.book.models import Book
 from src.modules.critic.models import Critic
@@ -14,6 +16,7 @@ ModelClass = Review
 route_base = f"{ApiVersion.V1}/{ModelClass.__tablename__}"
 get_model_member_count = 8
 bulk_response_member_count = 3
+bulk_upsert_response_member_count = 7
 
 
 # @pytest.fixture()
@@ -451,7 +454,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 2
+    assert data['updated'] == 0
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Reviews in the database.'
     assert len(data['ids']) == 2
@@ -506,7 +512,10 @@ async def test_upsert_bulk(client: AsyncClient):
     # Assert response
     assert response.status_code == status.HTTP_200_OK, response.text
     data = response.json()
-    assert len(data) == bulk_response_member_count
+    assert len(data) == bulk_upsert_response_member_count
+    assert data['inserted'] == 0
+    assert data['updated'] == 2
+    assert data['failed'] == 0
     assert data['count'] == 2
     assert data['message'] == f'Created or updated multiple Reviews in the database.'
     assert len(data['ids']) == 2
@@ -584,3 +593,64 @@ async def test_read_all_full(client: AsyncClient):
     assert all_items_route[last_idx]['body'] == item_last.body
     assert all_items_route[last_idx]['created_at'] == item_last.created_at.isoformat()
     assert all_items_route[last_idx]['updated_at'] == item_last.updated_at.isoformat()
+
+
+@pytest.mark.anyio
+async def test_read_all_include(client: AsyncClient):
+    await Review.delete_all(schema_name=client.login.tenant_schema_name)
+    items = [await new_item(client.login) for _ in range(3)]
+
+    statements = []
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = DatabaseService.get_async_engine().sync_engine
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+        counts = []
+        for limit in [1, 3]:
+            statements.clear()
+            response = await client.get(route_base, params={'include': 'book,critic', 'sort': 'id', 'limit': limit})
+            assert response.status_code == status.HTTP_200_OK, response.text
+            counts.append(len(statements))
+    finally:
+        event.remove(engine, 'after_cursor_execute', after_cursor_execute)
+
+    # A bigger page doesn't cost more queries
+    assert counts[0] == counts[1]
+
+    data = response.json()
+    assert len(data) == 3
+    for item, review in zip(data, items):
+        assert item['id'] == review.id
+        assert item['critic']['id'] == review.critic_id
+        assert item['book']['id'] == review.book_id
+        assert item['critic']['name'] is not None
+        assert item['book']['identifier'] is not None
+
+    response = await client.get(route_base, params={'include': 'critic', 'ids': f"{items[1].id}"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [(item['id'], item['critic']['id']) for item in response.json()] == [(items[1].id, items[1].critic_id)]
+    assert 'book' not in response.json()[0]
+
+    # Without include the response is unchanged
+    response = await client.get(route_base)
+    assert 'critic' not in response.json()[0]
+
+
+@pytest.mark.anyio
+async def test_read_by_id_include(client: AsyncClient):
+    item = await new_item(client.login)
+
+    response = await client.get(f"{route_base}/{item.id}", params={'include': 'critic,book'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert data['id'] == item.id
+    assert data['critic']['id'] == item.critic_id
+    assert data['book']['id'] == item.book_id
+
+    response = await client.get(f"{route_base}/{item.id}", params={'include': 'author'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
+
+    response = await client.get(route_base, params={'include': 'critic', 'fields': 'title'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST, response.text
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+import pytest
+
+from src.logging.service import logger
+from src.auth import get_hashed_password, verify_password, hash_password_sync
+
+
+@pytest.mark.anyio
+async def test_hash_and_verify_password():
+    hashed = await get_hashed_password('secret_password')
+    assert hashed != 'secret_password'
+    assert await verify_password('secret_password', hashed)
+    assert not await verify_password('wrong_password', hashed)
+
+
+@pytest.mark.anyio
+@pytest.mark.benchmark
+async def test_login_storm_does_not_stall_event_loop():
+    """Benchmark: a burst of concurrent logins should not delay unrelated work on the event loop."""
+    hashed = hash_password_sync('secret_password')
+
+    s = time.monotonic()
+    hash_password_sync('secret_password')
+    single_hash_time = time.monotonic() - s
+
+    # Measures how late a 10ms sleep wakes up while the storm runs
+    max_lag = 0
+    storm_done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_lag
+        while not storm_done.is_set():
+            s = time.monotonic()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.monotonic() - s - 0.01)
+
+    async def storm():
+        await asyncio.gather(*[verify_password('secret_password', hashed) for _ in range(20)])
+        storm_done.set()
+
+    s = time.monotonic()
+    await asyncio.gather(ticker(), storm())
+    storm_time = time.monotonic() - s
+
+    logger.info(f"Single hash: {single_hash_time:.3f}s, storm of 20: {storm_time:.3f}s, max event loop lag: {max_lag:.3f}s")
+
+    # Run synchronously the storm would stall the loop for 20 hashes, offloaded it should stay responsive
+    assert max_lag < single_hash_time
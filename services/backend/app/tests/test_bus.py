@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from arq.constants import job_key_prefix
+
+from src.logging.service import logger
+from src.modules.arqueue.bus import Bus
+
+
+# No worker listens on this queue, so the jobs just sit there until cleaned up
+BENCHMARK_QUEUE = 'arq:benchmark'
+
+
+async def clean_up(job_ids) -> None:
+    await Bus.queue.delete(BENCHMARK_QUEUE)
+    for i in range(0, len(job_ids), 10000):
+        await Bus.queue.delete(*[job_key_prefix + job_id for job_id in job_ids[i:i + 10000]])
+
+
+@pytest.mark.anyio
+async def test_enqueue_many_dedupes(client: AsyncClient):
+    job_ids = [f'test_enqueue_many_{i}' for i in range(3)]
+    await clean_up(job_ids)
+    try:
+        jobs = await Bus.enqueue_many('no_op_task', [(i,) for i in range(2)], job_ids=job_ids[:2], queue_name=BENCHMARK_QUEUE)
+        assert [j.job_id for j in jobs] == job_ids[:2]
+        assert (await jobs[0].info()).args == (0,)
+
+        # Existing ids are skipped, like with enqueue_job
+        jobs = await Bus.enqueue_many('no_op_task', [(i,) for i in range(3)], job_ids=job_ids, queue_name=BENCHMARK_QUEUE, batch_size=2)
+        assert jobs[0] is None
+        assert jobs[1] is None
+        assert jobs[2].job_id == job_ids[2]
+        assert await Bus.queue.enqueue_job('no_op_task', 2, _job_id=job_ids[2], _queue_name=BENCHMARK_QUEUE) is None
+        assert await Bus.queue.zcard(BENCHMARK_QUEUE) == 3
+    finally:
+        await clean_up(job_ids)
+
+
+@pytest.mark.anyio
+@pytest.mark.benchmark
+@pytest.mark.parametrize('n', [10_000, 100_000])
+async def test_enqueue_many_benchmark(client: AsyncClient, n: int):
+    job_ids = [f'test_enqueue_benchmark_{i}' for i in range(n)]
+    await clean_up(job_ids)
+    try:
+        s = time.monotonic()
+        jobs = await Bus.enqueue_many('no_op_task', [(i,) for i in range(n)], job_ids=job_ids, queue_name=BENCHMARK_QUEUE)
+        took = time.monotonic() - s
+        logger.warning(f"enqueue_many: {n} jobs in {took:.3f}s, {n / took:.0f} jobs/s")
+
+        assert all(j is not None for j in jobs)
+        assert await Bus.queue.zcard(BENCHMARK_QUEUE) == n
+
+        # One at a time for comparison, on a sample as it is much slower
+        sample = min(n, 2000)
+        await clean_up(job_ids)
+        s = time.monotonic()
+        for i in range(sample):
+            await Bus.queue.enqueue_job('no_op_task', i, _job_id=job_ids[i], _queue_name=BENCHMARK_QUEUE)
+        took_single = time.monotonic() - s
+        logger.warning(f"enqueue_job: {sample} jobs in {took_single:.3f}s, {sample / took_single:.0f} jobs/s")
+
+        assert n / took > sample / took_single
+    finally:
+        await clean_up(job_ids)
@@ -0,0 +1,51 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+
+from src.config import SHARED_SCHEMA_NAME
+from src.database import instrumentation
+from src.database.instrumentation import instrument_engine, current_query_tags, query_duration, is_plain_read
+from src.database.service import DatabaseService
+from src.metrics.service import registry
+
+
+def test_query_timing_is_tagged():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+
+    labels = {'model': 'Book', 'operation': 'read_all', 'schema': SHARED_SCHEMA_NAME}
+    before = query_duration.get_count(**labels)
+
+    token = current_query_tags.set(('Book', 'read_all'))
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('select 1'))
+    finally:
+        current_query_tags.reset(token)
+
+    assert query_duration.get_count(**labels) == before + 1
+    assert 'db_query_duration_seconds_bucket{model="Book",operation="read_all",schema="shared",le="+Inf"}' in registry.render()
+
+
+def test_only_plain_reads_are_analyzed():
+    assert is_plain_read('read_all', 'SELECT book.id FROM tenant.book ORDER BY book.id')
+    # Executed again by ANALYZE, locks would be taken twice and functions run twice
+    assert not is_plain_read('read_all', 'select pg_advisory_lock(:key)')
+    assert not is_plain_read('read_by_id', "select set_config('search_path', :search_path, :is_local)")
+    assert not is_plain_read('', 'select public.clone_schema(cast(:source as text), cast(:target as text))')
+    assert not is_plain_read('update_by_id', 'UPDATE tenant.book SET name=$1 WHERE book.id = $2 RETURNING book.id')
+
+
+@pytest.mark.anyio
+async def test_slow_lock_not_executed_twice(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'DATABASE_SLOW_QUERY_SECONDS', 1e-9)
+    monkeypatch.setattr(instrumentation, 'DATABASE_SLOW_QUERY_EXPLAIN', True)
+    key = 7_310_099
+
+    async with DatabaseService.get_async_engine().connect() as conn:
+        # Every statement counts as slow, so the lock gets explained
+        await conn.execute(text('select pg_advisory_lock(:key)'), {'key': key})
+        # Taken once, so released by the first unlock
+        assert (await conn.execute(text('select pg_advisory_unlock(:key)'), {'key': key})).scalar()
+        assert not (await conn.execute(text('select pg_advisory_unlock(:key)'), {'key': key})).scalar()
+        await conn.commit()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.database.loader import ModelLoader
+
+
+class Item:
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+class FakeModel:
+    """Records the batches it is asked for, ids below 0 don't exist."""
+    calls = []
+
+    @classmethod
+    async def read_by_ids(cls, ids, schema_name):
+        cls.calls.append((tuple(ids), schema_name))
+        await asyncio.sleep(0)
+        if 0 in ids:
+            raise ValueError('Broken batch')
+        return [Item(id) for id in ids if id > 0]
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    FakeModel.calls = []
+
+
+@pytest.mark.anyio
+async def test_coalesces_per_tick_and_schema():
+    loader = ModelLoader()
+    items = await asyncio.gather(*[loader.load(FakeModel, id, 'a') for id in [1, 2, 1, -1]], loader.load(FakeModel, 3, 'b'))
+    assert [item.id if item is not None else None for item in items] == [1, 2, 1, None, 3]
+    assert FakeModel.calls == [((1, 2, -1), 'a'), ((3,), 'b')]
+
+    # A later call is a new batch
+    assert (await loader.load(FakeModel, 4, 'a')).id == 4
+    assert FakeModel.calls[-1] == ((4,), 'a')
+    assert loader.batch_count == 3
+
+
+@pytest.mark.anyio
+async def test_error_fails_whole_batch():
+    loader = ModelLoader()
+    results = await asyncio.gather(loader.load(FakeModel, 0, 'a'), loader.load(FakeModel, 1, 'a'), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_releases_others():
+    loader = ModelLoader()
+    leader = asyncio.ensure_future(loader.load(FakeModel, 1, 'a'))
+    other = asyncio.ensure_future(loader.load(FakeModel, 2, 'a'))
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await other
+    assert loader._pending is None
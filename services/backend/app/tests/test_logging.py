@@ -0,0 +1,27 @@
+import json
+import logging
+
+from src.logging.service import JsonLogFormatter, SamplingFilter
+
+
+def make_record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, 'Hello %s', ('world',), None)
+
+
+def test_sampling_filter():
+    f = SamplingFilter(SamplingFilter.parse('sqlalchemy.engine=0, src=1'))
+
+    # Children inherit the rate of the most specific configured logger
+    assert not f.filter(make_record('sqlalchemy.engine.Engine'))
+    assert f.filter(make_record('src.models'))
+    assert f.filter(make_record('uvicorn'))
+
+    # Warnings and above are never sampled out
+    assert f.filter(make_record('sqlalchemy.engine.Engine', logging.WARNING))
+
+
+def test_json_log_formatter():
+    entry = json.loads(JsonLogFormatter().format(make_record('src.models')))
+    assert entry['logger'] == 'src.models'
+    assert entry['level'] == 'INFO'
+    assert entry['message'] == 'Hello world'
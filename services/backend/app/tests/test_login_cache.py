@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from src.modules.arqueue.bus import Bus
+from src.database.service import DatabaseService, UnitOfWork, current_unit_of_work
+from src.login.cache import LoginCache, REDIS_KEY_PREFIX
+from src.login.models import Login
+
+
+def cache_values(id: int, identifier: str) -> dict:
+    return {'id': id, 'identifier': identifier}
+
+
+@pytest.mark.anyio
+async def test_after_commit_deferred_in_unit_of_work():
+    calls = []
+    async def callback():
+        calls.append(1)
+
+    # Outside a request async_session has committed already
+    await DatabaseService.after_commit(callback)
+    assert calls == [1]
+
+    unit_of_work = UnitOfWork(session=None)
+    token = current_unit_of_work.set(unit_of_work)
+    try:
+        await DatabaseService.after_commit(callback)
+        assert calls == [1]
+    finally:
+        current_unit_of_work.reset(token)
+
+    await unit_of_work.run_after_commit_callbacks()
+    assert calls == [1, 1]
+    assert unit_of_work.after_commit_callbacks == []
+
+
+@pytest.mark.anyio
+async def test_invalidate_many():
+    cache = LoginCache(Login, ttl_seconds=60, use_redis=False)
+    for id in range(1, 5):
+        cache._store(f"login{id}@test.com", cache_values(id, f"login{id}@test.com"))
+
+    await cache.invalidate_many(identifiers=['login1@test.com'], ids=(id for id in [2, 3]))
+    assert list(cache._entries) == ['login4@test.com']
+    assert list(cache._subjects_by_id) == [4]
+
+
+@pytest.mark.anyio
+async def test_secrets_not_cached(client: AsyncClient):
+    cache = LoginCache(Login, ttl_seconds=60, use_redis=True)
+    await cache.set(client.login)
+    try:
+        payload = json.loads(await Bus.queue.get(f"{REDIS_KEY_PREFIX}:{client.login.identifier}"))
+        assert payload['identifier'] == client.login.identifier
+        assert 'hashed_password' not in payload
+        assert 'verification_token' not in payload
+
+        # Served from Redis, then from memory
+        for _ in range(2):
+            login = await cache.get(client.login.identifier)
+            assert login.id == client.login.id
+            assert login.tenant_schema_name == client.login.tenant_schema_name
+            assert 'hashed_password' not in login.__dict__
+            # Saving it would write a Login without its hash
+            with pytest.raises(RuntimeError):
+                await login.save()
+    finally:
+        await cache.invalidate(identifier=client.login.identifier, id=client.login.id)
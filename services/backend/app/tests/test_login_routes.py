@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+from fastapi import status
+import pytest
+from httpx import AsyncClient
+
+from src.main import app
+from src.versions import ApiVersion
+from src.bulk_jobs import bulk_job_models
+from src.login.models import Login
+from src.login.validators import LoginGet
+
+
+route_base = f"{ApiVersion.V1}/{Login.__tablename__}"
+secret_fields = {'hashed_password', 'verification_token', 'verified', 'tenant_schema_name'}
+
+
+@pytest.mark.anyio
+async def test_export_only_readable_fields(client: AsyncClient):
+    response = await client.get(f"{route_base}/export")
+    assert response.status_code == status.HTTP_200_OK, response.text
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) > 0
+    assert all(set(line.keys()) == set(LoginGet.model_fields) for line in lines)
+    assert client.login.tenant_schema_name not in response.text
+
+    response = await client.get(f"{route_base}/export", params={'format': 'csv'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) > 0
+    assert secret_fields.isdisjoint(rows[0].keys())
+
+
+@pytest.mark.anyio
+async def test_read_all_core_only_readable_fields(client: AsyncClient):
+    for params in [{'core': True}, {'core': True, 'ids': f"{client.login.id}"}, {'ids': f"{client.login.id}"}]:
+        response = await client.get(route_base, params=params)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        data = response.json()
+        assert len(data) > 0
+        assert all(set(item.keys()) == set(LoginGet.model_fields) for item in data), params
+
+
+@pytest.mark.anyio
+async def test_secret_fields_not_filterable_or_sortable(client: AsyncClient):
+    for params in [
+        {'identifier': client.login.identifier, 'hashed_password__prefix': '$2b$'},
+        {'verification_token': str(client.login.verification_token)},
+        {'sort': '-hashed_password'},
+        {'sort': 'tenant_schema_name', 'cursor': ''},
+    ]:
+        response = await client.get(route_base, params=params)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, params
+
+    response = await client.get(route_base, params={'identifier': client.login.identifier, 'sort': '-id'})
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [item['id'] for item in response.json()] == [client.login.id]
+
+
+@pytest.mark.anyio
+async def test_no_background_bulk_jobs(client: AsyncClient):
+    # Their payloads would stage plaintext passwords in Redis
+    assert Login.__name__ not in bulk_job_models
+    assert not any(route.path.startswith(f"{route_base}/bulk/") for route in app.routes)
+
+    response = await client.post(f"{route_base}/bulk/async", json=[{'identifier': 'bulk.job@test.com', 'password': 'SomePassword123!'}])
+    assert response.status_code != status.HTTP_202_ACCEPTED, response.text
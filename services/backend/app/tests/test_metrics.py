@@ -0,0 +1,17 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.anyio
+async def test_metrics(client: AsyncClient):
+    await client.get('/')
+    response = await client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+
+    body = response.text
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in body
+    assert 'db_pool_checked_out ' in body
+    assert '# TYPE db_query_duration_seconds histogram' in body
+    assert '# TYPE login_cache_lookups_total counter' in body
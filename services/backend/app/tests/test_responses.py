@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+
+from src.responses import FastJSONResponse, get_model_encoder
+from src.modules.book.models import Book
+from src.modules.book.validators import BookGet
+
+
+def test_model_encoder_matches_validator():
+    books = [
+        Book(id=i, identifier=f'978-0-618-6800{i}-9', name='A Brief Horror Story of Time', author='Twisted Oliver', release_year=None if i % 2 else 1994, created_at=datetime(2023, 1, i + 1, 12, 30, 1, 5), updated_at=datetime(2023, 2, 1))
+        for i in range(3)
+    ]
+    encoder = get_model_encoder(Book, tuple(BookGet.model_fields))
+
+    expected = [BookGet.model_construct(**b.to_dict()).model_dump(mode='json') for b in books]
+    assert json.loads(encoder.encode_many(books)) == expected
+    assert json.loads(encoder.encode_one(books[0])) == expected[0]
+
+    # Encoders are built once per model
+    assert get_model_encoder(Book, tuple(BookGet.model_fields)) is encoder
+
+
+def test_fast_json_response_passes_bytes_through():
+    assert FastJSONResponse(content=b'[1,2]').body == b'[1,2]'
+    assert FastJSONResponse(content={'a': [1, None]}).body == b'{"a":[1,null]}'
@@ -0,0 +1,41 @@
+import timeit
+
+import pytest
+from sqlalchemy import bindparam, select
+
+from src.logging.service import logger
+from src.modules.book.models import Book
+
+
+CALLS = 5000
+
+
+def test_prebuilt_statements_share_cache_key():
+    # Same object every call, so its memoized cache key is reused too
+    assert Book.get_read_by_id_statement() is Book.get_read_by_id_statement()
+    assert Book.get_upsert_many_statement() is Book.get_upsert_many_statement()
+
+    # Hits the same compiled cache entry as an equivalent statement built on the spot
+    assert Book.get_read_by_id_statement()._generate_cache_key() == select(Book).where(Book.id == bindparam('id'))._generate_cache_key()
+
+
+@pytest.mark.benchmark
+def test_prebuilt_statements_benchmark():
+    # Python side of an execution before the compiled cache lookup: build the statement, then get its cache key
+    def rebuild_read_by_id():
+        select(Book.get_model_class()).where(Book.get_model_class().id == 1)._generate_cache_key()
+
+    def prebuilt_read_by_id():
+        Book.get_read_by_id_statement()._generate_cache_key()
+
+    def rebuild_upsert():
+        Book.get_on_conflict_statement().returning(Book.get_model_class())._generate_cache_key()
+
+    def prebuilt_upsert():
+        Book.get_upsert_statement()._generate_cache_key()
+
+    timings = {fn.__name__: timeit.timeit(fn, number=CALLS) / CALLS for fn in (rebuild_read_by_id, prebuilt_read_by_id, rebuild_upsert, prebuilt_upsert)}
+    logger.warning(', '.join(f"{name}={seconds * 1e6:.1f}us" for name, seconds in timings.items()))
+
+    assert timings['prebuilt_read_by_id'] < timings['rebuild_read_by_id']
+    assert timings['prebuilt_upsert'] < timings['rebuild_upsert']
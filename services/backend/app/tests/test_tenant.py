@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from src.database.service import DatabaseService
+from src.modules.arqueue.worker import ArqueueWorkerSettings
+from src.tenant.models import Tenant, provision_duration
+from src.tenant.validators import TenantCreate
+
+
+@pytest.mark.anyio
+async def test_provision_concurrently(client: AsyncClient):
+    tenant = await Tenant.create_one(TenantCreate(identifier='test.concurrent.provision@test.com'))
+    lock_count = provision_duration.get_count(phase='lock')
+    try:
+        # Both calls must succeed, the second one finds the schema provisioned by the first
+        await asyncio.gather(tenant.provision(), tenant.provision())
+
+        async with DatabaseService.get_async_engine().connect() as conn:
+            assert await DatabaseService.schema_exists(conn, tenant.schema_name)
+            assert (await conn.execute(text(f'select count(*) from "{tenant.schema_name}".book'))).scalar() == 0
+        assert provision_duration.get_count(phase='lock') == lock_count + 1
+
+        # Idempotent
+        assert not await DatabaseService.clone_db_schema_async('tenant', tenant.schema_name)
+    finally:
+        async with DatabaseService.get_async_engine().begin() as conn:
+            await conn.execute(text(f'drop schema if exists "{tenant.schema_name}" cascade'))
+        await Tenant.delete_by_id(id=tenant.id)
+
+
+@pytest.mark.anyio
+async def test_provision_records_revision(client: AsyncClient):
+    async with DatabaseService.get_async_engine().connect() as conn:
+        revision = await DatabaseService.get_schema_revision(conn)
+    if revision == '':
+        pytest.skip('Migrations have not run on the test database.')
+
+    tenant = await Tenant.create_one(TenantCreate(identifier='test.provision.revision@test.com'))
+    clone_schema_name = f"{tenant.schema_name}_clone"
+    try:
+        # Claimed from the pool or cloned on the spot, either way the tenant knows its revision
+        await tenant.provision()
+        await DatabaseService.clone_db_schema_async('tenant', clone_schema_name, record_revision=True)
+
+        async with DatabaseService.get_async_engine().connect() as conn:
+            assert await DatabaseService.get_schema_revision(conn, tenant.schema_name) == revision
+            assert await DatabaseService.get_schema_revision(conn, clone_schema_name) == revision
+    finally:
+        async with DatabaseService.get_async_engine().begin() as conn:
+            await conn.execute(text(f'drop schema if exists "{tenant.schema_name}" cascade'))
+            await conn.execute(text(f'drop schema if exists "{clone_schema_name}" cascade'))
+        await Tenant.delete_by_id(id=tenant.id)
+
+
+@pytest.mark.anyio
+async def test_clone_sets_comment(client: AsyncClient):
+    schema_name = 'test_clone_comment'
+    try:
+        # Set with the clone, so pooled schemas are never visible untagged
+        assert await DatabaseService.clone_db_schema_async('tenant', schema_name, comment="some'revision")
+        async with DatabaseService.get_async_engine().connect() as conn:
+            comment = (await conn.execute(
+                text("select obj_description(to_regnamespace(:name), 'pg_namespace')"),
+                {'name': schema_name},
+            )).scalar()
+        assert comment == "some'revision"
+    finally:
+        async with DatabaseService.get_async_engine().begin() as conn:
+            await conn.execute(text(f'drop schema if exists "{schema_name}" cascade'))
+
+
+def test_top_up_keeps_no_result():
+    # A kept result would block the next per-claim top-up with the same job id until it expires
+    top_up = next(f for f in ArqueueWorkerSettings.functions if getattr(f, 'name', None) == 'top_up_tenant_schema_pool')
+    assert top_up.keep_result_s == 0
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+
+from src.logging.service import logger
+from src.database.service import DatabaseService, TenantRouting
+from src.modules.book.models import Book
+
+
+BENCHMARK_SCHEMA_PREFIX = 'bench_routing_'
+BENCHMARK_QUERIES = 2000
+# Tables per transaction, to stay within max_locks_per_transaction
+DDL_BATCH_SIZE = 500
+
+
+async def run_for_schemas(sql: str, tenant_count: int) -> None:
+    for start in range(0, tenant_count, DDL_BATCH_SIZE):
+        async with DatabaseService.get_async_engine().begin() as conn:
+            await conn.execute(text(f"""
+                do $$ begin
+                    for i in {start}..{min(start + DDL_BATCH_SIZE, tenant_count) - 1} loop
+                        {sql}
+                    end loop;
+                end $$
+            """))
+
+
+async def create_schemas(tenant_count: int) -> None:
+    # Just the table the benchmark reads, cloning full tenant schemas would take ages
+    await run_for_schemas(
+        f"execute format('create schema if not exists %I', '{BENCHMARK_SCHEMA_PREFIX}' || i); "
+        f"execute format('create table if not exists %I.book (like tenant.book including all)', '{BENCHMARK_SCHEMA_PREFIX}' || i);",
+        tenant_count,
+    )
+
+
+async def drop_schemas(tenant_count: int) -> None:
+    await run_for_schemas(f"execute format('drop schema if exists %I cascade', '{BENCHMARK_SCHEMA_PREFIX}' || i);", tenant_count)
+
+
+async def read_as(conn, schema_name: str, routing: TenantRouting):
+    await conn.execution_options(**DatabaseService.get_schema_context(schema_name, routing=routing))
+    await DatabaseService.set_search_path(conn, schema_name, routing=routing)
+    res = (await conn.execute(select(Book.name).order_by(Book.id))).scalars().all()
+    await conn.commit()
+    return res
+
+
+async def seed_books(schema_names) -> None:
+    # A book in each of the first two schemas, the third stays empty
+    async with DatabaseService.get_async_engine().begin() as conn:
+        for i in range(2):
+            await conn.execute(text(
+                f"insert into {schema_names[i]}.book (id, identifier, name, author, created_at, updated_at) "
+                f"values (1, '978-0-00-000000-{i}', 'Book of {schema_names[i]}', 'Anon', now(), now())"
+            ))
+
+
+async def assert_reads_own_tables(conn, schema_names, routing: TenantRouting) -> None:
+    assert await read_as(conn, schema_names[0], routing) == [f"Book of {schema_names[0]}"]
+    assert await read_as(conn, schema_names[1], routing) == [f"Book of {schema_names[1]}"]
+    assert await read_as(conn, schema_names[2], routing) == []
+
+
+@pytest.mark.anyio
+async def test_tenant_routing(client: AsyncClient):
+    tenant_count = 3
+    schema_names = [f"{BENCHMARK_SCHEMA_PREFIX}{i}" for i in range(tenant_count)]
+    await create_schemas(tenant_count)
+    try:
+        await seed_books(schema_names)
+        for routing in TenantRouting:
+            async with DatabaseService.get_async_engine().connect() as conn:
+                # Every mode reads each tenant's own table, also when switching back and forth
+                await assert_reads_own_tables(conn, schema_names, routing)
+                await assert_reads_own_tables(conn, schema_names, routing)
+
+                # Don't hand a tenant search_path back to the pool
+                await DatabaseService.set_search_path(conn, routing=TenantRouting.SEARCH_PATH)
+                await conn.commit()
+    finally:
+        await drop_schemas(tenant_count)
+
+
+@pytest.mark.anyio
+@pytest.mark.benchmark
+@pytest.mark.parametrize('tenant_count', [10, 1_000, 10_000])
+async def test_tenant_routing_benchmark(client: AsyncClient, tenant_count: int):
+    schema_names = [f"{BENCHMARK_SCHEMA_PREFIX}{i}" for i in range(tenant_count)]
+    await create_schemas(tenant_count)
+    try:
+        await seed_books(schema_names)
+
+        timings = {}
+        for routing in TenantRouting:
+            async with DatabaseService.get_async_engine().connect() as conn:
+                await assert_reads_own_tables(conn, schema_names, routing)
+
+                s = time.monotonic()
+                for i in range(BENCHMARK_QUERIES):
+                    await read_as(conn, schema_names[i % tenant_count], routing)
+                timings[routing] = time.monotonic() - s
+
+                # Don't hand a benchmark search_path back to the pool
+                await DatabaseService.set_search_path(conn, routing=TenantRouting.SEARCH_PATH)
+                await conn.commit()
+
+        logger.warning(
+            f"Tenant routing, {BENCHMARK_QUERIES} reads over {tenant_count} tenants: "
+            + ', '.join(f"{r.value}={t:.3f}s ({BENCHMARK_QUERIES / t:.0f}/s)" for r, t in timings.items())
+        )
+    finally:
+        await drop_schemas(tenant_count)